@@ -0,0 +1,1012 @@
+# Extensões do Scrapy do projeto
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/extensions.html
+
+import cProfile
+import datetime
+import gc
+import json
+import logging
+import os
+import pstats
+import socket
+import time
+import tracemalloc
+import types
+from collections import Counter, defaultdict
+
+from scrapy import signals
+from scrapy.exceptions import DontCloseSpider, NotConfigured
+from scrapy.utils.misc import load_object
+from scrapy.utils.reactor import listen_tcp
+from twisted.internet import defer, error, task
+from twisted.web import resource, server
+
+from lead_scraper.utils import memoria
+from lead_scraper.utils.checkpoint import CheckpointJournal, caminho_checkpoint
+from lead_scraper.utils.metricas import BUCKETS_FILA, Histograma, formatar_prometheus
+from lead_scraper.utils.perfil import AmostradorDePilhas, colapsar_pstats, formatar_colapsadas
+
+logger = logging.getLogger(__name__)
+
+# Enviado pelo BingMapsSpider a cada página processada, com a resposta e a
+# quantidade de listagens encontradas
+listagens_extraidas = object()
+
+# Enviado pelo BingMapsSpider quando todas as páginas de uma consulta foram
+# processadas, com a chave normalizada da consulta
+consulta_concluida = object()
+
+# Enviado pelas extensões Checkpoint e SharedFrontier antes de registrar
+# consultas concluídas: as pipelines descarregam o que têm em buffer, para que
+# nenhuma consulta seja dada como concluída com itens ainda só em memória
+checkpoint_gravando = object()
+
+# Enviado pelo CallbackTimingMiddleware a cada resposta processada, com o
+# tempo gasto no callback do spider
+callback_medido = object()
+
+# Padrão dos snapshots de métricas: data/metrics/ na raiz do repositório
+METRICS_DIR_PADRAO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'metrics'))
+
+# Padrão dos perfis: data/profiles/ na raiz do repositório
+PROFILE_DIR_PADRAO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'profiles'))
+
+# Padrão dos relatórios de memória: data/memory/ na raiz do repositório
+MEMORY_DIR_PADRAO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'memory'))
+
+
+def _envolver_metodos(itemproc, nome, envolver):
+    """
+    Troca cada itemproc.methods[nome] por envolver(pipeline, metodo). O
+    pipeline vem de itemproc.middlewares, não de metodo.__self__: o método
+    pode já ter sido envolvido por outra extensão. O Scrapy registra os
+    close_spider na ordem inversa. Se as listas não casarem, nada é envolvido.
+    """
+    pipelines = [pipeline for pipeline in itemproc.middlewares if hasattr(pipeline, nome)]
+    if nome == 'close_spider':
+        pipelines.reverse()
+    metodos = itemproc.methods[nome]
+    if len(pipelines) != len(metodos):
+        logger.warning(f'{len(metodos)} métodos {nome} para {len(pipelines)} pipelines; não serão envolvidos')
+        return False
+    for indice, (pipeline, metodo) in enumerate(zip(pipelines, list(metodos))):
+        metodos[indice] = envolver(pipeline, metodo)
+    return True
+
+
+class _Janela:
+    """Observações de um slot de download desde o último ajuste"""
+
+    __slots__ = ('saidas', 'respostas', 'bloqueios', 'erros_http', 'latencia_total', 'com_latencia',
+                 'paginas', 'vazias')
+
+    def __init__(self):
+        for campo in self.__slots__:
+            setattr(self, campo, 0)
+
+
+class AdaptiveConcurrency:
+    """
+    Ajusta a concorrência de cada slot de download em malha fechada (AIMD).
+
+    A cada ADAPTIVE_CONCURRENCY_INTERVAL segundos, as observações de cada
+    slot são avaliadas: taxa de bloqueios (403/429/503), taxa de erros
+    (exceções de download e 5xx), fração de páginas sem listagens e latência
+    média. Se algum limite foi ultrapassado, a concorrência é multiplicada por
+    ADAPTIVE_CONCURRENCY_BACKOFF; se o slot está saudável e há requisições
+    esperando na fila, ela aumenta ADAPTIVE_CONCURRENCY_INCREASE. Toda decisão
+    é registrada no log.
+
+    A concorrência total continua limitada por CONCURRENT_REQUESTS.
+    """
+
+    def __init__(self, crawler, intervalo=5.0, minimo=1, maximo=16, aumento=1, backoff=0.5,
+                 latencia_alvo=2.0, max_erros=0.1, max_bloqueios=0.02, max_vazias=0.5, min_amostras=5,
+                 codigos_bloqueio=(403, 429, 503)):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.intervalo = intervalo
+        self.minimo = minimo
+        self.maximo = maximo
+        self.aumento = aumento
+        self.backoff = backoff
+        self.latencia_alvo = latencia_alvo
+        self.max_erros = max_erros
+        self.max_bloqueios = max_bloqueios
+        self.max_vazias = max_vazias
+        self.min_amostras = min_amostras
+        self.codigos_bloqueio = {int(codigo) for codigo in codigos_bloqueio}
+        self._janelas = defaultdict(_Janela)
+        self.tarefa = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('ADAPTIVE_CONCURRENCY_ENABLED'):
+            raise NotConfigured
+        extensao = cls(
+            crawler,
+            intervalo=settings.getfloat('ADAPTIVE_CONCURRENCY_INTERVAL', 5.0),
+            minimo=settings.getint('ADAPTIVE_CONCURRENCY_MIN', 1),
+            maximo=settings.getint('ADAPTIVE_CONCURRENCY_MAX', 16),
+            aumento=settings.getint('ADAPTIVE_CONCURRENCY_INCREASE', 1),
+            backoff=settings.getfloat('ADAPTIVE_CONCURRENCY_BACKOFF', 0.5),
+            latencia_alvo=settings.getfloat('ADAPTIVE_CONCURRENCY_TARGET_LATENCY', 2.0),
+            max_erros=settings.getfloat('ADAPTIVE_CONCURRENCY_MAX_ERROR_RATE', 0.1),
+            max_bloqueios=settings.getfloat('ADAPTIVE_CONCURRENCY_MAX_BLOCK_RATE', 0.02),
+            max_vazias=settings.getfloat('ADAPTIVE_CONCURRENCY_MAX_EMPTY_RATE', 0.5),
+            min_amostras=settings.getint('ADAPTIVE_CONCURRENCY_MIN_SAMPLES', 5),
+            codigos_bloqueio=settings.getlist('ADAPTIVE_CONCURRENCY_BLOCK_CODES', [403, 429, 503]),
+        )
+        crawler.signals.connect(extensao.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extensao.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extensao.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(extensao.request_left_downloader, signal=signals.request_left_downloader)
+        crawler.signals.connect(extensao.pagina_processada, signal=listagens_extraidas)
+        return extensao
+
+    def spider_opened(self, spider):
+        self.tarefa = task.LoopingCall(self.ajustar)
+        self.tarefa.start(self.intervalo, now=False)
+
+    def spider_closed(self, spider):
+        if self.tarefa and self.tarefa.running:
+            self.tarefa.stop()
+
+    def _slot(self, request):
+        return request.meta.get('download_slot') or self.crawler.engine.downloader.get_slot_key(request)
+
+    def response_downloaded(self, response, request, spider):
+        janela = self._janelas[self._slot(request)]
+        janela.respostas += 1
+        latencia = request.meta.get('download_latency')
+        if latencia is not None:
+            janela.latencia_total += latencia
+            janela.com_latencia += 1
+        if response.status in self.codigos_bloqueio:
+            janela.bloqueios += 1
+        elif response.status >= 500:
+            janela.erros_http += 1
+
+    def request_left_downloader(self, request, spider):
+        # Sai do downloader com ou sem resposta: a diferença para as respostas são as exceções
+        self._janelas[self._slot(request)].saidas += 1
+
+    def pagina_processada(self, response, quantidade):
+        janela = self._janelas[self._slot(response.request)]
+        janela.paginas += 1
+        if quantidade == 0:
+            janela.vazias += 1
+
+    def ajustar(self):
+        slots = self.crawler.engine.downloader.slots
+        janelas, self._janelas = self._janelas, defaultdict(_Janela)
+        for chave, janela in janelas.items():
+            slot = slots.get(chave)
+            if slot is not None:
+                self.decidir(chave, slot, janela)
+
+    def decidir(self, chave, slot, janela):
+        total = max(janela.saidas, janela.respostas)
+        if total < self.min_amostras:
+            logger.debug(f'Slot {chave}: {total} amostras, concorrência mantida em {slot.concurrency}')
+            return
+
+        erros = (total - janela.respostas + janela.erros_http) / total
+        bloqueios = janela.bloqueios / janela.respostas if janela.respostas else 0.0
+        vazias = janela.vazias / janela.paginas if janela.paginas else 0.0
+        latencia = janela.latencia_total / janela.com_latencia if janela.com_latencia else 0.0
+
+        if bloqueios > self.max_bloqueios:
+            motivo = 'bloqueios'
+        elif erros > self.max_erros:
+            motivo = 'erros'
+        elif vazias > self.max_vazias:
+            motivo = 'páginas vazias'
+        elif latencia > self.latencia_alvo:
+            motivo = 'latência'
+        else:
+            motivo = None
+
+        atual = slot.concurrency
+        if motivo:
+            nova = max(self.minimo, int(atual * self.backoff))
+            decisao = 'reducoes'
+        elif slot.queue:
+            nova = min(self.maximo, atual + self.aumento)
+            motivo = 'saudável com fila'
+            decisao = 'aumentos' if nova > atual else 'mantidas'
+        else:
+            nova = atual
+            motivo = 'sem fila'
+            decisao = 'mantidas'
+
+        logger.info(
+            f'Concorrência do slot {chave}: {atual} -> {nova} ({motivo}; latência média {latencia:.2f}s, '
+            f'erros {erros:.0%}, bloqueios {bloqueios:.0%}, páginas vazias {vazias:.0%}, {total} amostras)'
+        )
+        slot.concurrency = nova
+        self.stats.inc_value(f'adaptive_concurrency/{decisao}')
+        self.stats.set_value(f'adaptive_concurrency/concorrencia/{chave}', nova)
+
+
+class Checkpoint:
+    """
+    Registra as consultas concluídas em um journal SQLite (CHECKPOINT_FILE,
+    padrão data/checkpoint/<spider>.sqlite) para retomar execuções longas.
+
+    Se a execução anterior foi interrompida, o BingMapsSpider pula as
+    consultas já concluídas e a ExcelExportPipeline continua a numeração das
+    partes da mesma execução. Uma execução que termina normalmente (motivo
+    'finished') encerra o journal: a próxima começa do zero.
+
+    As consultas concluídas são gravadas em lote a cada
+    CHECKPOINT_FLUSH_INTERVAL segundos e no fechamento, logo após o sinal
+    checkpoint_gravando.
+    """
+
+    def __init__(self, crawler, caminho, intervalo=5.0):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.intervalo = intervalo
+        self.journal = CheckpointJournal(caminho)
+        # Iniciada já na construção: as pipelines abrem antes de spider_opened e leem a execução do journal
+        self.execucao, self.retomada = self.journal.iniciar_execucao()
+        self._pendentes = []
+        self.tarefa = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('CHECKPOINT_ENABLED'):
+            raise NotConfigured
+        extensao = cls(
+            crawler,
+            caminho_checkpoint(settings, crawler.spidercls.name),
+            intervalo=settings.getfloat('CHECKPOINT_FLUSH_INTERVAL', 5.0),
+        )
+        crawler.signals.connect(extensao.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extensao.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extensao.registrar, signal=consulta_concluida)
+        return extensao
+
+    def spider_opened(self, spider):
+        spider.checkpoint = self
+        if self.retomada:
+            logger.info(f'Retomando a execução {self.execucao} de {self.journal.caminho}')
+        self.tarefa = task.LoopingCall(self.gravar)
+        self.tarefa.start(self.intervalo, now=False)
+
+    def concluida(self, chave):
+        if self.retomada and self.journal.concluida(chave):
+            self.stats.inc_value('checkpoint/puladas')
+            return True
+        return False
+
+    def registrar(self, chave):
+        self._pendentes.append(chave)
+
+    def gravar(self):
+        if not self._pendentes:
+            return
+        self.crawler.signals.send_catch_log(signal=checkpoint_gravando)
+        self.journal.marcar(self._pendentes, time.time())
+        self.stats.inc_value('checkpoint/concluidas', len(self._pendentes))
+        self._pendentes = []
+
+    def spider_closed(self, spider, reason):
+        if self.tarefa and self.tarefa.running:
+            self.tarefa.stop()
+        self.gravar()
+        if reason == 'finished':
+            self.journal.concluir_execucao()
+        else:
+            logger.info(f'Execução {self.execucao} interrompida ({reason}); será retomada na próxima vez')
+        self.journal.close()
+
+
+class SharedFrontier:
+    """
+    Alimenta o spider com lotes de consultas de uma frontier compartilhada
+    (FRONTIER_BACKEND, padrão: SQLiteFrontier em data/frontier/<spider>.sqlite)
+    no lugar de termo/estado/cidade/bairros.
+
+    O spider começa com um lote de FRONTIER_BATCH_SIZE consultas; quando
+    metade delas terminou, o próximo lote é arrendado, para o scheduler nunca
+    esvaziar. A cada FRONTIER_HEARTBEAT_INTERVAL segundos as consultas
+    concluídas são confirmadas (depois do sinal checkpoint_gravando, com os
+    itens já exportados) e os arrendamentos em andamento são renovados por
+    FRONTIER_VISIBILITY_TIMEOUT segundos. Quando o spider fica ocioso, o que
+    foi arrendado e não concluiu (ex.: página bloqueada) volta para a fila.
+
+    Com a fila vazia, o worker continua esperando enquanto houver consultas
+    arrendadas por outros workers (FRONTIER_WAIT_FOR_LEASES): se algum morrer,
+    os arrendamentos dele vencem e as consultas são retomadas aqui.
+    """
+
+    def __init__(self, crawler, backend, lote=50, visibilidade=300.0, intervalo=None, aguardar=True):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.backend = backend
+        self.lote = lote
+        self.visibilidade = visibilidade
+        self.intervalo = intervalo or visibilidade / 3
+        self.aguardar = aguardar
+        self.worker = f'{socket.gethostname()}:{os.getpid()}'
+        # Chaves arrendadas ainda não concluídas e concluídas ainda não confirmadas
+        self._em_andamento = set()
+        self._concluidas = []
+        self._esgotada = False
+        self.spider = None
+        self.tarefa = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('FRONTIER_ENABLED'):
+            raise NotConfigured
+        backend = load_object(settings.get('FRONTIER_BACKEND', 'lead_scraper.frontier.SQLiteFrontier'))
+        extensao = cls(
+            crawler,
+            backend.from_settings(settings, crawler.spidercls.name),
+            lote=settings.getint('FRONTIER_BATCH_SIZE', 50),
+            visibilidade=settings.getfloat('FRONTIER_VISIBILITY_TIMEOUT', 300.0),
+            intervalo=settings.getfloat('FRONTIER_HEARTBEAT_INTERVAL', 0.0),
+            aguardar=settings.getbool('FRONTIER_WAIT_FOR_LEASES', True),
+        )
+        crawler.signals.connect(extensao.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extensao.spider_idle, signal=signals.spider_idle)
+        crawler.signals.connect(extensao.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extensao.registrar, signal=consulta_concluida)
+        return extensao
+
+    def spider_opened(self, spider):
+        spider.frontier = self
+        self.spider = spider
+        logger.info(f'Worker {self.worker} consumindo a frontier {getattr(self.backend, "caminho", self.backend)}')
+        self.tarefa = task.LoopingCall(self.renovar)
+        self.tarefa.start(self.intervalo, now=False)
+
+    def arrendar(self):
+        """Arrenda o próximo lote; retorna as consultas (termo, estado, cidade, bairro)"""
+        arrendadas = self.backend.arrendar(self.worker, self.lote, self.visibilidade)
+        self._esgotada = len(arrendadas) < self.lote
+        if arrendadas:
+            self._em_andamento.update(chave for chave, _ in arrendadas)
+            self.stats.inc_value('frontier/lotes')
+            self.stats.inc_value('frontier/arrendadas', len(arrendadas))
+        return [consulta for _, consulta in arrendadas]
+
+    def _agendar(self):
+        consultas = self.arrendar()
+        # A frontier já deduplica pela chave: uma consulta devolvida e arrendada
+        # de novo tem o mesmo fingerprint da primeira tentativa e seria
+        # descartada pelo filtro de duplicatas
+        for request in self.spider.requisicoes(consultas, dont_filter=True):
+            self.crawler.engine.crawl(request)
+        return bool(consultas)
+
+    def registrar(self, chave):
+        if chave not in self._em_andamento:
+            return
+        self._em_andamento.discard(chave)
+        self._concluidas.append(chave)
+        if not self._esgotada and len(self._em_andamento) <= self.lote // 2:
+            self._agendar()
+
+    def confirmar(self):
+        if not self._concluidas:
+            return
+        self.crawler.signals.send_catch_log(signal=checkpoint_gravando)
+        self.backend.confirmar(self._concluidas)
+        self.stats.inc_value('frontier/confirmadas', len(self._concluidas))
+        self._concluidas = []
+
+    def renovar(self):
+        self.confirmar()
+        if not self._em_andamento:
+            return
+        perdidas = self._em_andamento - set(self.backend.renovar(self.worker, self._em_andamento, self.visibilidade))
+        if perdidas:
+            # Outro worker assumiu a consulta: ela segue aqui também e é confirmada por quem terminar primeiro
+            logger.warning(f'{len(perdidas)} arrendamentos venceram antes da renovação')
+            self.stats.inc_value('frontier/arrendamentos_perdidos', len(perdidas))
+
+    def _devolver(self):
+        if self._em_andamento:
+            self.backend.devolver(self.worker, self._em_andamento)
+            self.stats.inc_value('frontier/devolvidas', len(self._em_andamento))
+            self._em_andamento = set()
+
+    def spider_idle(self, spider):
+        # Ocioso: nada em voo. O que foi arrendado e não concluiu volta para a fila.
+        self.confirmar()
+        guard = getattr(spider, 'response_guard', None)
+        if guard is not None and guard.retidas:
+            # Novas tentativas esperando o backoff ainda vão concluir consultas arrendadas
+            raise DontCloseSpider
+        self._devolver()
+        if self._agendar():
+            raise DontCloseSpider
+        if self.aguardar and self.backend.em_aberto():
+            logger.debug('Frontier sem consultas livres; aguardando arrendamentos de outros workers')
+            raise DontCloseSpider
+
+    def spider_closed(self, spider, reason):
+        if self.tarefa and self.tarefa.running:
+            self.tarefa.stop()
+        self.confirmar()
+        # Encerramento antecipado: o que ficou pela metade volta já para a fila, sem esperar o arrendamento vencer
+        self._devolver()
+        resumo = self.backend.resumo()
+        logger.info('Frontier: ' + ', '.join(f'{situacao} {quantidade}' for situacao, quantidade in resumo.items()))
+        self.backend.close()
+
+
+class _Recurso(resource.Resource):
+    isLeaf = True
+
+    def __init__(self, extensao):
+        super().__init__()
+        self.extensao = extensao
+
+    def render_GET(self, request):
+        request.setHeader(b'Content-Type', b'text/plain; version=0.0.4; charset=utf-8')
+        return self.extensao.prometheus().encode('utf-8')
+
+
+class StageMetrics:
+    """
+    Histogramas por etapa durante a execução, para saber se um crawl longo
+    está limitado pela rede, pelo parse ou pela exportação:
+
+    - download: download_latency de cada resposta;
+    - parse: tempo no callback do spider por resposta (CallbackTimingMiddleware);
+    - pipeline: tempo de process_item por item, em cada pipeline;
+    - fila: profundidade amostrada a cada METRICS_SAMPLE_INTERVAL segundos do
+      scheduler, das filas dos slots do downloader (esperando concorrência),
+      das respostas esperando o spider e dos itens nas pipelines.
+
+    As métricas ficam em http://METRICS_HTTP_HOST:<porta>/metrics no formato
+    de texto do Prometheus (primeira porta livre de METRICS_HTTP_PORT) e vão
+    para um snapshot NDJSON a cada METRICS_SNAPSHOT_INTERVAL segundos
+    (METRICS_SNAPSHOT_FILE, padrão data/metrics/<spider>_<timestamp>.ndjson).
+    Os quantis do fechamento também vão para as stats (metricas/...).
+    """
+
+    FILAS = ('scheduler', 'downloader', 'scraper', 'pipelines')
+
+    def __init__(self, crawler, intervalo_amostra=1.0, intervalo_snapshot=30.0, arquivo=None,
+                 portas=None, host='127.0.0.1'):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.intervalo_amostra = intervalo_amostra
+        self.intervalo_snapshot = intervalo_snapshot
+        self.arquivo = arquivo
+        self.portas = portas
+        self.host = host
+        self.download = Histograma()
+        self.parse = Histograma()
+        self.pipelines = {}
+        self.filas = {fila: Histograma(BUCKETS_FILA) for fila in self.FILAS}
+        self.profundidade = dict.fromkeys(self.FILAS, 0)
+        self.ativos = 0
+        self.inicio = None
+        self.porta = None
+        self._porta = None
+        self._anterior = None
+        self._copias = {}
+        self._tarefas = []
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('METRICS_ENABLED'):
+            raise NotConfigured
+        intervalo_snapshot = settings.getfloat('METRICS_SNAPSHOT_INTERVAL', 30.0)
+        arquivo = settings.get('METRICS_SNAPSHOT_FILE')
+        if intervalo_snapshot and not arquivo:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            arquivo = os.path.join(METRICS_DIR_PADRAO, f'{crawler.spidercls.name}_{timestamp}.ndjson')
+        extensao = cls(
+            crawler,
+            intervalo_amostra=settings.getfloat('METRICS_SAMPLE_INTERVAL', 1.0),
+            intervalo_snapshot=intervalo_snapshot,
+            arquivo=arquivo if intervalo_snapshot else None,
+            portas=settings.getlist('METRICS_HTTP_PORT', [9410, 9450]) if settings.getbool(
+                'METRICS_HTTP_ENABLED', True) else None,
+            host=settings.get('METRICS_HTTP_HOST', '127.0.0.1'),
+        )
+        crawler.signals.connect(extensao.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extensao.spider_closed, signal=signals.spider_closed)
+        crawler.signals.connect(extensao.response_downloaded, signal=signals.response_downloaded)
+        crawler.signals.connect(extensao.callback_medido, signal=callback_medido)
+        return extensao
+
+    def spider_opened(self, spider):
+        self.inicio = time.monotonic()
+        self._anterior = (self.inicio, 0, 0)
+        self._medir_pipelines()
+        if self.portas is not None:
+            try:
+                self._porta = listen_tcp([int(p) for p in self.portas], self.host, server.Site(_Recurso(self)))
+            except error.CannotListenError as e:
+                # Os snapshots continuam; só o endpoint fica de fora
+                logger.warning(f'Endpoint de métricas desativado: {e}')
+            else:
+                self.porta = self._porta.getHost().port
+                logger.info(f'Métricas em http://{self.host}:{self.porta}/metrics')
+        if self.arquivo:
+            os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+            logger.info(f'Snapshots de métricas em {self.arquivo}')
+        for funcao, intervalo in ((self.amostrar, self.intervalo_amostra), (self.gravar, self.intervalo_snapshot)):
+            if intervalo:
+                tarefa = task.LoopingCall(funcao)
+                tarefa.start(intervalo, now=False)
+                self._tarefas.append(tarefa)
+
+    def _medir_pipelines(self):
+        """Envolve o process_item de cada pipeline para medir o tempo por item (inclusive o assíncrono)"""
+        def envolver(pipeline, metodo):
+            return self._cronometrado(metodo, self.pipelines.setdefault(type(pipeline).__name__, Histograma()))
+
+        _envolver_metodos(self.crawler.engine.scraper.itemproc, 'process_item', envolver)
+
+    @staticmethod
+    def _cronometrado(metodo, histograma):
+        def process_item(item, spider):
+            inicio = time.perf_counter()
+            resultado = metodo(item, spider)
+            if isinstance(resultado, defer.Deferred):
+                def observar(valor):
+                    histograma.observar(time.perf_counter() - inicio)
+                    return valor
+                return resultado.addBoth(observar)
+            histograma.observar(time.perf_counter() - inicio)
+            return resultado
+        return process_item
+
+    def response_downloaded(self, response, request, spider):
+        latencia = request.meta.get('download_latency')
+        if latencia is not None:
+            self.download.observar(latencia)
+
+    def callback_medido(self, response, segundos):
+        self.parse.observar(segundos)
+
+    def amostrar(self):
+        engine = self.crawler.engine
+        slot = getattr(engine, 'slot', None)
+        scheduler = getattr(slot, 'scheduler', None)
+        scraper = engine.scraper.slot
+        self.profundidade = {
+            'scheduler': len(scheduler) if scheduler is not None and hasattr(scheduler, '__len__') else 0,
+            'downloader': sum(len(s.queue) for s in engine.downloader.slots.values()),
+            'scraper': len(scraper.queue) + len(scraper.active) if scraper else 0,
+            'pipelines': scraper.itemproc_size if scraper else 0,
+        }
+        self.ativos = len(engine.downloader.active)
+        for fila, profundidade in self.profundidade.items():
+            self.filas[fila].observar(profundidade)
+
+    def prometheus(self):
+        stats = self.stats
+        return formatar_prometheus([
+            ('lead_scraper_respostas_total', 'counter', 'Respostas baixadas',
+             [({}, stats.get_value('downloader/response_count', 0))]),
+            ('lead_scraper_itens_total', 'counter', 'Itens exportados',
+             [({}, stats.get_value('item_scraped_count', 0))]),
+            ('lead_scraper_download_segundos', 'histogram', 'Tempo de download por resposta',
+             [({}, self.download)]),
+            ('lead_scraper_parse_segundos', 'histogram', 'Tempo no callback do spider por resposta',
+             [({}, self.parse)]),
+            ('lead_scraper_pipeline_segundos', 'histogram', 'Tempo de process_item por item',
+             [({'pipeline': nome}, h) for nome, h in self.pipelines.items()]),
+            ('lead_scraper_fila', 'histogram', 'Profundidade amostrada de cada fila',
+             [({'fila': fila}, h) for fila, h in self.filas.items()]),
+            ('lead_scraper_fila_atual', 'gauge', 'Profundidade de cada fila na última amostra',
+             [({'fila': fila}, valor) for fila, valor in self.profundidade.items()]),
+            ('lead_scraper_downloads_ativos', 'gauge', 'Requisições no downloader na última amostra',
+             [({}, self.ativos)]),
+        ])
+
+    def _histogramas(self):
+        histogramas = {'download': self.download, 'parse': self.parse}
+        histogramas.update((f'pipeline/{nome}', h) for nome, h in self.pipelines.items())
+        return histogramas
+
+    def snapshot(self):
+        """Contadores acumulados; taxas e quantis só do intervalo desde o snapshot anterior"""
+        agora = time.monotonic()
+        respostas = self.stats.get_value('downloader/response_count', 0)
+        itens = self.stats.get_value('item_scraped_count', 0)
+        momento, respostas_antes, itens_antes = self._anterior
+        self._anterior = (agora, respostas, itens)
+        decorrido = agora - momento
+        etapas = {}
+        for etapa, histograma in self._histogramas().items():
+            anterior = self._copias.get(etapa)
+            etapas[etapa] = (histograma.desde(anterior) if anterior else histograma).resumo()
+            self._copias[etapa] = histograma.copia()
+        return {
+            'momento': datetime.datetime.now().isoformat(timespec='seconds'),
+            'segundos': round(agora - self.inicio, 3),
+            'respostas': respostas,
+            'itens': itens,
+            'respostas_por_segundo': round((respostas - respostas_antes) / decorrido, 2) if decorrido else None,
+            'itens_por_segundo': round((itens - itens_antes) / decorrido, 2) if decorrido else None,
+            'etapas': etapas,
+            'filas': dict(self.profundidade),
+        }
+
+    def gravar(self):
+        with open(self.arquivo, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(self.snapshot(), ensure_ascii=False) + '\n')
+
+    def spider_closed(self, spider, reason):
+        for tarefa in self._tarefas:
+            if tarefa.running:
+                tarefa.stop()
+        if self.arquivo:
+            self.gravar()
+        for etapa, histograma in self._histogramas().items():
+            for quantil, valor in histograma.resumo().items():
+                if quantil.startswith('p') and valor is not None:
+                    self.stats.set_value(f'metricas/{etapa}/{quantil}', round(valor, 6))
+        if self.porta is not None:
+            return self._porta.stopListening()
+
+
+class ProfilingHooks:
+    """
+    Profiling sob demanda do callback do spider (parse) e das pipelines
+    (process_item e close_spider), ligado com PROFILE_MODE ou com o argumento
+    `-a profile=...` do spider: "callbacks", "pipelines" ou os dois separados
+    por vírgula ("all" liga tudo).
+
+    PROFILE_ENGINE escolhe o profiler:
+
+    - cprofile: determinístico, um <componente>.prof por componente (pstats,
+      snakeviz); o overhead cresce com o número de chamadas de função;
+    - sampling: uma thread lê a pilha a cada PROFILE_SAMPLE_INTERVAL segundos,
+      um <componente>.collapsed por componente; overhead baixo e constante.
+
+    Com PROFILE_EVERY = N, só uma chamada a cada N de cada componente (uma
+    resposta no parse, um item no process_item) é perfilada. No fechamento,
+    os arquivos vão para PROFILE_DIR (padrão data/profiles/<spider>_<timestamp>/),
+    com pilhas.collapsed reunindo todos os componentes para o flamegraph.pl
+    ou o speedscope. Em um process_item assíncrono, só a parte síncrona
+    entra no perfil.
+    """
+
+    COMPONENTES = ('callbacks', 'pipelines')
+    MOTORES = ('cprofile', 'sampling')
+
+    def __init__(self, crawler, componentes, motor='cprofile', a_cada=1, intervalo=0.005, pasta=None):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.componentes = componentes
+        self.motor = motor
+        self.a_cada = max(1, a_cada)
+        self.intervalo = intervalo
+        self.pasta = pasta
+        self.perfis = {}
+        self.amostrador = None
+        self.chamadas = Counter()
+        self.perfiladas = Counter()
+        self._ativo = None
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        # O argumento do spider tem precedência sobre a setting
+        modo = getattr(crawler.spider, 'profile', None) or settings.get('PROFILE_MODE') or ''
+        if modo.strip() == 'all':
+            componentes = cls.COMPONENTES
+        else:
+            componentes = tuple(c.strip() for c in modo.split(',') if c.strip())
+        if not componentes:
+            raise NotConfigured
+        invalidos = sorted(set(componentes) - set(cls.COMPONENTES))
+        if invalidos:
+            raise ValueError(f'Modo de profiling inválido: {", ".join(invalidos)} (use callbacks, pipelines ou all)')
+        motor = settings.get('PROFILE_ENGINE', 'cprofile')
+        if motor not in cls.MOTORES:
+            raise ValueError(f'PROFILE_ENGINE inválido: {motor!r} (use {", ".join(cls.MOTORES)})')
+        pasta = settings.get('PROFILE_DIR')
+        if not pasta:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            pasta = os.path.join(PROFILE_DIR_PADRAO, f'{crawler.spidercls.name}_{timestamp}')
+        extensao = cls(
+            crawler,
+            componentes,
+            motor=motor,
+            a_cada=settings.getint('PROFILE_EVERY', 1),
+            intervalo=settings.getfloat('PROFILE_SAMPLE_INTERVAL', 0.005),
+            pasta=pasta,
+        )
+        crawler.signals.connect(extensao.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extensao.spider_closed, signal=signals.spider_closed)
+        return extensao
+
+    def spider_opened(self, spider):
+        if self.motor == 'sampling':
+            # Criado aqui para amostrar a thread do reactor
+            self.amostrador = AmostradorDePilhas(ProfilingHooks._chamar.__code__, self.intervalo)
+            self.amostrador.start()
+        if 'callbacks' in self.componentes:
+            self._envolver_callback(spider)
+        if 'pipelines' in self.componentes:
+            self._envolver_pipelines()
+        a_cada = f', 1 a cada {self.a_cada} chamadas' if self.a_cada > 1 else ''
+        logger.info(f'Profiling ({self.motor}) de {", ".join(self.componentes)}{a_cada}')
+
+    def _envolver_callback(self, spider):
+        original = spider.parse
+        componente = f'{type(spider).__name__}.parse'
+        extensao = self
+
+        def parse(spider, response, **kwargs):
+            return extensao._perfilar_saida(componente, original(response, **kwargs))
+
+        # Método ligado ao spider: requisições com callback=self.parse continuam
+        # serializáveis nas filas em disco (JOBDIR)
+        spider.parse = types.MethodType(parse, spider)
+
+    def _envolver_pipelines(self):
+        itemproc = self.crawler.engine.scraper.itemproc
+        for nome in ('process_item', 'close_spider'):
+            _envolver_metodos(
+                itemproc, nome,
+                lambda pipeline, metodo, nome=nome: self._perfilado(f'{type(pipeline).__name__}.{nome}', metodo)
+            )
+
+    def _perfilado(self, componente, metodo):
+        def perfilado(*args):
+            if self._sortear(componente):
+                return self._chamar(componente, metodo, *args)
+            return metodo(*args)
+        return perfilado
+
+    def _sortear(self, componente):
+        """Uma chamada a cada PROFILE_EVERY de cada componente, começando pela primeira"""
+        sorteada = self.chamadas[componente] % self.a_cada == 0
+        self.chamadas[componente] += 1
+        if sorteada:
+            self.perfiladas[componente] += 1
+        return sorteada
+
+    def _perfilar_saida(self, componente, resultado):
+        if resultado is None or not self._sortear(componente):
+            return resultado
+        return self._iterar(componente, iter(resultado))
+
+    def _iterar(self, componente, iterador):
+        # Só o tempo dentro do gerador: o processamento de cada item pelas
+        # pipelines acontece entre um next() e outro
+        while True:
+            try:
+                saida = self._chamar(componente, next, iterador)
+            except StopIteration:
+                return
+            yield saida
+
+    def _chamar(self, componente, funcao, *args):
+        # Um componente chamado de dentro de outro já perfilado entra no perfil de fora
+        if self._ativo is not None:
+            return funcao(*args)
+        self._ativo = componente
+        perfil = None
+        if self.amostrador is not None:
+            self.amostrador.componente = componente
+        else:
+            perfil = self.perfis.get(componente)
+            if perfil is None:
+                perfil = self.perfis[componente] = cProfile.Profile()
+            perfil.enable()
+        try:
+            return funcao(*args)
+        finally:
+            if perfil is not None:
+                perfil.disable()
+            else:
+                self.amostrador.componente = None
+            self._ativo = None
+
+    def spider_closed(self, spider, reason):
+        if self.amostrador is not None:
+            self.amostrador.parar()
+        os.makedirs(self.pasta, exist_ok=True)
+        pilhas = Counter()
+        for componente, perfil in self.perfis.items():
+            perfil.dump_stats(os.path.join(self.pasta, f'{componente}.prof'))
+            for pilha, peso in colapsar_pstats(pstats.Stats(perfil).stats).items():
+                pilhas[(componente,) + pilha] += peso
+        if self.amostrador is not None:
+            for componente, amostras in self.amostrador.pilhas.items():
+                with open(os.path.join(self.pasta, f'{componente}.collapsed'), 'w', encoding='utf-8') as f:
+                    f.write(formatar_colapsadas(amostras))
+                for pilha, peso in amostras.items():
+                    pilhas[(componente,) + pilha] += peso
+        with open(os.path.join(self.pasta, 'pilhas.collapsed'), 'w', encoding='utf-8') as f:
+            f.write(formatar_colapsadas(pilhas))
+        for componente, chamadas in self.chamadas.items():
+            self.stats.set_value(f'perfil/{componente}/chamadas', chamadas)
+            self.stats.set_value(f'perfil/{componente}/perfiladas', self.perfiladas[componente])
+        logger.info(f'Perfis em {self.pasta}')
+
+
+class MemoryMonitor:
+    """
+    Instrumentação de memória para crawls longos: a cada
+    MEMORY_MONITOR_INTERVAL segundos e/ou MEMORY_MONITOR_ITEMS itens, registra
+    o RSS, os objetos vivos rastreados pelo Scrapy (Request, HtmlResponse,
+    LeadScraperItem...), o tamanho do scheduler e, com tracemalloc, a memória
+    por pacote e os MEMORY_MONITOR_TOP locais de alocação que mais cresceram.
+
+    Os locais que crescem são comparados com o snapshot do fim do aquecimento
+    (MEMORY_MONITOR_WARMUP segundos): caches e imports do início não entram.
+    Cada registro vai para o log e para uma linha de MEMORY_MONITOR_FILE
+    (padrão data/memory/<spider>_<timestamp>.ndjson).
+
+    Modo soak: com MEMORY_MONITOR_MAX_GROWTH (MB por minuto), a inclinação do
+    RSS depois do aquecimento é recalculada a cada registro e, a partir de
+    três registros, se passar do limite o spider é fechado com o motivo
+    memory_growth_exceeded (ver tests/performance/soak_memory.py).
+
+    O tracemalloc custa CPU e memória proporcionais ao número de alocações;
+    MEMORY_MONITOR_TRACEMALLOC_FRAMES = 0 deixa só RSS e contagem de objetos.
+    """
+
+    MOTIVO_SOAK = 'memory_growth_exceeded'
+
+    def __init__(self, crawler, intervalo=60.0, a_cada_itens=0, quadros=1, top=10, aquecimento=60.0,
+                 crescimento_maximo=0.0, arquivo=None):
+        self.crawler = crawler
+        self.stats = crawler.stats
+        self.intervalo = intervalo
+        self.a_cada_itens = a_cada_itens
+        self.quadros = quadros
+        self.top = top
+        self.aquecimento = aquecimento
+        self.crescimento_maximo = crescimento_maximo
+        self.arquivo = arquivo
+        self.itens = 0
+        self.inicio = None
+        self.pontos = []
+        self.rss_maximo = 0.0
+        self.base = None
+        self._base_aquecida = False
+        self._iniciou_tracemalloc = False
+        self._tarefa = None
+        self._fechando = False
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        if not settings.getbool('MEMORY_MONITOR_ENABLED'):
+            raise NotConfigured
+        arquivo = settings.get('MEMORY_MONITOR_FILE')
+        if not arquivo:
+            timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            arquivo = os.path.join(MEMORY_DIR_PADRAO, f'{crawler.spidercls.name}_{timestamp}.ndjson')
+        extensao = cls(
+            crawler,
+            intervalo=settings.getfloat('MEMORY_MONITOR_INTERVAL', 60.0),
+            a_cada_itens=settings.getint('MEMORY_MONITOR_ITEMS', 0),
+            quadros=settings.getint('MEMORY_MONITOR_TRACEMALLOC_FRAMES', 1),
+            top=settings.getint('MEMORY_MONITOR_TOP', 10),
+            aquecimento=settings.getfloat('MEMORY_MONITOR_WARMUP', 60.0),
+            crescimento_maximo=settings.getfloat('MEMORY_MONITOR_MAX_GROWTH', 0.0),
+            arquivo=arquivo,
+        )
+        crawler.signals.connect(extensao.spider_opened, signal=signals.spider_opened)
+        crawler.signals.connect(extensao.spider_closed, signal=signals.spider_closed)
+        if extensao.a_cada_itens:
+            crawler.signals.connect(extensao.item_scraped, signal=signals.item_scraped)
+        return extensao
+
+    def spider_opened(self, spider):
+        self.inicio = time.monotonic()
+        if self.quadros and not tracemalloc.is_tracing():
+            tracemalloc.start(self.quadros)
+            self._iniciou_tracemalloc = True
+        if tracemalloc.is_tracing():
+            self.base = self._snapshot_tracemalloc()
+        os.makedirs(os.path.dirname(self.arquivo) or '.', exist_ok=True)
+        logger.info(f'Relatório de memória em {self.arquivo}')
+        if self.intervalo:
+            self._tarefa = task.LoopingCall(self.registrar)
+            self._tarefa.start(self.intervalo, now=False)
+
+    def item_scraped(self, item, spider):
+        self.itens += 1
+        if self.itens % self.a_cada_itens == 0:
+            self.registrar()
+
+    @staticmethod
+    def _snapshot_tracemalloc():
+        # Respostas e seletores formam ciclos de referência: sem a coleta, o
+        # snapshot mede o lixo ainda não coletado e o crescimento oscila
+        gc.collect()
+        return tracemalloc.take_snapshot().filter_traces(memoria.FILTROS)
+
+    def _scheduler(self):
+        slot = getattr(self.crawler.engine, 'slot', None)
+        scheduler = getattr(slot, 'scheduler', None)
+        return len(scheduler) if scheduler is not None and hasattr(scheduler, '__len__') else 0
+
+    def medir(self):
+        """Registro de memória do momento atual (e, depois do aquecimento, a base dos locais que crescem)"""
+        segundos = time.monotonic() - self.inicio
+        rss = memoria.rss_mb()
+        self.rss_maximo = max(self.rss_maximo, rss)
+        registro = {
+            'momento': datetime.datetime.now().isoformat(timespec='seconds'),
+            'segundos': round(segundos, 3),
+            'itens': self.stats.get_value('item_scraped_count', 0),
+            'rss_mb': round(rss, 1),
+            'objetos': memoria.contar_objetos(),
+            'scheduler': self._scheduler(),
+        }
+        if segundos >= self.aquecimento:
+            self.pontos.append((segundos / 60, rss))
+        if self.base is not None and tracemalloc.is_tracing():
+            snapshot = self._snapshot_tracemalloc()
+            atual, pico = tracemalloc.get_traced_memory()
+            registro['tracemalloc'] = {
+                'atual_mb': round(atual / memoria.MB, 1),
+                'pico_mb': round(pico / memoria.MB, 1),
+                'por_pacote': memoria.por_pacote(snapshot),
+                'crescimento': memoria.crescimento(snapshot, self.base, self.top),
+            }
+            if segundos >= self.aquecimento and not self._base_aquecida:
+                # Daqui em diante, só o que cresce depois do aquecimento
+                self.base = snapshot
+                self._base_aquecida = True
+        registro['crescimento_mb_por_minuto'] = self.crescimento_mb_por_minuto()
+        return registro
+
+    def crescimento_mb_por_minuto(self):
+        inclinacao = memoria.inclinacao(self.pontos)
+        return None if inclinacao is None else round(inclinacao, 3)
+
+    def registrar(self):
+        registro = self.medir()
+        with open(self.arquivo, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        objetos = ', '.join(f'{classe} {quantidade}' for classe, quantidade in registro['objetos'].items())
+        mensagem = f"Memória: RSS {registro['rss_mb']} MB, scheduler {registro['scheduler']}, {objetos or 'sem objetos'}"
+        crescendo = registro.get('tracemalloc', {}).get('crescimento', [])[:3]
+        if crescendo:
+            mensagem += '; mais cresceram: ' + ', '.join(f"{c['local']} +{c['kb']} KB" for c in crescendo)
+        logger.info(mensagem)
+        self._verificar_crescimento(registro['crescimento_mb_por_minuto'])
+        return registro
+
+    def _verificar_crescimento(self, taxa):
+        if not self.crescimento_maximo or self._fechando or len(self.pontos) < 3 or taxa is None:
+            return
+        if taxa > self.crescimento_maximo:
+            self._fechando = True
+            logger.error(f'Memória crescendo {taxa} MB/min, acima do limite de {self.crescimento_maximo} MB/min')
+            # Sem novos snapshots enquanto o spider esvazia: o fechamento grava o último
+            if self._tarefa is not None and self._tarefa.running:
+                self._tarefa.stop()
+            self.crawler.engine.close_spider(self.crawler.spider, self.MOTIVO_SOAK)
+
+    def spider_closed(self, spider, reason):
+        if self._tarefa is not None and self._tarefa.running:
+            self._tarefa.stop()
+        # O spider já está fechando: o último registro não pede outro fechamento
+        self._fechando = True
+        registro = self.registrar()
+        self.stats.set_value('memoria/rss_mb_max', round(self.rss_maximo, 1))
+        self.stats.set_value('memoria/rss_mb_final', registro['rss_mb'])
+        if registro['crescimento_mb_por_minuto'] is not None:
+            self.stats.set_value('memoria/crescimento_mb_por_minuto', registro['crescimento_mb_por_minuto'])
+        self.base = None
+        if self._iniciou_tracemalloc:
+            tracemalloc.stop()
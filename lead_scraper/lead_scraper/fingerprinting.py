@@ -0,0 +1,42 @@
+# Fingerprint de requisições (REQUEST_FINGERPRINTER_CLASS)
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/request-response.html#request-fingerprints
+
+import hashlib
+from weakref import WeakKeyDictionary
+
+from scrapy.utils.request import RequestFingerprinter
+
+from lead_scraper.utils.normalizacao import chave_consulta
+
+
+class QueryRequestFingerprinter:
+    """
+    Fingerprint das buscas do Bing Maps pela consulta normalizada (termo,
+    bairro, cidade, estado e página, sem acentos, caixa ou espaços extras),
+    em vez da URL. "Centro" e " centro" geram o mesmo fingerprint e o
+    dupefilter do Scrapy descarta a segunda requisição, contando-a em
+    dupefilter/filtered. Vale para qualquer origem das requisições: lista de
+    bairros, fan-out ou vários termos na mesma execução.
+
+    Requisições sem o parâmetro q (ou que não sejam GET) usam o fingerprint
+    padrão do Scrapy.
+    """
+
+    def __init__(self, crawler=None):
+        self._padrao = RequestFingerprinter(crawler)
+        self._cache = WeakKeyDictionary()
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        return cls(crawler)
+
+    def fingerprint(self, request):
+        if request not in self._cache:
+            chave = chave_consulta(request.url) if request.method == 'GET' else None
+            if chave is None:
+                self._cache[request] = self._padrao.fingerprint(request)
+            else:
+                self._cache[request] = hashlib.sha1(f'consulta:{chave}'.encode('utf-8')).digest()
+        return self._cache[request]
@@ -0,0 +1,220 @@
+"""
+Fila compartilhada de consultas (frontier) para vários workers.
+
+As consultas de um plano grande entram uma vez na fila; cada worker
+(`scrapy crawl bing_maps -s FRONTIER_ENABLED=True`, em qualquer máquina que
+enxergue o backend) arrenda lotes, renova o arrendamento enquanto trabalha e
+confirma cada consulta depois que os itens dela foram exportados. Um
+arrendamento não renovado vence depois do tempo de visibilidade e a consulta
+volta para a fila: um worker que morre não perde consultas.
+
+O backend é plugável (FRONTIER_BACKEND). Ele implementa from_settings(settings,
+nome_spider), adicionar, arrendar, renovar, confirmar, devolver, em_aberto,
+resumo e close, com a semântica do SQLiteFrontier, o backend local.
+
+Uso (a partir de lead_scraper/, onde fica o scrapy.cfg):
+
+    python -m lead_scraper.frontier --termos academias,padarias --estado RS --cidades "*"
+    scrapy crawl bing_maps -s FRONTIER_ENABLED=True   # em cada worker
+    python -m lead_scraper.frontier --resumo
+"""
+import argparse
+import os
+import sqlite3
+import time
+
+PENDENTE = 'pendente'
+ARRENDADA = 'arrendada'
+CONCLUIDA = 'concluida'
+FALHOU = 'falhou'
+
+# Padrão da fila local: data/frontier/<spider>.sqlite na raiz do repositório
+FRONTIER_DIR_PADRAO = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'frontier')
+)
+
+
+def _lotes(valores, tamanho=500):
+    # Limite de parâmetros por instrução do SQLite
+    valores = list(valores)
+    for inicio in range(0, len(valores), tamanho):
+        yield valores[inicio:inicio + tamanho]
+
+
+class SQLiteFrontier:
+    """
+    Frontier em um arquivo SQLite em modo WAL, para vários processos na mesma
+    máquina (SQLite em sistema de arquivos de rede não é seguro: entre
+    máquinas, use outro backend com a mesma interface).
+
+    Cada consulta é uma linha com a chave normalizada (a mesma do fingerprint
+    e do checkpoint), a situação (pendente, arrendada, concluida, falhou), o
+    worker dono do arrendamento e quando ele vence. O arrendamento de um lote
+    acontece em uma transação BEGIN IMMEDIATE: dois workers nunca recebem a
+    mesma consulta enquanto o arrendamento vale. Uma consulta arrendada
+    max_tentativas vezes sem confirmação é marcada como falhou.
+    """
+
+    def __init__(self, caminho, max_tentativas=3):
+        self.caminho = caminho
+        self.max_tentativas = max_tentativas
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        # isolation_level=None: as transações são abertas explicitamente
+        self.conn = sqlite3.connect(caminho, timeout=30, isolation_level=None)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        self.conn.execute(
+            'CREATE TABLE IF NOT EXISTS consultas ('
+            ' id INTEGER PRIMARY KEY, chave TEXT NOT NULL UNIQUE,'
+            ' termo TEXT NOT NULL, estado TEXT NOT NULL, cidade TEXT NOT NULL, bairro TEXT NOT NULL,'
+            ' situacao TEXT NOT NULL, worker TEXT, expira_em REAL, tentativas INTEGER NOT NULL DEFAULT 0)'
+        )
+        self.conn.execute('CREATE INDEX IF NOT EXISTS consultas_situacao ON consultas (situacao, id)')
+
+    @classmethod
+    def from_settings(cls, settings, nome_spider):
+        caminho = settings.get('FRONTIER_PATH') or os.path.join(FRONTIER_DIR_PADRAO, f'{nome_spider}.sqlite')
+        return cls(caminho, max_tentativas=settings.getint('FRONTIER_MAX_ATTEMPTS', 3))
+
+    def _transacao(self, funcao, *args):
+        self.conn.execute('BEGIN IMMEDIATE')
+        try:
+            resultado = funcao(*args)
+        except BaseException:
+            self.conn.execute('ROLLBACK')
+            raise
+        self.conn.execute('COMMIT')
+        return resultado
+
+    def adicionar(self, consultas):
+        """Enfileira (chave, (termo, estado, cidade, bairro)); chaves já na fila são ignoradas. Retorna quantas entraram"""
+        def inserir():
+            antes = self.conn.total_changes
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO consultas (chave, termo, estado, cidade, bairro, situacao) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                ((chave, *consulta, PENDENTE) for chave, consulta in consultas),
+            )
+            return self.conn.total_changes - antes
+        return self._transacao(inserir)
+
+    def arrendar(self, worker, quantidade, visibilidade):
+        """Arrenda até quantidade consultas pendentes ou com arrendamento vencido. Retorna [(chave, consulta)]"""
+        def arrendar():
+            agora = time.time()
+            self.conn.execute(
+                'UPDATE consultas SET situacao = ?, worker = NULL, expira_em = NULL '
+                'WHERE situacao = ? AND expira_em < ? AND tentativas >= ?',
+                (FALHOU, ARRENDADA, agora, self.max_tentativas),
+            )
+            linhas = self.conn.execute(
+                'SELECT id, chave, termo, estado, cidade, bairro FROM consultas '
+                'WHERE situacao = ? OR (situacao = ? AND expira_em < ?) ORDER BY id LIMIT ?',
+                (PENDENTE, ARRENDADA, agora, quantidade),
+            ).fetchall()
+            self.conn.executemany(
+                'UPDATE consultas SET situacao = ?, worker = ?, expira_em = ?, tentativas = tentativas + 1 '
+                'WHERE id = ?',
+                ((ARRENDADA, worker, agora + visibilidade, linha[0]) for linha in linhas),
+            )
+            return [(linha[1], tuple(linha[2:])) for linha in linhas]
+        return self._transacao(arrendar)
+
+    def renovar(self, worker, chaves, visibilidade):
+        """Estende os arrendamentos ainda do worker. Retorna as chaves renovadas"""
+        def renovar():
+            expira_em = time.time() + visibilidade
+            renovadas = []
+            for lote in _lotes(chaves):
+                marcadores = ','.join('?' * len(lote))
+                self.conn.execute(
+                    f'UPDATE consultas SET expira_em = ? WHERE worker = ? AND situacao = ? AND chave IN ({marcadores})',
+                    (expira_em, worker, ARRENDADA, *lote),
+                )
+                renovadas += [linha[0] for linha in self.conn.execute(
+                    f'SELECT chave FROM consultas WHERE worker = ? AND situacao = ? AND chave IN ({marcadores})',
+                    (worker, ARRENDADA, *lote),
+                )]
+            return renovadas
+        return self._transacao(renovar)
+
+    def confirmar(self, chaves):
+        """
+        Marca as consultas como concluídas, mesmo se o arrendamento já venceu:
+        os itens delas já foram exportados. Retorna quantas foram confirmadas.
+        """
+        def confirmar():
+            antes = self.conn.total_changes
+            for lote in _lotes(chaves):
+                self.conn.execute(
+                    f'UPDATE consultas SET situacao = ?, worker = NULL, expira_em = NULL '
+                    f'WHERE situacao != ? AND chave IN ({",".join("?" * len(lote))})',
+                    (CONCLUIDA, CONCLUIDA, *lote),
+                )
+            return self.conn.total_changes - antes
+        return self._transacao(confirmar)
+
+    def devolver(self, worker, chaves):
+        """Devolve à fila consultas arrendadas pelo worker e não concluídas (falhou após max_tentativas)"""
+        def devolver():
+            for lote in _lotes(chaves):
+                self.conn.execute(
+                    f'UPDATE consultas SET situacao = CASE WHEN tentativas >= ? THEN ? ELSE ? END, '
+                    f'worker = NULL, expira_em = NULL '
+                    f'WHERE worker = ? AND situacao = ? AND chave IN ({",".join("?" * len(lote))})',
+                    (self.max_tentativas, FALHOU, PENDENTE, worker, ARRENDADA, *lote),
+                )
+        self._transacao(devolver)
+
+    def em_aberto(self):
+        """Consultas pendentes ou arrendadas: enquanto houver, um worker ocioso ainda pode receber trabalho"""
+        return self.conn.execute(
+            'SELECT COUNT(*) FROM consultas WHERE situacao IN (?, ?)', (PENDENTE, ARRENDADA)
+        ).fetchone()[0]
+
+    def resumo(self):
+        resumo = dict.fromkeys((PENDENTE, ARRENDADA, CONCLUIDA, FALHOU), 0)
+        resumo.update(self.conn.execute('SELECT situacao, COUNT(*) FROM consultas GROUP BY situacao'))
+        return resumo
+
+    def close(self):
+        self.conn.close()
+
+
+def main(argv=None):
+    from scrapy.utils.misc import load_object
+    from scrapy.utils.project import get_project_settings
+
+    from lead_scraper.run import _lista, _setting, chave, montar_plano, termos_dos_argumentos
+
+    parser = argparse.ArgumentParser(description='Enfileira um plano de consultas na frontier compartilhada')
+    parser.add_argument('--termos', default='', help='Termos separados por vírgula')
+    parser.add_argument('--termos-arquivo', default='', help='Arquivo com um termo por linha')
+    parser.add_argument('--estado', default='RS', help="UF ou '*' para todas")
+    parser.add_argument('--cidades', default='Porto Alegre', help="Cidades separadas por vírgula ou '*'")
+    parser.add_argument('--bairros', default='', help='Bairros separados por vírgula')
+    parser.add_argument('--resumo', action='store_true', help='Só mostra a situação da fila')
+    parser.add_argument('--spider', default='bing_maps')
+    parser.add_argument('-s', '--set', dest='settings', action='append', type=_setting, default=[],
+                        metavar='NOME=VALOR', help='Setting do Scrapy (ex.: FRONTIER_PATH)')
+    args = parser.parse_args(argv)
+    termos = termos_dos_argumentos(args)
+    if not (termos or args.resumo):
+        parser.error('informe --termos, --termos-arquivo ou --resumo')
+
+    settings = get_project_settings()
+    settings.setdict(dict(args.settings), priority='cmdline')
+    backend = load_object(settings.get('FRONTIER_BACKEND'))
+    frontier = backend.from_settings(settings, args.spider)
+    try:
+        if termos:
+            plano = montar_plano(termos, args.estado, _lista(args.cidades), _lista(args.bairros))
+            novas = frontier.adicionar((chave(consulta), consulta) for consulta in plano)
+            print(f'{novas} consultas novas enfileiradas ({len(plano) - novas} já estavam na fila)')
+        print(', '.join(f'{situacao}: {quantidade}' for situacao, quantidade in frontier.resumo().items()))
+    finally:
+        frontier.close()
+
+
+if __name__ == '__main__':
+    main()
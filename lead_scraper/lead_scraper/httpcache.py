@@ -0,0 +1,280 @@
+# Armazenamento do cache HTTP do Scrapy (HTTPCACHE_STORAGE)
+#
+# See documentation in:
+# https://docs.scrapy.org/en/latest/topics/downloader-middleware.html#httpcache-middleware-settings
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from collections import OrderedDict
+
+from scrapy.http import Headers
+from scrapy.responsetypes import responsetypes
+from scrapy.utils.project import data_path
+
+from lead_scraper.middlewares import (
+    CODIGOS_BLOQUEIO_PADRAO, MARCADORES_BLOQUEIO_PADRAO, OK, VAZIA, classificar_resposta,
+)
+from lead_scraper.utils.normalizacao import chave_consulta
+
+logger = logging.getLogger(__name__)
+
+# magic, tipo, tamanho da chave, tamanho dos dados, timestamp
+_REGISTRO = struct.Struct('<4sBIId')
+_MAGIC = b'LFPK'
+_CORPO = 1
+_ENTRADA = 2
+
+
+class PackFileCacheStorage:
+    """
+    Cache HTTP em um único pack file append-only por spider, com índice.
+
+    As respostas são indexadas pela busca normalizada (termo, bairro, cidade,
+    estado e página, extraídos do parâmetro q), não pela URL crua. Os corpos
+    são endereçados pelo conteúdo (sha256) e comprimidos com zlib: páginas
+    idênticas são gravadas uma vez só.
+
+    O pack guarda dois tipos de registro: corpos e entradas (chave -> corpo,
+    com URL, status e headers). O índice é salvo em <spider>.idx ao fechar; se
+    estiver ausente ou desatualizado (ex.: execução interrompida), é
+    reconstruído varrendo o pack.
+
+    - HTTPCACHE_EXPIRATION_SECS: TTL das entradas (0 = sem expiração).
+    - HTTPCACHE_PACK_MAX_BYTES: limite dos dados vivos; as entradas usadas há
+      mais tempo são descartadas (LRU). O espaço morto é compactado ao fechar.
+    - HTTPCACHE_IGNORE_MISSING: modo offline (replay). Requisições fora do
+      cache são ignoradas pelo middleware e o TTL deixa de valer.
+
+    Só são armazenadas as respostas que o ResponseGuardMiddleware classifica
+    como ok ou vazia: bloqueios, erros de RETRY_HTTP_CODES e páginas
+    truncadas ficam de fora. O cache (900) grava antes de o guard (550)
+    classificar a resposta; sem isso, as novas tentativas e os replays
+    receberiam a página ruim do cache.
+    """
+
+    def __init__(self, settings):
+        self.cachedir = data_path(settings['HTTPCACHE_DIR'], createdir=True)
+        self.offline = settings.getbool('HTTPCACHE_IGNORE_MISSING')
+        self.expiration_secs = 0 if self.offline else settings.getint('HTTPCACHE_EXPIRATION_SECS')
+        self.max_bytes = settings.getint('HTTPCACHE_PACK_MAX_BYTES', 0)
+        self.nivel_compressao = settings.getint('HTTPCACHE_PACK_COMPRESSION_LEVEL', 6)
+        self.codigos_bloqueio = {int(codigo) for codigo in settings.getlist('RESPONSE_BLOCK_CODES', CODIGOS_BLOQUEIO_PADRAO)}
+        self.codigos_erro = {int(codigo) for codigo in settings.getlist('RETRY_HTTP_CODES')}
+        self.marcadores_bloqueio = [
+            marcador.lower().encode('utf-8')
+            for marcador in settings.getlist('RESPONSE_BLOCK_MARKERS', MARCADORES_BLOQUEIO_PADRAO)
+        ]
+
+    def open_spider(self, spider):
+        self.stats = spider.crawler.stats
+        self._fingerprinter = spider.crawler.request_fingerprinter
+        self.caminho_pack = os.path.join(self.cachedir, f'{spider.name}.pack')
+        self.caminho_indice = os.path.join(self.cachedir, f'{spider.name}.idx')
+        # corpos: sha256 -> [offset dos dados, tamanho comprimido, tamanho original, referências]
+        self.corpos = {}
+        # entradas em ordem de uso (LRU): chave -> (offset dos dados, tamanho, timestamp, sha256)
+        self.entradas = OrderedDict()
+        self.bytes_vivos = 0
+        self.descartadas = 0
+
+        modo = 'r+b' if os.path.exists(self.caminho_pack) else 'w+b'
+        self._pack = open(self.caminho_pack, modo)
+        if not self._carregar_indice():
+            self._varrer_pack()
+        logger.debug(f'Cache em {self.caminho_pack}: {len(self.entradas)} entradas, {len(self.corpos)} corpos')
+
+    def close_spider(self, spider):
+        tamanho_pack = self._pack.seek(0, os.SEEK_END)
+        if tamanho_pack > 2 * self.bytes_vivos and tamanho_pack > 1024 * 1024:
+            self._compactar()
+        self._salvar_indice()
+        self._pack.close()
+
+        hits = self.stats.get_value('httpcache/hit', 0)
+        total = hits + self.stats.get_value('httpcache/miss', 0)
+        if total:
+            self.stats.set_value('httpcache/hit_ratio', round(hits / total, 4))
+        self.stats.set_value('httpcache/pack_bytes', os.path.getsize(self.caminho_pack))
+        self.stats.set_value('httpcache/evicted', self.descartadas)
+
+    def _chave(self, request):
+        return chave_consulta(request.url) or self._fingerprinter.fingerprint(request).hex()
+
+    def retrieve_response(self, spider, request):
+        chave = self._chave(request)
+        entrada = self.entradas.get(chave)
+        if entrada is None:
+            return None
+        offset, tamanho, timestamp, sha = entrada
+        if 0 < self.expiration_secs < time.time() - timestamp:
+            return None
+
+        metadados = json.loads(self._ler(offset, tamanho))
+        offset_corpo, tamanho_corpo, _, _ = self.corpos[sha]
+        corpo = zlib.decompress(self._ler(offset_corpo, tamanho_corpo))
+        self.entradas.move_to_end(chave)
+        self.stats.inc_value('httpcache/bytes_saved', len(corpo))
+
+        headers = Headers(metadados['headers'])
+        url = metadados['url']
+        respcls = responsetypes.from_args(headers=headers, url=url, body=corpo)
+        return respcls(url=url, headers=headers, status=metadados['status'], body=corpo)
+
+    def store_response(self, spider, request, response):
+        classificacao = classificar_resposta(request, response, self.codigos_bloqueio, self.codigos_erro,
+                                             self.marcadores_bloqueio)
+        if classificacao not in (OK, VAZIA):
+            self.stats.inc_value(f'httpcache/not_stored/{classificacao}')
+            return
+        chave = self._chave(request)
+        sha = hashlib.sha256(response.body).hexdigest()
+        agora = time.time()
+        if sha not in self.corpos:
+            comprimido = zlib.compress(response.body, self.nivel_compressao)
+            offset = self._gravar(_CORPO, sha, comprimido, agora)
+            self.corpos[sha] = [offset, len(comprimido), len(response.body), 0]
+            self.bytes_vivos += len(comprimido)
+
+        metadados = json.dumps({
+            'url': response.url,
+            'status': response.status,
+            'headers': {
+                k.decode('latin1'): [v.decode('latin1') for v in vs] for k, vs in response.headers.items()
+            },
+            'corpo': sha,
+        }).encode('utf-8')
+        offset = self._gravar(_ENTRADA, chave, metadados, agora)
+        self._indexar_entrada(chave, (offset, len(metadados), agora, sha))
+        self._pack.flush()
+        self._descartar_excedente()
+
+    def _indexar_entrada(self, chave, entrada):
+        anterior = self.entradas.pop(chave, None)
+        if anterior is not None:
+            self._liberar(anterior)
+        self.entradas[chave] = entrada
+        self.corpos[entrada[3]][3] += 1
+        self.bytes_vivos += entrada[1]
+
+    def _liberar(self, entrada):
+        _, tamanho, _, sha = entrada
+        self.bytes_vivos -= tamanho
+        corpo = self.corpos[sha]
+        corpo[3] -= 1
+        if corpo[3] == 0:
+            del self.corpos[sha]
+            self.bytes_vivos -= corpo[1]
+
+    def _descartar_excedente(self):
+        while self.max_bytes and self.bytes_vivos > self.max_bytes and len(self.entradas) > 1:
+            _, entrada = self.entradas.popitem(last=False)
+            self._liberar(entrada)
+            self.descartadas += 1
+
+    def _gravar(self, tipo, chave, dados, timestamp):
+        chave = chave.encode('utf-8')
+        self._pack.seek(0, os.SEEK_END)
+        self._pack.write(_REGISTRO.pack(_MAGIC, tipo, len(chave), len(dados), timestamp))
+        self._pack.write(chave)
+        offset = self._pack.tell()
+        self._pack.write(dados)
+        return offset
+
+    def _ler(self, offset, tamanho):
+        self._pack.seek(offset)
+        return self._pack.read(tamanho)
+
+    def _varrer_pack(self):
+        """Reconstrói o índice lendo os registros do pack; descarta um registro final incompleto"""
+        tamanho_arquivo = self._pack.seek(0, os.SEEK_END)
+        self._pack.seek(0)
+        posicao = 0
+        while True:
+            cabecalho = self._pack.read(_REGISTRO.size)
+            if len(cabecalho) < _REGISTRO.size:
+                break
+            magic, tipo, tamanho_chave, tamanho_dados, timestamp = _REGISTRO.unpack(cabecalho)
+            if magic != _MAGIC:
+                break
+            chave = self._pack.read(tamanho_chave)
+            offset = self._pack.tell()
+            if len(chave) != tamanho_chave or offset + tamanho_dados > tamanho_arquivo:
+                break
+            if tipo == _ENTRADA:
+                dados = self._pack.read(tamanho_dados)
+            else:
+                self._pack.seek(tamanho_dados, os.SEEK_CUR)
+            try:
+                if tipo == _CORPO:
+                    sha = chave.decode('utf-8')
+                    if sha not in self.corpos:
+                        self.corpos[sha] = [offset, tamanho_dados, None, 0]
+                        self.bytes_vivos += tamanho_dados
+                else:
+                    sha = json.loads(dados)['corpo']
+                    self._indexar_entrada(chave.decode('utf-8'), (offset, tamanho_dados, timestamp, sha))
+            except (ValueError, KeyError):
+                break
+            posicao = self._pack.tell()
+
+        if posicao < tamanho_arquivo:
+            logger.warning(f'Cache {self.caminho_pack}: registro incompleto no fim do arquivo descartado')
+            self._pack.truncate(posicao)
+        # Corpos sem nenhuma entrada (ex.: entrada perdida na interrupção) não contam como vivos
+        for sha in [sha for sha, corpo in self.corpos.items() if corpo[3] == 0]:
+            self.bytes_vivos -= self.corpos.pop(sha)[1]
+        self._descartar_excedente()
+
+    def _carregar_indice(self):
+        try:
+            with gzip.open(self.caminho_indice, 'rt', encoding='utf-8') as f:
+                indice = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if indice.get('pack_bytes') != os.path.getsize(self.caminho_pack):
+            return False
+        self.corpos = {sha: list(corpo) for sha, corpo in indice['corpos'].items()}
+        self.entradas = OrderedDict((chave, tuple(entrada)) for chave, entrada in indice['entradas'])
+        self.bytes_vivos = indice['bytes_vivos']
+        return True
+
+    def _salvar_indice(self):
+        temporario = f'{self.caminho_indice}.tmp'
+        with gzip.open(temporario, 'wt', encoding='utf-8') as f:
+            json.dump({
+                'pack_bytes': self._pack.seek(0, os.SEEK_END),
+                'bytes_vivos': self.bytes_vivos,
+                'corpos': self.corpos,
+                'entradas': list(self.entradas.items()),
+            }, f)
+        os.replace(temporario, self.caminho_indice)
+
+    def _compactar(self):
+        """Regrava o pack apenas com os registros vivos, na ordem do LRU"""
+        temporario = f'{self.caminho_pack}.tmp'
+        corpos, entradas = {}, OrderedDict()
+        with open(temporario, 'w+b') as novo:
+            pack_antigo, self._pack = self._pack, novo
+            for chave, (offset, tamanho, timestamp, sha) in self.entradas.items():
+                if sha not in corpos:
+                    offset_corpo, tamanho_corpo, original, refs = self.corpos[sha]
+                    dados = _ler_de(pack_antigo, offset_corpo, tamanho_corpo)
+                    corpos[sha] = [self._gravar(_CORPO, sha, dados, timestamp), tamanho_corpo, original, refs]
+                dados = _ler_de(pack_antigo, offset, tamanho)
+                entradas[chave] = (self._gravar(_ENTRADA, chave, dados, timestamp), tamanho, timestamp, sha)
+        pack_antigo.close()
+        os.replace(temporario, self.caminho_pack)
+        self._pack = open(self.caminho_pack, 'r+b')
+        self.corpos, self.entradas = corpos, entradas
+        logger.info(f'Cache {self.caminho_pack} compactado: {os.path.getsize(self.caminho_pack)} bytes')
+
+
+def _ler_de(arquivo, offset, tamanho):
+    arquivo.seek(offset)
+    return arquivo.read(tamanho)
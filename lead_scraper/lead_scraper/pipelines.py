@@ -1,34 +1,699 @@
 import openpyxl
+from openpyxl.utils import get_column_letter
 import datetime
 import os
+import csv
+import glob
+import hashlib
+import json
+import logging
+import sqlite3
+import sys
+import io
+import gzip
+import time
+import zlib
+
+from scrapy.exceptions import NotConfigured, DropItem
+
+from lead_scraper.extensions import checkpoint_gravando
+from lead_scraper.utils.bloom import BloomFilter
+from lead_scraper.utils.checkpoint import CheckpointJournal, caminho_checkpoint
+from lead_scraper.utils.normalizacao import chave_lead
+
+try:
+    import pyarrow
+    import pyarrow.parquet
+except ImportError:
+    pyarrow = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None  # type: ignore[assignment]
+
+logger = logging.getLogger(__name__)
+
+CABECALHOS = ["Termo", "Estado", "Cidade", "Bairro", "Nome", "Endereço", "Telefone", "Website"]
+CAMPOS = ['termo_busca', 'estado', 'cidade', 'bairro', 'nome', 'endereco', 'telefone', 'website']
+
+# Limite de linhas de uma planilha do Excel (inclui a linha de cabeçalho)
+EXCEL_MAX_LINHAS = 1048576
+
+_COLUNAS_EXCEL = [get_column_letter(i + 1) for i in range(len(CABECALHOS))]
+
+
+def workbook_streaming(titulo='Resultados'):
+    """
+    Workbook write_only do openpyxl e sua planilha: as linhas vão para um
+    arquivo temporário à medida que são adicionadas, com as strings inline,
+    e o .xlsx só é montado no save().
+    """
+    workbook = openpyxl.Workbook(write_only=True)
+    return workbook, workbook.create_sheet(titulo)
+
+
+def recuperar_exportacao_parcial(caminho_journal, destino=None):
+    """
+    Converte o journal CSV deixado por uma execução interrompida no modo
+    streaming em um arquivo .xlsx. Retorna o caminho do arquivo gerado.
+    """
+    if destino is None:
+        destino = caminho_journal.replace('.parcial.csv', '.recuperado.xlsx')
+    workbook, sheet = workbook_streaming()
+    with open(caminho_journal, newline='', encoding='utf-8') as f:
+        for linha in csv.reader(f):
+            sheet.append(linha)
+    workbook.save(destino)
+    return destino
+
+
+def pasta_resultados(pasta=None):
+    """Retorna (e cria, se necessário) a pasta de saída dos arquivos exportados"""
+    # Cria o caminho absoluto baseado no local da pipeline.py
+    pasta = pasta or os.path.abspath(
+        os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+    )
+    os.makedirs(pasta, exist_ok=True)
+    return pasta
+
+
+def _sha256(caminho):
+    digest = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(bloco)
+    return digest.hexdigest()
+
 
 class ExcelExportPipeline:
+    def __init__(self, streaming=False, journal=True, journal_flush_items=100, results_folder=None,
+                 max_rows=0, max_bytes=0, execucao=None):
+        self.streaming = streaming
+        self.journal = journal
+        self.journal_flush_items = journal_flush_items
+        self._results_folder = results_folder
+        self.max_rows = max_rows
+        self.max_bytes = max_bytes
+        # Rollover por linhas ou bytes: cada parte é fechada assim que enche,
+        # o que exige o writer em streaming
+        self.sharding = bool(max_rows or max_bytes)
+        # (id, retomada) da execução registrada pela extensão Checkpoint: a
+        # saída sempre vai para partes com o id da execução, e uma retomada
+        # continua a numeração em vez de sobrescrever as partes anteriores
+        self.execucao = execucao
+        if execucao:
+            self.sharding = True
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        execucao = None
+        if settings.getbool('CHECKPOINT_ENABLED'):
+            journal = CheckpointJournal(caminho_checkpoint(settings, crawler.spidercls.name))
+            execucao = journal.execucao()
+            journal.close()
+        pipeline = cls(
+            streaming=settings.getbool('EXCEL_EXPORT_STREAMING'),
+            journal=settings.getbool('EXCEL_EXPORT_JOURNAL', True),
+            journal_flush_items=settings.getint('EXCEL_EXPORT_JOURNAL_FLUSH_ITEMS', 100),
+            results_folder=settings.get('EXCEL_EXPORT_DIR'),
+            max_rows=settings.getint('EXCEL_EXPORT_MAX_ROWS', 0),
+            max_bytes=settings.getint('EXCEL_EXPORT_MAX_BYTES', 0),
+            execucao=execucao,
+        )
+        crawler.signals.connect(pipeline.sincronizar, signal=checkpoint_gravando)
+        return pipeline
+
     def open_spider(self, spider):
-        self.workbook = openpyxl.Workbook()
-        self.sheet = self.workbook.active
-        self.sheet.title = "Resultados"
-        self.sheet.append(["Termo", "Estado", "Cidade", "Bairro", "Nome", "Endereço", "Telefone", "Website"])
-        
-         # Cria o caminho absoluto baseado no local da pipeline.py
-        self.results_folder = os.path.abspath(
-            os.path.join(os.path.dirname(__file__), '..', '..', 'data')
+        self.results_folder = pasta_resultados(self._results_folder)
+
+        if self.streaming or self.sharding:
+            self._abrir_streaming()
+        else:
+            self.workbook = openpyxl.Workbook()
+            self.sheet = self.workbook.active
+            self.sheet.title = "Resultados"
+            self.sheet.append(CABECALHOS)
+
+    def _abrir_streaming(self):
+        # No modo streaming as linhas vão para o disco à medida que chegam,
+        # então o nome do arquivo é definido na abertura
+        self.timestamp = self.execucao[0] if self.execucao else datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.partes = []
+        self.workbook_parte = None
+        self.writer = None
+        self.journal_path = None
+        self._journal_file = None
+        # A linha de cabeçalho ocupa uma das linhas da planilha
+        limite_excel = EXCEL_MAX_LINHAS - 1
+        self._limite_linhas = min(self.max_rows, limite_excel) if self.max_rows else limite_excel
+        if self.execucao and self.execucao[1]:
+            self._retomar_partes()
+        self._abrir_parte()
+
+    def _retomar_partes(self):
+        """Recupera as partes da execução interrompida: manifesto, journals CSV e partes fora do manifesto"""
+        prefixo = os.path.join(self.results_folder, f"leads_{self.timestamp}")
+        try:
+            with open(f"{prefixo}_manifest.json", encoding='utf-8') as f:
+                self.partes = json.load(f)['partes']
+        except (OSError, ValueError, KeyError):
+            self.partes = []
+
+        # Parte que estava aberta na interrupção: o journal CSV vira o .xlsx dela
+        for journal in sorted(glob.glob(f"{glob.escape(prefixo)}_part*.parcial.csv")):
+            caminho = recuperar_exportacao_parcial(journal, journal.replace('.parcial.csv', '.xlsx'))
+            with open(journal, newline='', encoding='utf-8') as f:
+                linhas = sum(1 for _ in csv.reader(f)) - 1
+            os.remove(journal)
+            self._registrar_parte(caminho, linhas)
+
+        # Parte fechada sem que o manifesto tenha sido regravado
+        conhecidas = {parte['arquivo'] for parte in self.partes}
+        for caminho in sorted(glob.glob(f"{glob.escape(prefixo)}_part*.xlsx")):
+            if os.path.basename(caminho) not in conhecidas:
+                workbook = openpyxl.load_workbook(caminho, read_only=True)
+                # O modo write_only não grava a dimensão da planilha: as linhas são contadas
+                linhas = sum(1 for _ in workbook.active.iter_rows(values_only=True)) - 1
+                workbook.close()
+                self._registrar_parte(caminho, linhas)
+
+        self.partes.sort(key=lambda parte: parte['arquivo'])
+        self._escrever_manifesto(completo=False)
+        logger.info(
+            f'Retomando a exportação leads_{self.timestamp}: {len(self.partes)} partes e '
+            f'{sum(parte["linhas"] for parte in self.partes)} linhas anteriores'
         )
-        os.makedirs(self.results_folder, exist_ok=True)
+
+    def _nome_parte(self, numero):
+        if self.sharding:
+            return f"leads_{self.timestamp}_part{numero:04d}"
+        return f"leads_{self.timestamp}"
+
+    def _abrir_parte(self):
+        nome = self._nome_parte(len(self.partes) + 1)
+        self.filepath = os.path.join(self.results_folder, f"{nome}.xlsx")
+        self.workbook_parte, self.writer = workbook_streaming()
+        self.writer.append(CABECALHOS)
+        self._linhas_parte = 0
+        # O .xlsx só é comprimido no save(): o tamanho da parte é estimado
+        # comprimindo os valores das linhas, com a referência de cada célula,
+        # à medida que chegam
+        self._compressor = zlib.compressobj(1) if self.max_bytes else None
+        self._bytes_parte = 0
+
+        # O xlsx só é legível depois de fechado; o journal CSV permite
+        # recuperar as linhas já escritas caso o processo seja interrompido
+        if self.journal:
+            self.journal_path = os.path.join(self.results_folder, f"{nome}.parcial.csv")
+            self._journal_file = open(self.journal_path, 'w', newline='', encoding='utf-8')
+            self._journal = csv.writer(self._journal_file)
+            self._journal.writerow(CABECALHOS)
+            self._journal_file.flush()
+        self._pendentes = 0
+
+    def _fechar_parte(self):
+        self.workbook_parte.save(self.filepath)
+        linhas = self._linhas_parte
+        self.workbook_parte = self.writer = self._compressor = None
+        if self._journal_file is not None:
+            # Parte fechada com sucesso: o journal não é mais necessário
+            self._journal_file.close()
+            self._journal_file = None
+            os.remove(self.journal_path)
+
+        if not self.sharding and linhas >= self._limite_linhas:
+            # Sem rollover configurado, mas a planilha atingiu o limite do
+            # Excel: o arquivo vira a primeira parte e as próximas seguem
+            logger.warning(
+                f'Limite de {self._limite_linhas} linhas do Excel atingido; '
+                f'dividindo a saída em partes'
+            )
+            self.sharding = True
+            caminho = os.path.join(self.results_folder, f"{self._nome_parte(1)}.xlsx")
+            os.replace(self.filepath, caminho)
+            self.filepath = caminho
+
+        self._registrar_parte(self.filepath, linhas)
+        if self.sharding:
+            self._escrever_manifesto(completo=False)
+
+    def _registrar_parte(self, caminho, linhas):
+        self.partes.append({
+            'arquivo': os.path.basename(caminho),
+            'linhas': linhas,
+            'bytes': os.path.getsize(caminho),
+            'sha256': _sha256(caminho),
+        })
+
+    def _parte_cheia(self):
+        if self._linhas_parte >= self._limite_linhas:
+            return True
+        return bool(self.max_bytes) and self._bytes_parte >= self.max_bytes
+
+    def _escrever_manifesto(self, completo):
+        # Escrita atômica: leitores nunca veem um manifesto pela metade
+        self.manifest_path = os.path.join(self.results_folder, f"leads_{self.timestamp}_manifest.json")
+        manifesto = {
+            'colunas': CABECALHOS,
+            'completo': completo,
+            'total_linhas': sum(parte['linhas'] for parte in self.partes),
+            'partes': self.partes,
+        }
+        temporario = f"{self.manifest_path}.tmp"
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(manifesto, f, ensure_ascii=False, indent=2)
+        os.replace(temporario, self.manifest_path)
+
+    def sincronizar(self):
+        """Descarrega o journal CSV (sinal checkpoint_gravando, antes de consultas serem dadas como concluídas)"""
+        if getattr(self, '_journal_file', None) is not None:
+            self._journal_file.flush()
+            self._pendentes = 0
 
     def process_item(self, item, spider):
-        self.sheet.append([
-            item['termo_busca'],
-            item['estado'],
-            item['cidade'],
-            item['bairro'],
-            item['nome'],
-            item['endereco'],
-            item['telefone'],
-            item['website']
-        ])
+        linha = [item[campo] for campo in CAMPOS]
+        if not (self.streaming or self.sharding):
+            self.sheet.append(linha)
+            return item
+
+        if self.writer is None:
+            self._abrir_parte()
+        self.writer.append(linha)
+        self._linhas_parte += 1
+        if self._compressor is not None:
+            numero = self._linhas_parte + 1
+            celulas = ''.join(f'{coluna}{numero}\t{valor}\t' for coluna, valor in zip(_COLUNAS_EXCEL, linha))
+            self._bytes_parte += len(self._compressor.compress(celulas.encode('utf-8')))
+        if self._journal_file is not None:
+            self._journal.writerow(linha)
+            self._pendentes += 1
+            if self._pendentes >= self.journal_flush_items:
+                self._journal_file.flush()
+                self._pendentes = 0
+        if self._parte_cheia():
+            self._fechar_parte()
         return item
 
+    def abortar(self):
+        """
+        Abandona a parte aberta sem gravar o .xlsx, como numa interrupção: a
+        planilha temporária é descartada e o journal CSV fica no disco para a
+        retomada.
+        """
+        if getattr(self, 'writer', None) is None:
+            return
+        # close() encerra o XML da planilha; cleanup() apaga o arquivo temporário
+        self.writer.close()
+        self.writer._writer.cleanup()
+        self.workbook_parte = self.writer = self._compressor = None
+        if self._journal_file is not None:
+            self._journal_file.close()
+            self._journal_file = None
+
     def close_spider(self, spider):
+        if self.streaming or self.sharding:
+            # Partes seguintes são abertas só quando chega uma nova linha, então
+            # o writer aberto aqui nunca é uma parte vazia após outra cheia
+            if self.writer is not None:
+                self._fechar_parte()
+            if self.sharding:
+                self._escrever_manifesto(completo=True)
+            return
+
         timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
         filepath = os.path.join(self.results_folder, f"leads_{timestamp}.xlsx")
         self.workbook.save(filepath)
+
+
+class ParquetExportPipeline:
+    """
+    Exporta os itens em formato colunar (Parquet) para consumo analítico.
+
+    Os itens são acumulados por coluna e gravados em record batches de
+    batch_size linhas (ou antes, no sinal checkpoint_gravando); colunas de baixa cardinalidade são gravadas com
+    dictionary encoding e lidas de volta como categóricas.
+    """
+
+    DICTIONARY_FIELDS = ['termo_busca', 'estado', 'cidade', 'bairro']
+
+    def __init__(self, batch_size=10000, dictionary_fields=None, compression='zstd', results_folder=None):
+        if pyarrow is None:
+            raise NotConfigured('ParquetExportPipeline requer o pacote pyarrow (pip install pyarrow)')
+        self.batch_size = batch_size
+        self.dictionary_fields = list(self.DICTIONARY_FIELDS if dictionary_fields is None else dictionary_fields)
+        self.compression = compression
+        self._results_folder = results_folder
+        self.schema = pyarrow.schema([
+            pyarrow.field(
+                campo,
+                pyarrow.dictionary(pyarrow.int32(), pyarrow.string())
+                if campo in self.dictionary_fields else pyarrow.string()
+            )
+            for campo in CAMPOS
+        ])
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        pipeline = cls(
+            batch_size=settings.getint('PARQUET_EXPORT_BATCH_SIZE', 10000),
+            dictionary_fields=settings.getlist('PARQUET_EXPORT_DICTIONARY_FIELDS') or None,
+            compression=settings.get('PARQUET_EXPORT_COMPRESSION', 'zstd'),
+            results_folder=settings.get('PARQUET_EXPORT_DIR'),
+        )
+        crawler.signals.connect(pipeline.sincronizar, signal=checkpoint_gravando)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.results_folder = pasta_resultados(self._results_folder)
+
+        timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+        self.filepath = os.path.join(self.results_folder, f"leads_{timestamp}.parquet")
+        self.writer = pyarrow.parquet.ParquetWriter(
+            self.filepath, self.schema, compression=self.compression
+        )
+        self._colunas = {campo: [] for campo in CAMPOS}
+        self._pendentes = 0
+        self.linhas = 0
+
+    def _gravar_batch(self):
+        if not self._pendentes:
+            return
+        arrays = []
+        for campo in CAMPOS:
+            array = pyarrow.array(self._colunas[campo], type=pyarrow.string())
+            if campo in self.dictionary_fields:
+                array = array.dictionary_encode()
+            arrays.append(array)
+        self.writer.write_batch(pyarrow.RecordBatch.from_arrays(arrays, schema=self.schema))
+        self.linhas += self._pendentes
+        self._colunas = {campo: [] for campo in CAMPOS}
+        self._pendentes = 0
+
+    def sincronizar(self):
+        """Grava o batch pendente (sinal checkpoint_gravando, antes de consultas serem dadas como concluídas)"""
+        if getattr(self, '_pendentes', 0):
+            self._gravar_batch()
+
+    def process_item(self, item, spider):
+        for campo in CAMPOS:
+            self._colunas[campo].append(item[campo])
+        self._pendentes += 1
+        if self._pendentes >= self.batch_size:
+            self._gravar_batch()
+        return item
+
+    def close_spider(self, spider):
+        self._gravar_batch()
+        self.writer.close()
+
+
+class SQLiteLeadStorePipeline:
+    """
+    Persiste os itens em um banco SQLite local, com upsert pela chave natural
+    (nome, endereço, cidade normalizados): recoletas da mesma cidade
+    atualizam as linhas existentes em vez de duplicá-las.
+
+    As escritas são agrupadas em transações de batch_size linhas com
+    executemany, e o banco usa WAL para permitir leitura durante a coleta.
+    """
+
+    CREATE_TABLE_SQL = """
+        CREATE TABLE IF NOT EXISTS leads (
+            id INTEGER PRIMARY KEY,
+            chave TEXT NOT NULL,
+            termo_busca TEXT,
+            estado TEXT,
+            cidade TEXT,
+            bairro TEXT,
+            nome TEXT,
+            endereco TEXT,
+            telefone TEXT,
+            website TEXT,
+            primeira_coleta TEXT NOT NULL,
+            ultima_coleta TEXT NOT NULL,
+            coletas INTEGER NOT NULL DEFAULT 1
+        )
+    """
+
+    UPSERT_SQL = """
+        INSERT INTO leads (chave, termo_busca, estado, cidade, bairro, nome, endereco, telefone, website,
+                           primeira_coleta, ultima_coleta)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+        ON CONFLICT(chave) DO UPDATE SET
+            termo_busca = excluded.termo_busca,
+            estado = excluded.estado,
+            cidade = excluded.cidade,
+            bairro = excluded.bairro,
+            nome = excluded.nome,
+            endereco = excluded.endereco,
+            telefone = excluded.telefone,
+            website = excluded.website,
+            ultima_coleta = excluded.ultima_coleta,
+            coletas = coletas + 1
+    """
+
+    def __init__(self, database=None, batch_size=500):
+        self._database = database
+        self.batch_size = batch_size
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        pipeline = cls(
+            database=settings.get('SQLITE_STORE_PATH'),
+            batch_size=settings.getint('SQLITE_STORE_BATCH_SIZE', 500),
+        )
+        crawler.signals.connect(pipeline.sincronizar, signal=checkpoint_gravando)
+        return pipeline
+
+    def open_spider(self, spider):
+        self.database = self._database or os.path.join(pasta_resultados(), 'leads.db')
+        self.conn = sqlite3.connect(self.database)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        # Em WAL, synchronous=NORMAL só sincroniza no checkpoint: transações
+        # confirmadas continuam duráveis contra queda do processo
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute(self.CREATE_TABLE_SQL)
+            self.conn.execute('CREATE UNIQUE INDEX IF NOT EXISTS leads_chave ON leads (chave)')
+        self._batch = []
+        self.gravados = 0
+
+    def _gravar_batch(self):
+        if not self._batch:
+            return
+        with self.conn:
+            self.conn.executemany(self.UPSERT_SQL, self._batch)
+        self.gravados += len(self._batch)
+        self._batch = []
+
+    def sincronizar(self):
+        """Grava o batch pendente (sinal checkpoint_gravando, antes de consultas serem dadas como concluídas)"""
+        if getattr(self, '_batch', None):
+            self._gravar_batch()
+
+    def process_item(self, item, spider):
+        agora = datetime.datetime.now().isoformat(timespec='seconds')
+        self._batch.append((
+            chave_lead(item['nome'], item['endereco'], item['cidade']),
+            *(item[campo] for campo in CAMPOS),
+            agora,
+            agora,
+        ))
+        if len(self._batch) >= self.batch_size:
+            self._gravar_batch()
+        return item
+
+    def close_spider(self, spider):
+        self._gravar_batch()
+        self.conn.close()
+        logger.info(f'{self.gravados} leads gravados em {self.database}')
+
+
+class StreamExportPipeline:
+    """
+    Exporta cada item como uma linha (NDJSON ou CSV) assim que ele chega,
+    opcionalmente comprimido com gzip ou zstd.
+
+    O destino pode ser um arquivo, a saída padrão ('-') ou um named pipe, de
+    modo que a próxima etapa do ETL consuma os dados durante a coleta. As
+    escritas ficam em buffer e são descarregadas a cada flush_interval
+    segundos (verificado a cada item), no sinal checkpoint_gravando e no
+    fechamento.
+    """
+
+    FORMATOS = ('ndjson', 'csv')
+    COMPRESSOES = (None, 'gzip', 'zstd')
+    EXTENSOES = {None: '', 'gzip': '.gz', 'zstd': '.zst'}
+
+    def __init__(self, formato='ndjson', compressao=None, uri=None, flush_interval=5.0, results_folder=None):
+        if formato not in self.FORMATOS:
+            raise NotConfigured(f'Formato de exportação inválido: {formato}')
+        if compressao not in self.COMPRESSOES:
+            raise NotConfigured(f'Compressão inválida: {compressao}')
+        if compressao == 'zstd' and zstandard is None:
+            raise NotConfigured('Compressão zstd requer o pacote zstandard (pip install zstandard)')
+        self.formato = formato
+        self.compressao = compressao
+        self.uri = uri
+        self.flush_interval = flush_interval
+        self._results_folder = results_folder
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        pipeline = cls(
+            formato=settings.get('STREAM_EXPORT_FORMAT', 'ndjson'),
+            compressao=settings.get('STREAM_EXPORT_COMPRESSION') or None,
+            uri=settings.get('STREAM_EXPORT_URI'),
+            flush_interval=settings.getfloat('STREAM_EXPORT_FLUSH_INTERVAL', 5.0),
+            results_folder=settings.get('STREAM_EXPORT_DIR'),
+        )
+        crawler.signals.connect(pipeline.sincronizar, signal=checkpoint_gravando)
+        return pipeline
+
+    def open_spider(self, spider):
+        if self.uri == '-':
+            self.destino = '<stdout>'
+            self._raw = sys.stdout.buffer
+            self._fechar_raw = False
+        else:
+            self.destino = self.uri
+            if not self.destino:
+                timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+                nome = f"leads_{timestamp}.{self.formato}{self.EXTENSOES[self.compressao]}"
+                self.destino = os.path.join(pasta_resultados(self._results_folder), nome)
+            # Em um named pipe, a abertura bloqueia até o leitor conectar
+            self._raw = open(self.destino, 'wb')
+            self._fechar_raw = True
+
+        if self.compressao == 'gzip':
+            self._comprimido = gzip.GzipFile(fileobj=self._raw, mode='wb')
+        elif self.compressao == 'zstd':
+            self._comprimido = zstandard.ZstdCompressor().stream_writer(self._raw, closefd=False)
+        else:
+            self._comprimido = None
+
+        self._texto = io.TextIOWrapper(
+            self._comprimido or self._raw, encoding='utf-8', newline='', line_buffering=False
+        )
+        if self.formato == 'csv':
+            self._csv = csv.writer(self._texto)
+            self._csv.writerow(CAMPOS)
+        self._ultimo_flush = time.monotonic()
+        self.linhas = 0
+        self._interrompido = False
+
+    def flush(self):
+        self._texto.flush()
+        if self.compressao == 'zstd':
+            # Fecha o bloco atual para que o leitor consiga descomprimir o que já chegou
+            self._comprimido.flush(zstandard.FLUSH_BLOCK)
+        elif self._comprimido is not None:
+            self._comprimido.flush()
+        self._raw.flush()
+        self._ultimo_flush = time.monotonic()
+
+    def sincronizar(self):
+        """Descarrega o buffer (sinal checkpoint_gravando, antes de consultas serem dadas como concluídas)"""
+        if getattr(self, '_texto', None) is None or self._interrompido:
+            return
+        try:
+            self.flush()
+        except BrokenPipeError:
+            logger.error(f'Consumidor de {self.destino} encerrou; exportação em stream interrompida')
+            self._interrompido = True
+
+    def process_item(self, item, spider):
+        if self._interrompido:
+            return item
+        try:
+            if self.formato == 'csv':
+                self._csv.writerow([item[campo] for campo in CAMPOS])
+            else:
+                self._texto.write(json.dumps({campo: item[campo] for campo in CAMPOS}, ensure_ascii=False))
+                self._texto.write('\n')
+            self.linhas += 1
+            if time.monotonic() - self._ultimo_flush >= self.flush_interval:
+                self.flush()
+        except BrokenPipeError:
+            # O consumidor do pipe/stdout encerrou: não há para onde escrever
+            logger.error(f'Consumidor de {self.destino} encerrou; exportação em stream interrompida')
+            self._interrompido = True
+        return item
+
+    def close_spider(self, spider):
+        try:
+            if not self._interrompido:
+                self.flush()
+            # Desacopla o TextIOWrapper para não fechar o stream de baixo (ex.: stdout)
+            self._texto.detach()
+            # As extensões ainda enviam checkpoint_gravando no spider_closed, depois das pipelines fecharem
+            self._texto = None
+            if self._comprimido is not None:
+                self._comprimido.close()
+            if self._fechar_raw:
+                self._raw.close()
+            else:
+                self._raw.flush()
+        except BrokenPipeError:
+            logger.error(f'Consumidor de {self.destino} encerrou antes do fim da exportação')
+
+
+class LeadDedupPipeline:
+    """
+    Descarta leads já vistos nesta ou em execuções anteriores, usando um
+    Bloom filter persistente (memory-mapped) indexado pela chave normalizada
+    (nome, endereço, cidade).
+
+    O filtro não guarda as chaves, apenas bits: dezenas de milhões de leads
+    cabem em poucas dezenas de MB, com uma taxa de falso positivo configurável
+    (um lead novo descartado por engano).
+    """
+
+    def __init__(self, stats=None, path=None, capacity=10_000_000, error_rate=0.001):
+        self.stats = stats
+        self._path = path
+        self.capacity = capacity
+        self.error_rate = error_rate
+
+    @classmethod
+    def from_crawler(cls, crawler):
+        settings = crawler.settings
+        return cls(
+            stats=crawler.stats,
+            path=settings.get('DEDUP_FILTER_PATH'),
+            capacity=settings.getint('DEDUP_CAPACITY', 10_000_000),
+            error_rate=settings.getfloat('DEDUP_ERROR_RATE', 0.001),
+        )
+
+    def open_spider(self, spider):
+        self.path = self._path or os.path.join(pasta_resultados(), 'leads.bloom')
+        self.filtro = BloomFilter(self.path, capacidade=self.capacity, taxa_fp=self.error_rate)
+        self.vistos = 0
+        self.duplicados = 0
+
+    def process_item(self, item, spider):
+        self.vistos += 1
+        if self.filtro.add(chave_lead(item['nome'], item['endereco'], item['cidade'])):
+            self.duplicados += 1
+            if self.stats:
+                self.stats.inc_value('dedup/duplicados')
+            raise DropItem(f"Lead duplicado: {item['nome']}")
+        if self.stats:
+            self.stats.inc_value('dedup/novos')
+        return item
+
+    def close_spider(self, spider):
+        if self.filtro.inseridos > self.filtro.capacidade:
+            logger.warning(
+                f'Bloom filter {self.path} com {self.filtro.inseridos} chaves acima da capacidade '
+                f'de {self.filtro.capacidade}: a taxa de falso positivo está acima de {self.filtro.taxa_fp}'
+            )
+        if self.stats:
+            self.stats.set_value('dedup/taxa_acerto', round(self.duplicados / self.vistos, 4) if self.vistos else 0.0)
+            self.stats.set_value('dedup/chaves_no_filtro', self.filtro.inseridos)
+        self.filtro.close()
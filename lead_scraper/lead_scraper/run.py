@@ -0,0 +1,301 @@
+"""
+Executa um plano de consultas (termos x cidades x bairros) em vários
+processos e mescla o resultado.
+
+Um processo do Scrapy fica preso a um núcleo, e o parse e a exportação o
+saturam bem antes da rede. Aqui o plano é dividido em shards por hash da
+consulta normalizada (a mesma consulta cai sempre no mesmo shard), cada shard
+roda em um processo com seu próprio CrawlerProcess e exporta NDJSON, e no fim
+as saídas são mescladas em um único arquivo sem leads repetidos.
+
+Uso (a partir de lead_scraper/, onde fica o scrapy.cfg):
+
+    python -m lead_scraper.run --termos academias,padarias --estado RS --cidades "*" --processos 4
+"""
+import argparse
+import datetime
+import hashlib
+import json
+import logging
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+
+from lead_scraper.pipelines import CABECALHOS, CAMPOS, EXCEL_MAX_LINHAS, pasta_resultados, workbook_streaming
+from lead_scraper.utils.normalizacao import chave_lead, normalizar_texto, texto_busca
+
+logger = logging.getLogger(__name__)
+
+Consulta = namedtuple('Consulta', ['termo', 'estado', 'cidade', 'bairro'])
+
+FORMATOS = ('xlsx', 'ndjson')
+
+
+def _lista(valor):
+    return [parte.strip() for parte in valor.split(',') if parte.strip()] if valor else []
+
+
+def chave(consulta):
+    """Chave normalizada da consulta, a mesma de chave_consulta() para a URL da primeira página"""
+    termo, estado, cidade, bairro = consulta
+    return normalizar_texto(texto_busca(termo, estado, cidade, bairro or None))
+
+
+def montar_plano(termos, estado='RS', cidades=('Porto Alegre',), bairros=('',)):
+    """
+    Cruza termos x cidades x bairros. estado ou cidade '*' expandem pelo
+    índice de municípios do IBGE, como no spider. Consultas equivalentes
+    (mesma chave normalizada) entram uma vez só, na ordem em que aparecem.
+    """
+    from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+
+    localidades = []
+    for cidade in cidades:
+        localidades.extend(BingMapsSpider(estado=estado, cidade=cidade).localidades())
+
+    plano, vistas = [], set()
+    # Termos no laço mais interno, como no spider
+    for uf, cidade in localidades:
+        for bairro in bairros or ('',):
+            for termo in termos:
+                consulta = Consulta(termo, uf, cidade, bairro)
+                if chave(consulta) not in vistas:
+                    vistas.add(chave(consulta))
+                    plano.append(consulta)
+    return plano
+
+
+def termos_dos_argumentos(args):
+    """Termos de --termos (separados por vírgula) e --termos-arquivo (um por linha)"""
+    from lead_scraper.spiders.bing_maps_spider import ler_termos
+
+    return _lista(args.termos) + (ler_termos(args.termos_arquivo) if args.termos_arquivo else [])
+
+
+def shard_da_consulta(consulta, shards):
+    """Shard da consulta: determinístico entre processos e execuções (o hash() do Python não é)"""
+    digest = hashlib.sha1(chave(consulta).encode('utf-8')).digest()
+    return int.from_bytes(digest[:8], 'big') % shards
+
+
+def dividir_plano(plano, shards):
+    divisao = [[] for _ in range(shards)]
+    for consulta in plano:
+        divisao[shard_da_consulta(consulta, shards)].append(consulta)
+    return divisao
+
+
+def executar_shard(indice, consultas, pasta, settings_extras=None):
+    """
+    Executa as consultas de um shard em um CrawlerProcess. Roda no processo
+    filho: o reactor do Twisted não reinicia, então cada shard precisa de um
+    processo novo. Retorna o resumo do shard.
+    """
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    inicio = time.monotonic()
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'lead_scraper.settings')
+    os.makedirs(pasta, exist_ok=True)
+    plano = os.path.join(pasta, 'plano.jsonl')
+    with open(plano, 'w', encoding='utf-8') as f:
+        for consulta in consultas:
+            f.write(json.dumps(list(consulta), ensure_ascii=False) + '\n')
+    saida = os.path.join(pasta, 'leads.ndjson')
+
+    settings = get_project_settings()
+    settings.setdict(settings_extras or {}, priority='cmdline')
+    # Saída do shard: NDJSON sem compressão, mesclado pelo processo principal.
+    # O checkpoint é por spider, não por shard, e fica desligado.
+    settings.setdict({
+        'ITEM_PIPELINES': {'lead_scraper.pipelines.StreamExportPipeline': 330},
+        'STREAM_EXPORT_URI': saida,
+        'STREAM_EXPORT_FORMAT': 'ndjson',
+        'STREAM_EXPORT_COMPRESSION': None,
+        'CHECKPOINT_ENABLED': False,
+        'LOG_FILE': os.path.join(pasta, 'crawl.log'),
+    }, priority='cmdline')
+
+    processo = CrawlerProcess(settings)
+    crawler = processo.create_crawler('bing_maps')
+    processo.crawl(crawler, plano=plano)
+    processo.start()
+
+    stats = crawler.stats.get_stats()
+    segundos = time.monotonic() - inicio
+    itens = stats.get('item_scraped_count', 0)
+    return {
+        'shard': indice,
+        'pid': os.getpid(),
+        'consultas': len(consultas),
+        'requisicoes': stats.get('downloader/request_count', 0),
+        'itens': itens,
+        'segundos': round(segundos, 3),
+        'consultas_por_segundo': round(len(consultas) / segundos, 2),
+        'itens_por_segundo': round(itens / segundos, 2),
+        'motivo': stats.get('finish_reason'),
+        'saida': saida,
+    }
+
+
+def _ler_ndjson(caminho):
+    if not os.path.exists(caminho):
+        return
+    with open(caminho, encoding='utf-8') as f:
+        for linha in f:
+            if linha.strip():
+                yield json.loads(linha)
+
+
+def mesclar(arquivos, destino, formato='xlsx', max_linhas=EXCEL_MAX_LINHAS - 1):
+    """
+    Mescla as saídas NDJSON dos shards em destino, descartando leads
+    repetidos (chave_lead: nome, endereço e cidade). Só as chaves ficam em
+    memória. No formato xlsx, acima de max_linhas (padrão: o limite do Excel)
+    a saída é dividida em <destino>_partNNNN.xlsx. Retorna (arquivos gerados, linhas,
+    duplicados).
+    """
+    gerados, vistos = [], set()
+    linhas = duplicados = 0
+    workbook = sheet = None
+    caminho = None
+    linhas_parte = 0
+    base, extensao = os.path.splitext(destino)
+    texto = open(destino, 'w', encoding='utf-8') if formato == 'ndjson' else None
+    if texto:
+        gerados.append(destino)
+
+    try:
+        for arquivo in arquivos:
+            for item in _ler_ndjson(arquivo):
+                chave_item = chave_lead(item['nome'], item['endereco'], item['cidade'])
+                if chave_item in vistos:
+                    duplicados += 1
+                    continue
+                vistos.add(chave_item)
+                linhas += 1
+                if texto:
+                    texto.write(json.dumps(item, ensure_ascii=False) + '\n')
+                    continue
+                if workbook is None or linhas_parte >= max_linhas:
+                    if workbook is not None:
+                        workbook.save(caminho)
+                        workbook = None
+                        if len(gerados) == 1:
+                            # A saída não coube em um arquivo: o primeiro vira a parte 1
+                            os.replace(destino, f'{base}_part0001{extensao}')
+                            gerados[0] = f'{base}_part0001{extensao}'
+                    caminho = destino if not gerados else f'{base}_part{len(gerados) + 1:04d}{extensao}'
+                    workbook, sheet = workbook_streaming()
+                    sheet.append(CABECALHOS)
+                    gerados.append(caminho)
+                    linhas_parte = 0
+                sheet.append([item[campo] for campo in CAMPOS])
+                linhas_parte += 1
+    finally:
+        if texto:
+            texto.close()
+        if workbook is not None:
+            workbook.save(caminho)
+
+    if formato == 'xlsx' and not gerados:
+        workbook, sheet = workbook_streaming()
+        sheet.append(CABECALHOS)
+        workbook.save(destino)
+        gerados.append(destino)
+    return gerados, linhas, duplicados
+
+
+def executar(plano, processos, shards=None, pasta=None, formato='xlsx', settings_extras=None):
+    """
+    Divide o plano em shards, executa cada um em um processo (no máximo
+    processos ao mesmo tempo) e mescla as saídas em
+    <pasta>/leads_<timestamp>.<formato>. Retorna o resumo da execução.
+    """
+    if formato not in FORMATOS:
+        raise ValueError(f'Formato inválido: {formato!r} (use {", ".join(FORMATOS)})')
+    shards = shards or processos
+    pasta = pasta_resultados(pasta)
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    pasta_shards = os.path.join(pasta, f'shards_{timestamp}')
+    os.makedirs(pasta_shards, exist_ok=True)
+
+    tarefas = [
+        (indice, consultas, os.path.join(pasta_shards, f'shard_{indice:03d}'), settings_extras)
+        for indice, consultas in enumerate(dividir_plano(plano, shards)) if consultas
+    ]
+    logger.info(f'{len(plano)} consultas em {len(tarefas)} shards, {processos} processos')
+
+    inicio = time.monotonic()
+    # spawn: cada shard começa em um interpretador limpo, sem reactor instalado;
+    # maxtasksperchild=1 porque o reactor não reinicia no mesmo processo
+    contexto = multiprocessing.get_context('spawn')
+    with contexto.Pool(min(processos, len(tarefas)) or 1, maxtasksperchild=1) as pool:
+        resultados = pool.starmap(executar_shard, tarefas)
+    segundos_crawl = time.monotonic() - inicio
+
+    for resultado in resultados:
+        logger.info(
+            f"Shard {resultado['shard']}: {resultado['consultas']} consultas, {resultado['itens']} itens em "
+            f"{resultado['segundos']:.1f}s ({resultado['consultas_por_segundo']} consultas/s, "
+            f"{resultado['itens_por_segundo']} itens/s, {resultado['motivo']})"
+        )
+
+    destino = os.path.join(pasta, f'leads_{timestamp}.{formato}')
+    arquivos, linhas, duplicados = mesclar([r['saida'] for r in resultados], destino, formato)
+    segundos = time.monotonic() - inicio
+    resumo = {
+        'consultas': len(plano),
+        'processos': processos,
+        'shards': resultados,
+        'itens': sum(r['itens'] for r in resultados),
+        'linhas': linhas,
+        'duplicados': duplicados,
+        'segundos_crawl': round(segundos_crawl, 3),
+        'segundos': round(segundos, 3),
+        'consultas_por_segundo': round(len(plano) / segundos_crawl, 2) if segundos_crawl else 0.0,
+        'arquivos': arquivos,
+    }
+    with open(os.path.join(pasta_shards, 'resumo.json'), 'w', encoding='utf-8') as f:
+        json.dump(resumo, f, ensure_ascii=False, indent=2)
+    logger.info(
+        f"{linhas} leads em {', '.join(arquivos)} ({duplicados} repetidos descartados); "
+        f"{resumo['consultas_por_segundo']} consultas/s no total"
+    )
+    return resumo
+
+
+def _setting(texto):
+    nome, separador, valor = texto.partition('=')
+    if not separador:
+        raise argparse.ArgumentTypeError(f'Use NOME=VALOR: {texto!r}')
+    return nome, valor
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Executa um plano de consultas em vários processos')
+    parser.add_argument('--termos', default='', help='Termos separados por vírgula')
+    parser.add_argument('--termos-arquivo', default='', help='Arquivo com um termo por linha')
+    parser.add_argument('--estado', default='RS', help="UF ou '*' para todas")
+    parser.add_argument('--cidades', default='Porto Alegre', help="Cidades separadas por vírgula ou '*'")
+    parser.add_argument('--bairros', default='', help='Bairros separados por vírgula')
+    parser.add_argument('--processos', type=int, default=os.cpu_count() or 1)
+    parser.add_argument('--shards', type=int, default=None, help='Padrão: um por processo')
+    parser.add_argument('--formato', choices=FORMATOS, default='xlsx')
+    parser.add_argument('--pasta', default=None, help='Pasta de saída (padrão: data/)')
+    parser.add_argument('-s', '--set', dest='settings', action='append', type=_setting, default=[],
+                        metavar='NOME=VALOR', help='Setting do Scrapy para os shards')
+    args = parser.parse_args(argv)
+    termos = termos_dos_argumentos(args)
+    if not termos:
+        parser.error('informe --termos ou --termos-arquivo')
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s [%(name)s] %(levelname)s: %(message)s')
+    plano = montar_plano(termos, args.estado, _lista(args.cidades), _lista(args.bairros))
+    executar(plano, args.processos, shards=args.shards, pasta=args.pasta, formato=args.formato,
+             settings_extras=dict(args.settings))
+
+
+if __name__ == '__main__':
+    main()
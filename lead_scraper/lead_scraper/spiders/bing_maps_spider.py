@@ -1,55 +1,322 @@
 import scrapy
 import json
 from urllib.parse import quote
+from lead_scraper.extensions import consulta_concluida, listagens_extraidas
 from lead_scraper.items import LeadScraperItem
+from lead_scraper.middlewares import BLOQUEADA, TRUNCADA
+from lead_scraper.utils.extracao import extrair_data_entities, carregar_json, tem_proxima_pagina
+from lead_scraper.utils.localidades_api import get_indice_municipios
+from lead_scraper.utils.normalizacao import chave_consulta, chave_lead, normalizar_texto, texto_busca
+
+
+def ler_termos(caminho):
+    """Termos de um arquivo texto, um por linha; linhas vazias e iniciadas por '#' são ignoradas"""
+    with open(caminho, encoding='utf-8') as f:
+        return [linha.strip() for linha in f if linha.strip() and not linha.lstrip().startswith('#')]
+
+
+def termos_unicos(termos):
+    """Termos sem repetição após a normalização (acentos, caixa, espaços), na ordem original"""
+    vistos = set()
+    resultado = []
+    for termo in termos:
+        if normalizar_texto(termo) not in vistos:
+            vistos.add(normalizar_texto(termo))
+            resultado.append(termo)
+    return resultado
+
 
 class BingMapsSpider(scrapy.Spider):
     name = "bing_maps"
 
-    def __init__(self, termo='', estado='RS', cidade='Porto Alegre', bairros='', *args, **kwargs):
+    # Valor de estado/cidade que expande a busca para todas as localidades
+    TODOS = '*'
+
+    # Extração das listagens: 'parsel' (DOM + seletor CSS) ou 'regex' (varre os
+    # bytes da resposta, sem montar o DOM). Configurável por BING_PARSE_ENGINE.
+    MOTORES_EXTRACAO = ('parsel', 'regex')
+    motor_extracao = 'parsel'
+
+    # Paginação: até max_paginas páginas por consulta (1 desativa), buscadas
+    # em janelas de janela_paginas requisições simultâneas.
+    # Configurável por BING_MAX_PAGES e BING_PAGINATION_WINDOW.
+    max_paginas = 1
+    janela_paginas = 4
+
+    # Endereço do Bing Maps; BING_MAPS_URL permite apontar para um servidor local nos testes
+    url_base = 'https://www.bing.com/maps'
+
+    def __init__(self, termo='', estado='RS', cidade='Porto Alegre', bairros='', plano='', termos='',
+                 termos_arquivo='', *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.termo = termo
+        # Vários termos na mesma execução: termos separados por vírgula e/ou um
+        # arquivo com um termo por linha, somados a termo
+        self.termos = termos_unicos(
+            ([termo] if termo else [])
+            + [t.strip() for t in termos.split(',') if t.strip()]
+            + (ler_termos(termos_arquivo) if termos_arquivo else [])
+        ) or [termo]
+        self.termo = self.termos[0]
         self.estado = estado
         self.cidade = cidade
-        self.bairros = bairros.split(',') if bairros else ['']
+        self.bairros = [bairro.strip() for bairro in bairros.split(',')] if bairros else ['']
+        # Arquivo JSON lines com as consultas [termo, estado, cidade, bairro] a
+        # buscar, no lugar de termo/estado/cidade/bairros (ver lead_scraper.run)
+        self.plano = plano
+        # Consultas com páginas pendentes: ids já vistos, páginas agendadas etc.
+        self._paginacao = {}
+        self._estatisticas = {'consultas': 0, 'paginas': 0, 'listagens': 0}
+
+    @classmethod
+    def from_crawler(cls, crawler, *args, **kwargs):
+        spider = super().from_crawler(crawler, *args, **kwargs)
+        spider.motor_extracao = crawler.settings.get('BING_PARSE_ENGINE', cls.motor_extracao)
+        if spider.motor_extracao not in cls.MOTORES_EXTRACAO:
+            raise ValueError(
+                f'BING_PARSE_ENGINE inválido: {spider.motor_extracao!r} (use {", ".join(cls.MOTORES_EXTRACAO)})'
+            )
+        spider.url_base = crawler.settings.get('BING_MAPS_URL', cls.url_base)
+        spider.max_paginas = crawler.settings.getint('BING_MAX_PAGES', cls.max_paginas)
+        spider.janela_paginas = max(1, crawler.settings.getint('BING_PAGINATION_WINDOW', cls.janela_paginas))
+        return spider
+
+    @property
+    def fan_out(self):
+        return self.TODOS in (self.estado, self.cidade)
 
     def start_requests(self):
-        if self.bairros == ['']:
-            query = quote(f'{self.termo} em {self.cidade}, {self.estado}')
-            url = f'https://www.bing.com/maps?q={query}'
-            self.logger.info(f'Buscando por URL: {url}')
-            yield scrapy.Request(url, callback=self.parse, meta={'bairro': None})
-        else:
+        # Gerador: o Scrapy consome as requisições conforme há espaço no
+        # scheduler, então o fan-out nacional nunca materializa todas de uma vez
+        # Com a extensão Checkpoint, consultas concluídas numa execução interrompida são puladas
+        frontier = getattr(self, 'frontier', None)
+        if frontier is not None:
+            # Com a extensão SharedFrontier, as consultas chegam em lotes da fila compartilhada
+            yield from self.requisicoes(frontier.arrendar(), dont_filter=True)
+            return
+        checkpoint = getattr(self, 'checkpoint', None)
+        for termo, estado, cidade, bairro in self.consultas():
+            url = self._url(termo, estado, cidade, bairro or None)
+            if checkpoint is not None and checkpoint.concluida(chave_consulta(url)):
+                continue
+            yield self._requisicao(termo, estado, cidade, bairro or None, url)
+
+    def consultas(self):
+        """Consultas (termo, estado, cidade, bairro) a buscar: as do plano ou localidades x bairros"""
+        if self.plano:
+            with open(self.plano, encoding='utf-8') as f:
+                for linha in f:
+                    if linha.strip():
+                        yield tuple(json.loads(linha))
+            return
+        # Termos no laço mais interno: as consultas de todos os termos avançam
+        # juntas, em vez de um termo inteiro depois do outro
+        for estado, cidade in self.localidades():
             for bairro in self.bairros:
-                query = quote(f'{self.termo} em {bairro}, {self.cidade}, {self.estado}')
-                url = f'https://www.bing.com/maps?q={query}'
-                self.logger.info(f'Buscando por URL: {url}')
-                yield scrapy.Request(url, callback=self.parse, meta={'bairro': bairro})
+                for termo in self.termos:
+                    yield termo, estado, cidade, bairro
+
+    def requisicoes(self, consultas, dont_filter=False):
+        for termo, estado, cidade, bairro in consultas:
+            yield self._requisicao(termo, estado, cidade, bairro or None, dont_filter=dont_filter)
+
+    def localidades(self):
+        """Pares (estado, cidade) a buscar; com '*' expande pelo índice de municípios do IBGE"""
+        if not self.fan_out:
+            yield self.estado, self.cidade
+            return
+
+        indice = get_indice_municipios()
+        if self.cidade != self.TODOS:
+            # Cidade específica em todos os estados (ex.: todas as "Bom Jesus")
+            municipios = indice.buscar(self.cidade)
+        elif self.estado != self.TODOS:
+            municipios = indice.da_uf(self.estado)
+        else:
+            municipios = (m for uf in sorted(indice.por_uf) for m in indice.da_uf(uf))
+
+        total = 0
+        for municipio in municipios:
+            total += 1
+            yield municipio.uf, municipio.nome
+        self.logger.info(f'Fan-out: {total} municípios para estado={self.estado}, cidade={self.cidade}.')
+
+    def _url(self, termo, estado, cidade, bairro):
+        return f'{self.url_base}?q={quote(texto_busca(termo, estado, cidade, bairro))}'
+
+    def _requisicao(self, termo, estado, cidade, bairro, url=None, dont_filter=False):
+        url = url or self._url(termo, estado, cidade, bairro)
+        if self.fan_out:
+            self.logger.debug(f'Buscando por URL: {url}')
+        else:
+            self.logger.info(f'Buscando por URL: {url}')
+        return scrapy.Request(url, callback=self.parse, dont_filter=dont_filter,
+                              meta={'termo': termo, 'bairro': bairro, 'estado': estado, 'cidade': cidade})
 
     def parse(self, response):
+        termo = response.meta.get('termo', self.termo)
         bairro = response.meta['bairro']
-        listings = response.css('a.listings-item')
+        estado = response.meta.get('estado', self.estado)
+        cidade = response.meta.get('cidade', self.cidade)
+        pagina = response.meta.get('pagina', 1)
+        # Nas páginas seguintes, entidades já vistas na consulta são ignoradas
+        vistos = self._paginacao[response.meta['consulta']]['ids'] if pagina > 1 else None
+        # Entidades novas da página: id do Bing ou, sem ele, a chave natural do lead
+        ids = []
+        if self.motor_extracao == 'regex':
+            listings = extrair_data_entities(response.body, response.encoding)
+            carregar = carregar_json
+        else:
+            listings = [listing.attrib.get('data-entity') for listing in response.css('a.listings-item')]
+            carregar = json.loads
 
         if listings:
             self.logger.info(f'Encontradas {len(listings)} entidades.')
-            for listing in listings:
-                data_entity = listing.attrib.get('data-entity')
+            for data_entity in listings:
                 if data_entity:
                     try:
-                        entity = json.loads(data_entity)['entity']
+                        entity = carregar(data_entity)['entity']
+                        entity_id = entity.get('id') or chave_lead(
+                            entity.get('title', 'Sem título'), entity.get('address', 'Sem endereço'), cidade
+                        )
+                        if vistos is not None:
+                            if entity_id in vistos:
+                                continue
+                            vistos.add(entity_id)
+                        ids.append(entity_id)
                         item = LeadScraperItem()
-                        item['termo_busca'] = self.termo
-                        item['estado'] = self.estado
-                        item['cidade'] = self.cidade
+                        item['termo_busca'] = termo
+                        item['estado'] = estado
+                        item['cidade'] = cidade
                         item['bairro'] = bairro or 'Não especificado'
                         item['nome'] = entity.get('title', 'Sem título')
                         item['endereco'] = entity.get('address', 'Sem endereço')
                         item['telefone'] = entity.get('phone', 'Telefone não disponível')
                         item['website'] = entity.get('website', 'Website não disponível')
 
-                        self.logger.debug(f'Item extraído: {item}')
+                        # Formatação adiada: o repr do item só é montado se o nível DEBUG estiver ativo
+                        self.logger.debug('Item extraído: %s', item)
                         yield item
                     except Exception as e:
                         self.logger.error(f'Erro ao extrair entidade JSON: {e}')
         else:
-            self.logger.warning('Nenhuma entidade encontrada diretamente na página HTML.')
+            # classificacao vem do ResponseGuardMiddleware: vazia, truncada ou bloqueada
+            classificacao = response.meta.get('classificacao')
+            if classificacao and classificacao != 'vazia':
+                self.logger.warning(f'Nenhuma entidade encontrada: página {classificacao}.')
+            else:
+                self.logger.warning('Nenhuma entidade encontrada diretamente na página HTML.')
+
+        self._estatisticas['paginas'] += 1
+        self._estatisticas['listagens'] += len(listings)
+        crawler = getattr(self, 'crawler', None)
+        if crawler:
+            crawler.signals.send_catch_log(signal=listagens_extraidas, response=response, quantidade=len(listings))
+        if pagina == 1:
+            self._estatisticas['consultas'] += 1
+        if self.max_paginas > 1:
+            yield from self._paginar(response, pagina, ids, len(listings))
+        elif not self._pagina_bloqueada(response):
+            self._concluir_consulta(response.url)
+
+    def _paginar(self, response, pagina, ids, listagens):
+        """
+        Na primeira página, o número de listagens define o tamanho da página e
+        a seta "Próxima Página" visível indica que há mais resultados: as
+        páginas seguintes são agendadas juntas, em janelas. Uma página sem
+        entidades novas encerra a consulta; a última página da janela, se
+        trouxe entidades novas e ainda tem próxima, agenda a janela seguinte.
+        """
+        tem_proxima = tem_proxima_pagina(response.body)
+        if pagina == 1:
+            if not (listagens and tem_proxima):
+                self._registrar_paginas(1)
+                if not self._pagina_bloqueada(response):
+                    self._concluir_consulta(response.url)
+                return
+            consulta = response.url
+            self._paginacao[consulta] = {
+                'ids': set(ids),
+                'tamanho': listagens,
+                'agendadas': 1,
+                'pendentes': 0,
+                'paginas': 1,
+                'esgotada': False,
+                'meta': {chave: response.meta.get(chave) for chave in ('termo', 'bairro', 'estado', 'cidade')},
+            }
+            yield from self._agendar_janela(consulta)
+            return
+
+        consulta = response.meta['consulta']
+        paginacao = self._paginacao[consulta]
+        if not ids and not paginacao['esgotada']:
+            paginacao['esgotada'] = True
+            self.logger.debug(f'Página {pagina} sem entidades novas; encerrando a paginação de {consulta}')
+            self._inc_stat('bing/paginacao_interrompida')
+        elif pagina == paginacao['agendadas'] and tem_proxima and not paginacao['esgotada']:
+            yield from self._agendar_janela(consulta)
+        self._concluir_pagina(consulta)
+
+    def _agendar_janela(self, consulta):
+        paginacao = self._paginacao[consulta]
+        ultima = min(paginacao['agendadas'] + self.janela_paginas, self.max_paginas)
+        for pagina in range(paginacao['agendadas'] + 1, ultima + 1):
+            # first é o índice (a partir de 1) da primeira listagem da página
+            inicio = (pagina - 1) * paginacao['tamanho'] + 1
+            meta = dict(paginacao['meta'], pagina=pagina, consulta=consulta)
+            paginacao['pendentes'] += 1
+            yield scrapy.Request(f'{consulta}&first={inicio}', callback=self.parse,
+                                 errback=self._pagina_falhou, meta=meta)
+        paginacao['agendadas'] = ultima
+
+    def _pagina_falhou(self, failure):
+        consulta = failure.request.meta['consulta']
+        self.logger.warning(f'Falha ao buscar a página {failure.request.meta["pagina"]} de {consulta}: {failure.value}')
+        self._concluir_pagina(consulta, sucesso=False)
+
+    def _concluir_pagina(self, consulta, sucesso=True):
+        paginacao = self._paginacao[consulta]
+        paginacao['pendentes'] -= 1
+        if sucesso:
+            paginacao['paginas'] += 1
+        if paginacao['pendentes'] == 0:
+            # Nenhuma página em voo: a consulta terminou e o estado pode ser liberado
+            del self._paginacao[consulta]
+            self._registrar_paginas(paginacao['paginas'])
+            self._concluir_consulta(consulta)
+
+    @staticmethod
+    def _pagina_bloqueada(response):
+        # Bloqueada ou truncada mesmo após as novas tentativas: a consulta fica para a próxima execução
+        return response.meta.get('classificacao') in (BLOQUEADA, TRUNCADA)
+
+    def _concluir_consulta(self, url):
+        crawler = getattr(self, 'crawler', None)
+        if crawler:
+            crawler.signals.send_catch_log(signal=consulta_concluida, chave=chave_consulta(url))
+
+    def _registrar_paginas(self, paginas):
+        stats = self._stats()
+        if stats:
+            stats.max_value('bing/max_paginas_por_consulta', paginas)
+
+    def _stats(self):
+        crawler = getattr(self, 'crawler', None)
+        return crawler.stats if crawler else None
+
+    def _inc_stat(self, chave):
+        stats = self._stats()
+        if stats:
+            stats.inc_value(chave)
+
+    def closed(self, reason):
+        stats = self._stats()
+        if not stats:
+            return
+        consultas, paginas, listagens = (self._estatisticas[k] for k in ('consultas', 'paginas', 'listagens'))
+        stats.set_value('bing/consultas', consultas)
+        stats.set_value('bing/paginas', paginas)
+        stats.set_value('bing/listagens', listagens)
+        if consultas:
+            stats.set_value('bing/paginas_por_consulta', round(paginas / consultas, 2))
+        if paginas:
+            stats.set_value('bing/listagens_por_pagina', round(listagens / paginas, 2))
@@ -0,0 +1,89 @@
+import hashlib
+import math
+import mmap
+import os
+import struct
+
+# magic, bits (m), funções de hash (k), itens inseridos, capacidade, taxa de falso positivo
+_CABECALHO = struct.Struct('<8sQIQQd')
+_MAGIC = b'LFBLOOM1'
+
+
+def dimensionar(capacidade, taxa_fp):
+    """Número de bits (m) e de funções de hash (k) para a capacidade e taxa de falso positivo"""
+    bits = math.ceil(-capacidade * math.log(taxa_fp) / (math.log(2) ** 2))
+    hashes = max(1, round(bits / capacidade * math.log(2)))
+    return bits, hashes
+
+
+class BloomFilter:
+    """
+    Bloom filter persistido em arquivo e acessado via mmap.
+
+    Abrir um filtro existente é O(1): apenas o cabeçalho é lido e as páginas
+    do vetor de bits são carregadas sob demanda pelo sistema operacional.
+    Não é seguro para escrita concorrente por vários processos.
+    """
+
+    def __init__(self, caminho, capacidade=10_000_000, taxa_fp=0.001):
+        self.caminho = caminho
+        if os.path.exists(caminho) and os.path.getsize(caminho) >= _CABECALHO.size:
+            self._arquivo = open(caminho, 'r+b')
+            magic, self.bits, self.hashes, self.inseridos, self.capacidade, self.taxa_fp = \
+                _CABECALHO.unpack(self._arquivo.read(_CABECALHO.size))
+            if magic != _MAGIC:
+                self._arquivo.close()
+                raise ValueError(f'{caminho} não é um arquivo de Bloom filter válido')
+        else:
+            self.capacidade = capacidade
+            self.taxa_fp = taxa_fp
+            self.bits, self.hashes = dimensionar(capacidade, taxa_fp)
+            self.inseridos = 0
+            self._arquivo = open(caminho, 'w+b')
+            self._arquivo.write(self._cabecalho())
+            # truncate cria um arquivo esparso: o vetor de bits começa zerado sem ser escrito
+            self._arquivo.truncate(_CABECALHO.size + (self.bits + 7) // 8)
+            self._arquivo.flush()
+        self._mmap = mmap.mmap(self._arquivo.fileno(), 0)
+
+    def _cabecalho(self):
+        return _CABECALHO.pack(_MAGIC, self.bits, self.hashes, self.inseridos, self.capacidade, self.taxa_fp)
+
+    def _posicoes(self, chave):
+        # Double hashing (Kirsch-Mitzenmacher): k posições a partir de dois hashes de 64 bits
+        digest = hashlib.blake2b(chave.encode('utf-8'), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], 'little')
+        h2 = int.from_bytes(digest[8:], 'little') | 1
+        return [(h1 + i * h2) % self.bits for i in range(self.hashes)]
+
+    def __contains__(self, chave):
+        mm = self._mmap
+        base = _CABECALHO.size
+        return all(mm[base + (p >> 3)] & (1 << (p & 7)) for p in self._posicoes(chave))
+
+    def add(self, chave):
+        """Adiciona a chave; retorna True se ela (provavelmente) já estava no filtro"""
+        mm = self._mmap
+        base = _CABECALHO.size
+        presente = True
+        for p in self._posicoes(chave):
+            indice = base + (p >> 3)
+            mascara = 1 << (p & 7)
+            byte = mm[indice]
+            if not byte & mascara:
+                presente = False
+                mm[indice] = byte | mascara
+        if not presente:
+            self.inseridos += 1
+        return presente
+
+    def flush(self):
+        self._mmap[:_CABECALHO.size] = self._cabecalho()
+        self._mmap.flush()
+
+    def close(self):
+        if self._mmap.closed:
+            return
+        self.flush()
+        self._mmap.close()
+        self._arquivo.close()
@@ -0,0 +1,91 @@
+import datetime
+import os
+import sqlite3
+
+# Padrão dos journals: data/checkpoint/<spider>.sqlite na raiz do repositório
+CHECKPOINT_DIR_PADRAO = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', '..', 'data', 'checkpoint')
+)
+
+
+def caminho_checkpoint(settings, nome_spider):
+    """Caminho do journal: CHECKPOINT_FILE ou data/checkpoint/<spider>.sqlite"""
+    return settings.get('CHECKPOINT_FILE') or os.path.join(CHECKPOINT_DIR_PADRAO, f'{nome_spider}.sqlite')
+
+
+class CheckpointJournal:
+    """
+    Journal SQLite das consultas concluídas de uma execução longa.
+
+    Cada consulta concluída é uma linha na tabela consultas, cuja chave
+    primária é a consulta normalizada (WITHOUT ROWID: a própria árvore da
+    chave guarda a linha). A verificação de uma consulta é uma busca na
+    chave, então o custo da retomada não cresce com o tamanho do journal:
+    nada é carregado em memória.
+
+    A tabela execucao guarda o id da execução (timestamp, usado nos nomes
+    dos arquivos exportados) e seu estado. Uma execução interrompida é
+    retomada na próxima abertura; uma concluída dá lugar a uma nova.
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        self.conn = sqlite3.connect(caminho)
+        self.conn.execute('PRAGMA journal_mode=WAL')
+        self.conn.execute('PRAGMA synchronous=NORMAL')
+        with self.conn:
+            self.conn.execute(
+                'CREATE TABLE IF NOT EXISTS consultas (chave TEXT PRIMARY KEY, concluida_em REAL NOT NULL) WITHOUT ROWID'
+            )
+            self.conn.execute('CREATE TABLE IF NOT EXISTS execucao (chave TEXT PRIMARY KEY, valor TEXT)')
+
+    def _execucao(self):
+        return dict(self.conn.execute('SELECT chave, valor FROM execucao'))
+
+    def iniciar_execucao(self):
+        """
+        Retoma a execução interrompida ou começa uma nova (descartando as
+        consultas da anterior). Retorna (id da execução, retomada).
+        """
+        execucao = self._execucao()
+        retomada = execucao.get('status') == 'em_andamento'
+        with self.conn:
+            if retomada:
+                self.conn.execute("UPDATE execucao SET valor = '1' WHERE chave = 'retomada'")
+                return execucao['id'], True
+            self.conn.execute('DELETE FROM consultas')
+            id_execucao = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+            self.conn.executemany(
+                'INSERT OR REPLACE INTO execucao (chave, valor) VALUES (?, ?)',
+                [('id', id_execucao), ('status', 'em_andamento'), ('retomada', '0')],
+            )
+        return id_execucao, False
+
+    def execucao(self):
+        """(id da execução, retomada) da execução iniciada, ou None"""
+        execucao = self._execucao()
+        if execucao.get('status') != 'em_andamento':
+            return None
+        return execucao['id'], execucao.get('retomada') == '1'
+
+    def concluir_execucao(self):
+        with self.conn:
+            self.conn.execute("UPDATE execucao SET valor = 'concluida' WHERE chave = 'status'")
+
+    def concluida(self, chave):
+        return self.conn.execute('SELECT 1 FROM consultas WHERE chave = ?', (chave,)).fetchone() is not None
+
+    def marcar(self, chaves, timestamp):
+        """Registra as consultas concluídas em uma única transação"""
+        with self.conn:
+            self.conn.executemany(
+                'INSERT OR IGNORE INTO consultas (chave, concluida_em) VALUES (?, ?)',
+                ((chave, timestamp) for chave in chaves),
+            )
+
+    def __len__(self):
+        return self.conn.execute('SELECT COUNT(*) FROM consultas').fetchone()[0]
+
+    def close(self):
+        self.conn.close()
@@ -0,0 +1,82 @@
+import html
+import json
+import re
+
+try:
+    import orjson
+except ImportError:  # orjson é opcional: sem ele o json da biblioteca padrão é usado
+    orjson = None  # type: ignore[assignment]
+
+# Tag <a ...> completa; valores entre aspas podem conter '>'
+_TAG_A = re.compile(rb'<a\s((?:[^>"\']|"[^"]*"|\'[^\']*\')*)>', re.IGNORECASE)
+_ATRIBUTO = re.compile(rb'([^\s=/>]+)\s*=\s*(?:"([^"]*)"|\'([^\']*)\'|([^\s>]+))')
+_CLASSE_LISTAGEM = re.compile(rb'(?:^|\s)listings-item(?:\s|$)')
+_OCULTO = re.compile(rb'display\s*:\s*none', re.IGNORECASE)
+
+
+def _unescape(texto):
+    """
+    html.unescape com atalho para as entidades que o Bing usa nos atributos:
+    html.unescape chama uma função Python por entidade, e um data-entity tem
+    milhares de &quot;.
+    """
+    if '&' not in texto:
+        return texto
+    rapido = (texto.replace('&quot;', '"').replace('&lt;', '<').replace('&gt;', '>')
+              .replace('&#39;', "'").replace('&#x27;', "'"))
+    # &amp; por último, para que '&amp;quot;' vire '&quot;' literal
+    if rapido.count('&') == rapido.count('&amp;'):
+        return rapido.replace('&amp;', '&')
+    return html.unescape(texto)
+
+
+def extrair_data_entities(corpo, encoding='utf-8'):
+    """
+    Varre os bytes da página e retorna, para cada <a class="listings-item">,
+    o valor do atributo data-entity já decodificado (ou None se ausente).
+
+    Equivale a [a.attrib.get('data-entity') for a in response.css('a.listings-item')],
+    sem montar a árvore DOM da página.
+    """
+    payloads = []
+    for tag in _TAG_A.finditer(corpo):
+        atributos_tag = tag.group(1)
+        if b'listings-item' not in atributos_tag:
+            continue
+        atributos = {}
+        for atributo in _ATRIBUTO.finditer(atributos_tag):
+            nome = atributo.group(1).lower()
+            if nome not in atributos:
+                valor = atributo.group(2)
+                if valor is None:
+                    valor = atributo.group(3) if atributo.group(3) is not None else atributo.group(4)
+                atributos[nome] = valor
+        classe = atributos.get(b'class')
+        if classe is None or not _CLASSE_LISTAGEM.search(classe):
+            continue
+        data_entity = atributos.get(b'data-entity')
+        payloads.append(_unescape(data_entity.decode(encoding)) if data_entity is not None else None)
+    return payloads
+
+
+def tem_proxima_pagina(corpo):
+    """Indica se a seta "Próxima Página" (bm_rightChevron) da paginação está visível"""
+    # Parte das ocorrências do nome da classe (o CSS da página também o cita)
+    # em vez de varrer todas as tags <a>
+    posicao = corpo.find(b'bm_rightChevron')
+    while posicao != -1:
+        tag = _TAG_A.match(corpo, corpo.rfind(b'<', 0, posicao))
+        if tag and b'bm_rightChevron' in tag.group(1):
+            return not _OCULTO.search(tag.group(1))
+        posicao = corpo.find(b'bm_rightChevron', posicao + 1)
+    return False
+
+
+def carregar_json(texto):
+    """json.loads com orjson quando disponível (cai no json padrão para o que o orjson rejeita, ex.: NaN)"""
+    if orjson is not None:
+        try:
+            return orjson.loads(texto)
+        except orjson.JSONDecodeError:
+            pass
+    return json.loads(texto)
@@ -1,11 +1,262 @@
+import bisect
+import gzip
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict, namedtuple
+
 import requests
 
+from lead_scraper.utils.normalizacao import normalizar_texto
+
+logger = logging.getLogger(__name__)
+
+BASE_URL = "https://servicodados.ibge.gov.br/api/v1/localidades"
+
+# Padrão do cache em disco: data/cache/localidades na raiz do repositório
+CACHE_DIR_PADRAO = os.path.abspath(
+    os.path.join(os.path.dirname(__file__), '..', '..', '..', 'data', 'cache', 'localidades')
+)
+SNAPSHOT_MUNICIPIOS_PADRAO = os.path.join(CACHE_DIR_PADRAO, 'municipios.json.gz')
+
+Municipio = namedtuple('Municipio', ['id', 'nome', 'uf'])
+
+
+class LocalidadesClient:
+    """
+    Cliente da API de localidades do IBGE.
+
+    As respostas passam por dois níveis de cache: um LRU em memória e um
+    cache em disco com TTL. Vencido o TTL, a entrada é revalidada com
+    If-None-Match (ETag) e, se o IBGE responder 304, os dados do disco são
+    reaproveitados sem baixar o corpo novamente. Todas as requisições usam a
+    mesma requests.Session, reaproveitando a conexão TLS.
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR_PADRAO, ttl=7 * 24 * 3600, timeout=10, lru_size=64, session=None):
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+        self.timeout = timeout
+        self.lru_size = lru_size
+        self.session = session or requests.Session()
+        self._lru = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.revalidados = 0
+
+    def estados(self):
+        return self._get_json(f"{BASE_URL}/estados")
+
+    def cidades_por_estado(self, uf):
+        return self._get_json(f"{BASE_URL}/estados/{uf}/municipios")
+
+    def municipios(self):
+        """Todos os municípios do Brasil em uma única requisição (formato nivelado)"""
+        return self._get_json(f"{BASE_URL}/municipios?view=nivelado")
+
+    def estatisticas(self):
+        return {'hits': self.hits, 'misses': self.misses, 'revalidados': self.revalidados}
+
+    def limpar_memoria(self):
+        """Esvazia o LRU em memória (o cache em disco é mantido)"""
+        self._lru.clear()
+
+    def _get_json(self, url):
+        agora = time.time()
+
+        entrada = self._lru.get(url)
+        if entrada is not None and agora - entrada['armazenado_em'] < self.ttl:
+            self._lru.move_to_end(url)
+            self.hits += 1
+            return entrada['dados']
+
+        entrada = self._ler_disco(url)
+        if entrada is not None and agora - entrada['armazenado_em'] < self.ttl:
+            self._guardar_memoria(url, entrada)
+            self.hits += 1
+            return entrada['dados']
+
+        headers = {}
+        if entrada is not None and entrada.get('etag'):
+            headers['If-None-Match'] = entrada['etag']
+
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+        except requests.exceptions.RequestException as e:
+            if entrada is None:
+                raise
+            # Dados de referência vencidos ainda são melhores que nenhum
+            logger.warning(f'Falha ao revalidar {url} ({e}); usando cache vencido')
+            self.hits += 1
+            return entrada['dados']
+
+        if response.status_code == 304 and entrada is not None:
+            self.revalidados += 1
+        else:
+            response.raise_for_status()
+            self.misses += 1
+            entrada = {'url': url, 'etag': response.headers.get('ETag'), 'dados': response.json()}
+
+        entrada['armazenado_em'] = agora
+        self._gravar_disco(url, entrada)
+        self._guardar_memoria(url, entrada)
+        return entrada['dados']
+
+    def _guardar_memoria(self, url, entrada):
+        self._lru[url] = entrada
+        self._lru.move_to_end(url)
+        while len(self._lru) > self.lru_size:
+            self._lru.popitem(last=False)
+
+    def _caminho_disco(self, url):
+        return os.path.join(self.cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + '.json')
+
+    def _ler_disco(self, url):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._caminho_disco(url), encoding='utf-8') as f:
+                entrada = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entrada if entrada.get('url') == url else None
+
+    def _gravar_disco(self, url, entrada):
+        if not self.cache_dir:
+            return
+        os.makedirs(self.cache_dir, exist_ok=True)
+        caminho = self._caminho_disco(url)
+        # Grava em arquivo temporário e renomeia: outro processo nunca lê uma entrada pela metade
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as f:
+            json.dump(entrada, f, ensure_ascii=False)
+        os.replace(temporario, caminho)
+
+
+class IndiceMunicipios:
+    """
+    Índice em memória de todos os municípios, com consulta por UF, por id do
+    IBGE e por nome sem acentos e sem distinção de caixa, além de busca por
+    prefixo (bisect sobre os nomes normalizados ordenados).
+
+    Pode ser salvo em um snapshot compacto (JSON gzip com id, nome, UF e nome
+    normalizado) que carrega em milissegundos, sem acessar a rede.
+    """
+
+    def __init__(self, municipios):
+        self.por_id = {}
+        self.por_uf = {}
+        self.por_nome = {}
+        for registro in municipios:
+            municipio = Municipio(*registro[:3])
+            # O snapshot já traz o nome normalizado, evitando normalizar na carga
+            normalizado = registro[3] if len(registro) > 3 else normalizar_texto(municipio.nome)
+            self.por_id[municipio.id] = municipio
+            self.por_uf.setdefault(municipio.uf, []).append(municipio)
+            # O mesmo nome existe em mais de uma UF (ex.: Bom Jesus)
+            self.por_nome.setdefault(normalizado, []).append(municipio)
+        self._nomes = sorted(self.por_nome)
+
+    def __len__(self):
+        return len(self.por_id)
+
+    @classmethod
+    def do_ibge(cls, cliente=None):
+        cliente = cliente or get_cliente()
+        return cls(
+            (registro['municipio-id'], registro['municipio-nome'], registro['UF-sigla'])
+            for registro in cliente.municipios()
+        )
+
+    @classmethod
+    def carregar(cls, caminho):
+        with gzip.open(caminho, 'rt', encoding='utf-8') as f:
+            return cls(json.load(f)['municipios'])
+
+    def salvar(self, caminho):
+        os.makedirs(os.path.dirname(caminho) or '.', exist_ok=True)
+        temporario = f'{caminho}.{os.getpid()}.tmp'
+        with gzip.open(temporario, 'wt', encoding='utf-8') as f:
+            registros = [[*m, normalizado] for normalizado, municipios in self.por_nome.items() for m in municipios]
+            json.dump({'municipios': registros}, f, ensure_ascii=False, separators=(',', ':'))
+        os.replace(temporario, caminho)
+
+    def municipio(self, id_ibge):
+        return self.por_id.get(int(id_ibge))
+
+    def da_uf(self, uf):
+        return self.por_uf.get(uf.upper(), [])
+
+    def buscar(self, nome, uf=None):
+        """Municípios com o nome informado (sem acentos/caixa), opcionalmente filtrados pela UF"""
+        encontrados = self.por_nome.get(normalizar_texto(nome), [])
+        if uf:
+            uf = uf.upper()
+            return [m for m in encontrados if m.uf == uf]
+        return list(encontrados)
+
+    def resolver(self, nome, uf):
+        """Município único com o nome na UF, ou None se não existir"""
+        encontrados = self.buscar(nome, uf)
+        return encontrados[0] if encontrados else None
+
+    def prefixo(self, prefixo, uf=None, limite=None):
+        """Municípios cujo nome normalizado começa com o prefixo, em ordem alfabética"""
+        prefixo = normalizar_texto(prefixo)
+        resultado = []
+        inicio = bisect.bisect_left(self._nomes, prefixo)
+        for nome in self._nomes[inicio:]:
+            if not nome.startswith(prefixo):
+                break
+            for municipio in self.por_nome[nome]:
+                if uf is None or municipio.uf == uf.upper():
+                    resultado.append(municipio)
+                    if limite and len(resultado) >= limite:
+                        return resultado
+        return resultado
+
+
+_cliente = None
+_indice = None
+
+
+def get_cliente():
+    """Cliente padrão compartilhado pelas funções do módulo"""
+    global _cliente
+    if _cliente is None:
+        _cliente = LocalidadesClient()
+    return _cliente
+
+
+def set_cliente(cliente):
+    """Substitui o cliente padrão (ex.: outro diretório de cache ou TTL)"""
+    global _cliente
+    _cliente = cliente
+
+
+def get_indice_municipios(snapshot=None, ttl=30 * 24 * 3600):
+    """
+    Índice de municípios do processo. Usa o snapshot local (padrão:
+    SNAPSHOT_MUNICIPIOS_PADRAO; '' desativa) se ele existir e tiver menos de
+    ttl segundos; caso contrário baixa todos os municípios em uma requisição
+    e regrava o snapshot.
+    """
+    global _indice
+    if _indice is None:
+        snapshot = SNAPSHOT_MUNICIPIOS_PADRAO if snapshot is None else snapshot
+        if snapshot and os.path.exists(snapshot) and time.time() - os.path.getmtime(snapshot) < ttl:
+            _indice = IndiceMunicipios.carregar(snapshot)
+        else:
+            _indice = IndiceMunicipios.do_ibge()
+            if snapshot:
+                _indice.salvar(snapshot)
+    return _indice
+
+
 def get_estados():
-    response = requests.get("https://servicodados.ibge.gov.br/api/v1/localidades/estados")
-    response.raise_for_status()
-    return response.json()
+    return get_cliente().estados()
 
 def get_cidades_por_estado(uf):
-    response = requests.get(f"https://servicodados.ibge.gov.br/api/v1/localidades/estados/{uf}/municipios")
-    response.raise_for_status()
-    return response.json()
+    return get_cliente().cidades_por_estado(uf)
@@ -0,0 +1,95 @@
+import os
+import resource
+import sys
+import tracemalloc
+from collections import Counter
+
+from scrapy.utils.trackref import live_refs
+
+MB = 1024 * 1024
+
+# Alocações do próprio tracemalloc e do import de módulos não interessam
+FILTROS = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap>'),
+    tracemalloc.Filter(False, '<frozen importlib._bootstrap_external>'),
+    tracemalloc.Filter(False, '<unknown>'),
+)
+
+_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', '..'))
+
+
+def rss_mb():
+    """RSS atual do processo em MB (no Linux, de /proc; nos demais, o pico do getrusage)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / MB
+    except (OSError, ValueError, IndexError):
+        pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        # Linux reporta em KB, macOS em bytes
+        return pico / MB if sys.platform == 'darwin' else pico / 1024
+
+
+def contar_objetos():
+    """
+    Objetos vivos por classe, dos rastreados pelo Scrapy (scrapy.utils.trackref):
+    Request, HtmlResponse, LeadScraperItem, Selector etc.
+    """
+    return {classe.__name__: len(refs) for classe, refs in sorted(live_refs.items(), key=lambda c: c[0].__name__)
+            if refs}
+
+
+def pacote(arquivo):
+    """Pacote de um arquivo de código: openpyxl, scrapy, lead_scraper... ou stdlib"""
+    partes = arquivo.replace('\\', '/').split('/')
+    for marcador in ('site-packages', 'dist-packages'):
+        if marcador in partes[:-1]:
+            return partes[partes.index(marcador) + 1].split('.')[0]
+    if 'lead_scraper' in partes[:-1]:
+        return 'lead_scraper'
+    if arquivo.startswith(_PROJETO + os.sep):
+        return 'projeto'
+    return 'stdlib'
+
+
+def local_curto(arquivo, linha):
+    """arquivo:linha relativo ao site-packages ou à raiz do repositório"""
+    partes = arquivo.replace('\\', '/').split('/')
+    for marcador in ('site-packages', 'dist-packages'):
+        if marcador in partes[:-1]:
+            return '/'.join(partes[partes.index(marcador) + 1:]) + f':{linha}'
+    if arquivo.startswith(_PROJETO + os.sep):
+        return os.path.relpath(arquivo, _PROJETO) + f':{linha}'
+    return f'{arquivo}:{linha}'
+
+
+def por_pacote(snapshot):
+    """MB alocados (e ainda vivos) por pacote, do maior para o menor"""
+    tamanhos = Counter()
+    for estatistica in snapshot.statistics('filename'):
+        tamanhos[pacote(estatistica.traceback[0].filename)] += estatistica.size
+    return {nome: round(tamanho / MB, 3) for nome, tamanho in tamanhos.most_common()}
+
+
+def crescimento(atual, base, top=10):
+    """Os `top` locais de alocação que mais cresceram desde o snapshot `base`"""
+    diferencas = [d for d in atual.compare_to(base, 'lineno') if d.size_diff > 0]
+    diferencas.sort(key=lambda d: d.size_diff, reverse=True)
+    return [{
+        'local': local_curto(d.traceback[0].filename, d.traceback[0].lineno),
+        'kb': round(d.size_diff / 1024, 1),
+        'kb_total': round(d.size / 1024, 1),
+        'blocos': d.count_diff,
+    } for d in diferencas[:top]]
+
+
+def inclinacao(pontos):
+    """Inclinação da reta de mínimos quadrados pelos pontos (x, y); None com menos de dois x distintos"""
+    if len(pontos) < 2:
+        return None
+    media_x = sum(x for x, _ in pontos) / len(pontos)
+    media_y = sum(y for _, y in pontos) / len(pontos)
+    variancia = sum((x - media_x) ** 2 for x, _ in pontos)
+    if not variancia:
+        return None
+    return sum((x - media_x) * (y - media_y) for x, y in pontos) / variancia
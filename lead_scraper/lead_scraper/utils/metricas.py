@@ -0,0 +1,113 @@
+import bisect
+import math
+
+# Limites dos buckets (segundos) dos tempos por etapa: de 10 µs (um item em
+# uma pipeline) a 60 s (um download lento com retentativas de conexão)
+BUCKETS_SEGUNDOS = (0.00001, 0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025,
+                    0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+# Limites dos buckets de profundidade de fila (requisições)
+BUCKETS_FILA = (0, 1, 2, 4, 8, 16, 32, 64, 128, 256, 512, 1024, 4096)
+
+
+class Histograma:
+    """
+    Histograma de buckets fixos, como os do Prometheus: contagens por limite
+    superior, soma e total das observações. Memória constante, qualquer que
+    seja a duração da execução.
+    """
+
+    __slots__ = ('limites', 'contagens', 'soma', 'total')
+
+    def __init__(self, limites=BUCKETS_SEGUNDOS):
+        self.limites = tuple(limites)
+        # Um bucket por limite e o último para valores acima de todos (+Inf)
+        self.contagens = [0] * (len(self.limites) + 1)
+        self.soma = 0.0
+        self.total = 0
+
+    def observar(self, valor):
+        self.contagens[bisect.bisect_left(self.limites, valor)] += 1
+        self.soma += valor
+        self.total += 1
+
+    def copia(self):
+        copia = Histograma(self.limites)
+        copia.contagens = list(self.contagens)
+        copia.soma = self.soma
+        copia.total = self.total
+        return copia
+
+    def desde(self, anterior):
+        """Observações feitas depois de `anterior` (uma cópia anterior deste histograma)"""
+        diferenca = Histograma(self.limites)
+        diferenca.contagens = [a - b for a, b in zip(self.contagens, anterior.contagens)]
+        diferenca.soma = self.soma - anterior.soma
+        diferenca.total = self.total - anterior.total
+        return diferenca
+
+    def quantil(self, q):
+        """
+        Estima o quantil q (0-1) por interpolação linear dentro do bucket,
+        como o histogram_quantile do Prometheus. None sem observações.
+        """
+        if not self.total:
+            return None
+        alvo = q * self.total
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            if contagem and acumulado + contagem >= alvo:
+                if indice == len(self.limites):
+                    # Acima do último limite não há como interpolar
+                    return self.limites[-1]
+                inferior = self.limites[indice - 1] if indice else 0.0
+                return inferior + (self.limites[indice] - inferior) * (alvo - acumulado) / contagem
+            acumulado += contagem
+        return self.limites[-1]
+
+    def resumo(self):
+        """Total, média e p50/p90/p99 estimados, para os snapshots"""
+        valores = {
+            'media': self.soma / self.total if self.total else None,
+            'p50': self.quantil(0.5),
+            'p90': self.quantil(0.9),
+            'p99': self.quantil(0.99),
+        }
+        return dict({'total': self.total}, **{k: v if v is None else round(v, 6) for k, v in valores.items()})
+
+
+def _numero(valor):
+    if valor == math.inf:
+        return '+Inf'
+    return repr(float(valor)) if isinstance(valor, float) else str(valor)
+
+
+def _rotulos(rotulos, **extras):
+    pares = list(rotulos.items()) + list(extras.items())
+    if not pares:
+        return ''
+    return '{' + ','.join(f'{nome}="{valor}"' for nome, valor in pares) + '}'
+
+
+def formatar_prometheus(metricas):
+    """
+    Texto no formato de exposição do Prometheus (versão 0.0.4).
+
+    metricas: lista de (nome, tipo, ajuda, series), com tipo 'counter',
+    'gauge' ou 'histogram' e series uma lista de (rotulos, valor), em que o
+    valor de um histograma é um Histograma.
+    """
+    linhas = []
+    for nome, tipo, ajuda, series in metricas:
+        linhas.append(f'# HELP {nome} {ajuda}')
+        linhas.append(f'# TYPE {nome} {tipo}')
+        for rotulos, valor in series:
+            if tipo != 'histogram':
+                linhas.append(f'{nome}{_rotulos(rotulos)} {_numero(valor)}')
+                continue
+            acumulado = 0
+            for limite, contagem in zip(valor.limites + (math.inf,), valor.contagens):
+                acumulado += contagem
+                linhas.append(f'{nome}_bucket{_rotulos(rotulos, le=_numero(limite))} {acumulado}')
+            linhas.append(f'{nome}_sum{_rotulos(rotulos)} {_numero(valor.soma)}')
+            linhas.append(f'{nome}_count{_rotulos(rotulos)} {valor.total}')
+    return '\n'.join(linhas) + '\n'
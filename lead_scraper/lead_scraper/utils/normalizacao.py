@@ -0,0 +1,55 @@
+import re
+import unicodedata
+from urllib.parse import parse_qs, urlsplit
+
+_ESPACOS = re.compile(r'\s+')
+_PONTUACAO = re.compile(r'[^\w\s]+')
+# Bloco de diacríticos combinantes (acentos, til, cedilha após NFKD)
+_DIACRITICOS = re.compile('[\u0300-\u036f]')
+
+
+def remover_acentos(texto):
+    if texto.isascii():
+        return texto
+    return _DIACRITICOS.sub('', unicodedata.normalize('NFKD', texto))
+
+
+def normalizar_texto(texto):
+    """
+    Normaliza um texto para comparação: sem acentos, minúsculo e com espaços
+    colapsados. Ex.: ' São  Paulo ' -> 'sao paulo'.
+    """
+    if not texto:
+        return ''
+    return _ESPACOS.sub(' ', remover_acentos(str(texto))).strip().casefold()
+
+
+def chave_lead(nome, endereco, cidade):
+    """
+    Chave natural de um lead: nome, endereço e cidade normalizados e sem
+    pontuação, para que 'Rua X, 123' e 'rua x 123' sejam a mesma entidade.
+    """
+    partes = (_PONTUACAO.sub(' ', normalizar_texto(valor)) for valor in (nome, endereco, cidade))
+    return '|'.join(_ESPACOS.sub(' ', parte).strip() for parte in partes)
+
+
+def texto_busca(termo, estado, cidade, bairro=None):
+    """Texto da busca no Bing Maps (parâmetro q): '<termo> em [<bairro>, ]<cidade>, <estado>'"""
+    local = f'{bairro}, {cidade}, {estado}' if bairro else f'{cidade}, {estado}'
+    return f'{termo} em {local}'
+
+
+def chave_consulta(url):
+    """
+    Chave normalizada de uma busca no Bing Maps: o texto do parâmetro q
+    ('<termo> em <bairro>, <cidade>, <estado>') normalizado, mais a página
+    (first), independente do host e da codificação da URL. Retorna None para
+    URLs sem q.
+    """
+    parametros = parse_qs(urlsplit(url).query)
+    if 'q' not in parametros:
+        return None
+    chave = normalizar_texto(parametros['q'][0])
+    if 'first' in parametros:
+        chave += f"|first={parametros['first'][0]}"
+    return chave
@@ -0,0 +1,118 @@
+import os
+import sys
+import threading
+from collections import Counter, defaultdict
+
+
+def rotulo_codigo(codigo):
+    """Nome de um quadro na pilha colapsada: função (arquivo:linha)"""
+    return f'{codigo.co_name} ({os.path.basename(codigo.co_filename)}:{codigo.co_firstlineno})'
+
+
+def rotulo_pstats(funcao):
+    """Mesmo formato de rotulo_codigo para as chaves (arquivo, linha, nome) do pstats"""
+    arquivo, linha, nome = funcao
+    if arquivo == '~':
+        # Funções em C: '<built-in method builtins.next>' etc.
+        return nome
+    return f'{nome} ({os.path.basename(arquivo)}:{linha})'
+
+
+def formatar_colapsadas(pilhas):
+    """
+    Linhas no formato de pilhas colapsadas ("a;b;c 12"), aceito pelo
+    flamegraph.pl, pelo speedscope e pelo inferno. pilhas: Counter de tuplas
+    de rótulos (da raiz para a folha) para um peso inteiro.
+    """
+    linhas = []
+    for pilha, peso in sorted(pilhas.items()):
+        if peso > 0:
+            # ';' separa os quadros, então não pode aparecer dentro de um rótulo
+            linhas.append(';'.join(quadro.replace(';', ',') for quadro in pilha) + f' {peso}')
+    return '\n'.join(linhas) + '\n' if linhas else ''
+
+
+def colapsar_pstats(estatisticas, fracao_minima=0.0001):
+    """
+    Converte o grafo de chamadas do cProfile (pstats.Stats.stats) em pilhas
+    colapsadas, com peso em microssegundos.
+
+    O cProfile guarda só pares chamador → chamado, não a pilha inteira: o
+    tempo de cada função é dividido entre os caminhos na proporção do tempo
+    gasto a partir de cada chamador. É uma aproximação (a mesma do flameprof)
+    e pode errar quando uma função é chamada por vários caminhos com custos
+    muito diferentes. Caminhos abaixo de fracao_minima do total são somados
+    ao tempo próprio do pai, o que limita o tamanho do resultado.
+    """
+    filhos = defaultdict(list)
+    for funcao, (_, _, _, _, chamadores) in estatisticas.items():
+        for chamador, valores in chamadores.items():
+            filhos[chamador].append((funcao, valores[3]))
+    raizes = [funcao for funcao, valores in estatisticas.items()
+              if not valores[4] and not _eh_controle_do_perfil(funcao)]
+    total = sum(estatisticas[raiz][3] for raiz in raizes)
+    minimo = total * fracao_minima
+    pilhas = Counter()
+
+    def visitar(funcao, tempo, caminho):
+        caminho = caminho + (funcao,)
+        acumulado = estatisticas[funcao][3]
+        proprio = tempo
+        for filho, tempo_filho in filhos[funcao]:
+            # Recursão: o tempo do ciclo já está no acumulado do primeiro quadro
+            if filho in caminho or not acumulado:
+                continue
+            parcela = min(tempo, tempo * tempo_filho / acumulado)
+            if parcela < minimo:
+                continue
+            proprio -= parcela
+            visitar(filho, parcela, caminho)
+        pilhas[tuple(rotulo_pstats(f) for f in caminho)] += round(max(proprio, 0.0) * 1e6)
+
+    for raiz in raizes:
+        visitar(raiz, estatisticas[raiz][3], ())
+    return pilhas
+
+
+def _eh_controle_do_perfil(funcao):
+    # O disable() do próprio Profile aparece como raiz em toda chamada perfilada
+    return funcao[0] == '~' and '_lsprof.Profiler' in funcao[2]
+
+
+class AmostradorDePilhas(threading.Thread):
+    """
+    Profiler por amostragem: a cada `intervalo` segundos lê a pilha da thread
+    que o criou (a do reactor) e, se um componente estiver sendo perfilado
+    naquele momento, conta a pilha até o quadro de `corte` (a função que
+    chama o componente), sem os quadros do Twisted e do Scrapy acima dele.
+
+    O custo fica na thread do amostrador; a thread do reactor só marca qual
+    componente está em execução.
+    """
+
+    def __init__(self, corte, intervalo=0.005):
+        super().__init__(name='amostrador-perfil', daemon=True)
+        self.corte = corte
+        self.intervalo = intervalo
+        self.alvo = threading.get_ident()
+        self.componente = None
+        self.pilhas = defaultdict(Counter)
+        self._parar = threading.Event()
+
+    def run(self):
+        while not self._parar.wait(self.intervalo):
+            componente = self.componente
+            if componente is None:
+                continue
+            quadro = sys._current_frames().get(self.alvo)
+            pilha = []
+            while quadro is not None and quadro.f_code is not self.corte:
+                pilha.append(rotulo_codigo(quadro.f_code))
+                quadro = quadro.f_back
+            # Sem o quadro de corte, o componente terminou durante a leitura
+            if quadro is not None:
+                self.pilhas[componente][tuple(reversed(pilha))] += 1
+
+    def parar(self):
+        self._parar.set()
+        self.join()
@@ -50,15 +50,17 @@ def temp_excel_dir(tmp_path):
 
 
 @pytest.fixture
-def mock_localidades_api(monkeypatch):
+def mock_localidades_api(monkeypatch, tmp_path):
     """Simula requisições à API de localidades do IBGE"""
     import requests
+    from lead_scraper.utils import localidades_api
     
     class MockResponse:
         def __init__(self, json_data, status_code=200):
             self.json_data = json_data
             self.status_code = status_code
             self.text = str(json_data)
+            self.headers = {}
         
         def json(self):
             return self.json_data
@@ -67,17 +69,27 @@ def mock_localidades_api(monkeypatch):
             if self.status_code != 200:
                 raise requests.exceptions.HTTPError(f"HTTP {self.status_code}")
     
-    def mock_get(url, *args, **kwargs):
-        if 'estados' in url:
+    def mock_get(session, url, *args, **kwargs):
+        if 'view=nivelado' in url:
             return MockResponse([
-                {'id': 43, 'sigla': 'RS', 'nome': 'Rio Grande do Sul'},
-                {'id': 35, 'sigla': 'SP', 'nome': 'São Paulo'}
+                {'municipio-id': 4314902, 'municipio-nome': 'Porto Alegre', 'UF-sigla': 'RS'},
+                {'municipio-id': 4304606, 'municipio-nome': 'Canoas', 'UF-sigla': 'RS'},
+                {'municipio-id': 3550308, 'municipio-nome': 'São Paulo', 'UF-sigla': 'SP'}
             ])
         elif 'municipios' in url:
             return MockResponse([
                 {'id': 4314902, 'nome': 'Porto Alegre'},
                 {'id': 4304606, 'nome': 'Canoas'}
             ])
+        elif 'estados' in url:
+            return MockResponse([
+                {'id': 43, 'sigla': 'RS', 'nome': 'Rio Grande do Sul'},
+                {'id': 35, 'sigla': 'SP', 'nome': 'São Paulo'}
+            ])
         return MockResponse({}, 404)
     
-    monkeypatch.setattr(requests, 'get', mock_get)
+    monkeypatch.setattr(requests.Session, 'get', mock_get)
+    # Cliente padrão novo, com cache em disco temporário
+    monkeypatch.setattr(localidades_api, '_cliente', localidades_api.LocalidadesClient(cache_dir=str(tmp_path / 'localidades')))
+    monkeypatch.setattr(localidades_api, '_indice', None)
+    monkeypatch.setattr(localidades_api, 'SNAPSHOT_MUNICIPIOS_PADRAO', str(tmp_path / 'localidades' / 'municipios.json.gz'))
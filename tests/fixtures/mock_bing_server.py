@@ -0,0 +1,179 @@
+"""
+Servidor HTTP local que imita o Bing Maps para testes de carga e de controle
+de concorrência, com latência, erros, bloqueios e páginas vazias injetados.
+
+Uso como script (a partir da raiz do repositório):
+
+    python -m tests.fixtures.mock_bing_server --porta 8765 --latencia 0.2 --taxa-erro 0.05 --listagens 50
+
+e então:
+
+    scrapy crawl bing_maps -a termo=academias -s BING_MAPS_URL=http://127.0.0.1:8765/maps
+"""
+import argparse
+import os
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+FIXTURE_HTML = os.path.join(os.path.dirname(__file__), 'mock_bing_response.html')
+
+PAGINA_VAZIA = b'<html><body><div class="b_vList"></div></body></html>'
+
+_LISTAGEM = re.compile(rb'<li data-priority=.*?</li>', re.S)
+_ID_ENTIDADE = re.compile(rb'(&quot;id&quot;:&quot;)([^&]*)(&quot;)')
+
+
+def pagina_sintetica(listagens, html=None):
+    """
+    Página com `listagens` resultados, montada a partir da fixture: os <li> de
+    listagem são repetidos em ciclo no lugar da lista original e cada cópia
+    recebe um id de entidade próprio (o spider descarta ids repetidos).
+    """
+    if html is None:
+        with open(FIXTURE_HTML, 'rb') as f:
+            html = f.read()
+    originais = list(_LISTAGEM.finditer(html))
+    blocos = []
+    for i in range(listagens):
+        bloco = originais[i % len(originais)].group(0)
+        if i >= len(originais):
+            bloco = _ID_ENTIDADE.sub(lambda m: m.group(1) + m.group(2) + b'_%d' % i + m.group(3), bloco, count=1)
+        blocos.append(bloco)
+    return html[:originais[0].start()] + b''.join(blocos) + html[originais[-1].end():]
+
+
+class MockBingServer:
+    """
+    Servidor em uma thread, iniciado com start() (ou como context manager).
+
+    latencia: segundos somados a cada resposta (mais jitter aleatório de até
+        50% do valor).
+    taxa_erro / taxa_bloqueio / taxa_vazia: probabilidade de responder 500,
+        429 ou uma página sem listagens.
+    limite_concorrencia: acima desse número de requisições simultâneas o
+        servidor responde 429, como um site que bloqueia rajadas.
+    listagens: resultados por página (ver pagina_sintetica); sem ele, serve
+        a fixture como está.
+    """
+
+    def __init__(self, latencia=0.0, taxa_erro=0.0, taxa_bloqueio=0.0, taxa_vazia=0.0,
+                 limite_concorrencia=None, html=None, semente=0, porta=0, listagens=None):
+        self.latencia = latencia
+        self.taxa_erro = taxa_erro
+        self.taxa_bloqueio = taxa_bloqueio
+        self.taxa_vazia = taxa_vazia
+        self.limite_concorrencia = limite_concorrencia
+        self.porta = porta
+        if html is None:
+            with open(FIXTURE_HTML, 'rb') as f:
+                html = f.read()
+        self.html = html if isinstance(html, bytes) else html.encode('utf-8')
+        if listagens is not None:
+            self.html = pagina_sintetica(listagens, self.html)
+        self._aleatorio = random.Random(semente)
+        self._lock = threading.Lock()
+        self.em_andamento = 0
+        self.pico_concorrencia = 0
+        self.contadores = {'requisicoes': 0, 'ok': 0, 'erros': 0, 'bloqueios': 0, 'vazias': 0}
+        self._servidor = None
+        self._thread = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._servidor.server_address[1]}/maps'
+
+    def start(self):
+        servidor_mock = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                servidor_mock._atender(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', self.porta), Handler)
+        self._servidor.daemon_threads = True
+        self._thread = threading.Thread(target=self._servidor.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _sortear(self):
+        with self._lock:
+            self.contadores['requisicoes'] += 1
+            self.em_andamento += 1
+            self.pico_concorrencia = max(self.pico_concorrencia, self.em_andamento)
+            excedeu = self.limite_concorrencia is not None and self.em_andamento > self.limite_concorrencia
+            sorteio = self._aleatorio.random()
+            jitter = self._aleatorio.random() * 0.5
+        if excedeu:
+            return 'bloqueios', jitter
+        for resultado, taxa in (('erros', self.taxa_erro), ('bloqueios', self.taxa_bloqueio),
+                                ('vazias', self.taxa_vazia)):
+            if sorteio < taxa:
+                return resultado, jitter
+            sorteio -= taxa
+        return 'ok', jitter
+
+    def _atender(self, handler):
+        resultado, jitter = self._sortear()
+        try:
+            if self.latencia:
+                time.sleep(self.latencia * (1 + jitter))
+            status, corpo = {
+                'ok': (200, self.html),
+                'vazias': (200, PAGINA_VAZIA),
+                'erros': (500, b'erro interno'),
+                'bloqueios': (429, b'muitas requisicoes'),
+            }[resultado]
+            handler.send_response(status)
+            handler.send_header('Content-Type', 'text/html; charset=utf-8')
+            handler.send_header('Content-Length', str(len(corpo)))
+            handler.end_headers()
+            handler.wfile.write(corpo)
+        finally:
+            with self._lock:
+                self.em_andamento -= 1
+                self.contadores[resultado] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Servidor local que imita o Bing Maps')
+    parser.add_argument('--porta', type=int, default=8765)
+    parser.add_argument('--latencia', type=float, default=0.0)
+    parser.add_argument('--taxa-erro', type=float, default=0.0)
+    parser.add_argument('--taxa-bloqueio', type=float, default=0.0)
+    parser.add_argument('--taxa-vazia', type=float, default=0.0)
+    parser.add_argument('--limite-concorrencia', type=int, default=None)
+    parser.add_argument('--listagens', type=int, default=None)
+    args = parser.parse_args()
+
+    servidor = MockBingServer(latencia=args.latencia, taxa_erro=args.taxa_erro, taxa_bloqueio=args.taxa_bloqueio,
+                              taxa_vazia=args.taxa_vazia, limite_concorrencia=args.limite_concorrencia,
+                              porta=args.porta, listagens=args.listagens).start()
+    print(f'Servidor em {servidor.url} (Ctrl+C para encerrar)')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        servidor.stop()
+        print(servidor.contadores)
+
+
+if __name__ == '__main__':
+    main()
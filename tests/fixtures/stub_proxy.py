@@ -0,0 +1,114 @@
+"""
+Proxy HTTP local para testes do EgressPoolMiddleware: repassa as requisições
+ao destino ou simula uma saída bloqueada ou lenta.
+
+Uso como script (a partir da raiz do repositório):
+
+    python -m tests.fixtures.stub_proxy --porta 8899 --bloquear
+
+e então:
+
+    scrapy crawl bing_maps -a termo=academias -s EGRESS_POOL=http://127.0.0.1:8899
+"""
+import argparse
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Sem proxies do ambiente: o stub sempre fala direto com o destino
+_ABRIDOR = urllib.request.build_opener(urllib.request.ProxyHandler({}))
+
+
+class StubProxy:
+    """
+    Proxy em uma thread, iniciado com start() (ou como context manager).
+
+    bloquear: responde 429 sem repassar, como um IP de saída bloqueado.
+    latencia: segundos somados a cada resposta.
+    """
+
+    def __init__(self, bloquear=False, latencia=0.0, porta=0):
+        self.bloquear = bloquear
+        self.latencia = latencia
+        self.porta = porta
+        self._lock = threading.Lock()
+        self.contadores = {'requisicoes': 0, 'repassadas': 0, 'bloqueadas': 0}
+        self._servidor = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self._servidor.server_address[1]}'
+
+    def start(self):
+        proxy = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                proxy._atender(self)
+
+            def log_message(self, *args):
+                pass
+
+        self._servidor = ThreadingHTTPServer(('127.0.0.1', self.porta), Handler)
+        self._servidor.daemon_threads = True
+        threading.Thread(target=self._servidor.serve_forever, daemon=True).start()
+        return self
+
+    def stop(self):
+        if self._servidor:
+            self._servidor.shutdown()
+            self._servidor.server_close()
+            self._servidor = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    def _atender(self, handler):
+        with self._lock:
+            self.contadores['requisicoes'] += 1
+        if self.latencia:
+            time.sleep(self.latencia)
+        if self.bloquear:
+            status, corpo, tipo = 429, b'bloqueado', 'text/plain'
+            chave = 'bloqueadas'
+        else:
+            # Em um proxy HTTP, o caminho da requisição é a URL absoluta do destino
+            try:
+                with _ABRIDOR.open(handler.path, timeout=10) as resposta:
+                    status, corpo, tipo = resposta.status, resposta.read(), resposta.headers.get('Content-Type')
+            except urllib.error.HTTPError as e:
+                status, corpo, tipo = e.code, e.read(), e.headers.get('Content-Type')
+            chave = 'repassadas'
+        handler.send_response(status)
+        handler.send_header('Content-Type', tipo or 'text/html')
+        handler.send_header('Content-Length', str(len(corpo)))
+        handler.end_headers()
+        handler.wfile.write(corpo)
+        with self._lock:
+            self.contadores[chave] += 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Proxy HTTP local para testes do pool de saídas')
+    parser.add_argument('--porta', type=int, default=8899)
+    parser.add_argument('--latencia', type=float, default=0.0)
+    parser.add_argument('--bloquear', action='store_true')
+    args = parser.parse_args()
+
+    proxy = StubProxy(bloquear=args.bloquear, latencia=args.latencia, porta=args.porta).start()
+    print(f'Proxy em {proxy.url} (Ctrl+C para encerrar)')
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        proxy.stop()
+        print(proxy.contadores)
+
+
+if __name__ == '__main__':
+    main()
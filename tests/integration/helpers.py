@@ -0,0 +1,34 @@
+"""Utilitários compartilhados pelos testes de integração que executam crawls reais"""
+import json
+import os
+import re
+import subprocess
+import sys
+
+PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'lead_scraper'))
+
+
+def comando_crawl(url, bairros, settings, termo='academias', argumentos=None):
+    """Linha de comando de `scrapy crawl bing_maps` contra o servidor local, com as settings e argumentos extras"""
+    comando = [sys.executable, '-m', 'scrapy', 'crawl', 'bing_maps', '-a', f'termo={termo}',
+               '-a', f'bairros={",".join(bairros)}', '-s', f'BING_MAPS_URL={url}',
+               '-s', 'ITEM_PIPELINES={}', '-s', 'LOG_LEVEL=INFO', '-s', 'RETRY_ENABLED=False',
+               '-s', 'BING_PARSE_ENGINE=regex', '-s', 'BING_MAX_PAGES=1']
+    for chave, valor in (argumentos or {}).items():
+        comando += ['-a', f'{chave}={valor}']
+    for chave, valor in settings.items():
+        comando += ['-s', f'{chave}={json.dumps(valor) if isinstance(valor, (dict, list)) else valor}']
+    return comando
+
+
+def executar_crawl(url, bairros, settings, termo='academias'):
+    """Executa `scrapy crawl bing_maps` em um subprocesso (o reactor do Twisted não reinicia no mesmo processo)"""
+    resultado = subprocess.run(comando_crawl(url, bairros, settings, termo), cwd=PROJETO, capture_output=True,
+                               text=True, timeout=120)
+    assert resultado.returncode == 0, resultado.stderr[-3000:]
+    return resultado.stderr
+
+
+def stat(log, chave):
+    encontrado = re.search(rf"'{re.escape(chave)}': ([\d.]+)", log)
+    return float(encontrado.group(1)) if encontrado else None
@@ -0,0 +1,45 @@
+"""Testes de integração da AdaptiveConcurrency contra o servidor local que imita o Bing"""
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import executar_crawl, stat
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_backs_off_when_server_blocks_bursts():
+    """
+    Verifica que, contra um servidor que responde 429 acima de 3 requisições
+    simultâneas, a extensão reduz a concorrência do slot e registra as decisões.
+    """
+    with MockBingServer(latencia=0.05, limite_concorrencia=3) as servidor:
+        log = executar_crawl(servidor.url, [f'Bairro {i}' for i in range(120)], {
+            'ADAPTIVE_CONCURRENCY_ENABLED': True,
+            'ADAPTIVE_CONCURRENCY_INTERVAL': 0.5,
+            'ADAPTIVE_CONCURRENCY_MIN_SAMPLES': 3,
+            'CONCURRENT_REQUESTS_PER_DOMAIN': 8,
+            # Isola a extensão: com 429 em rajadas o circuit breaker pausaria o domínio
+            'CIRCUIT_BREAKER_ENABLED': False,
+        })
+
+    assert 'Concorrência do slot 127.0.0.1: 8 -> 4 (bloqueios;' in log
+    assert stat(log, 'adaptive_concurrency/reducoes') >= 1
+    assert stat(log, 'adaptive_concurrency/concorrencia/127.0.0.1') <= 4
+    assert servidor.contadores['ok'] > 0
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_increases_when_healthy():
+    """Verifica o aumento aditivo contra um servidor saudável com fila no slot"""
+    with MockBingServer(latencia=0.05) as servidor:
+        log = executar_crawl(servidor.url, [f'Bairro {i}' for i in range(120)], {
+            'ADAPTIVE_CONCURRENCY_ENABLED': True,
+            'ADAPTIVE_CONCURRENCY_INTERVAL': 0.5,
+            'ADAPTIVE_CONCURRENCY_MIN_SAMPLES': 3,
+            'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+        })
+
+    assert 'Concorrência do slot 127.0.0.1: 2 -> 3 (saudável com fila;' in log
+    assert stat(log, 'adaptive_concurrency/aumentos') >= 1
+    assert servidor.pico_concorrencia >= 3
@@ -0,0 +1,45 @@
+"""Teste de integração da retomada de uma execução interrompida"""
+import json
+
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import executar_crawl, stat
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_interrupted_run_resumes_without_repeating_queries(tmp_path):
+    """
+    Verifica que, após uma execução interrompida, a seguinte só busca as
+    consultas que faltavam e continua as partes da mesma exportação.
+    """
+    bairros = [f'Bairro {i}' for i in range(60)]
+    settings = {
+        'CHECKPOINT_ENABLED': True,
+        'CHECKPOINT_FILE': str(tmp_path / 'checkpoint.sqlite'),
+        'ITEM_PIPELINES': {'lead_scraper.pipelines.ExcelExportPipeline': 300},
+        'EXCEL_EXPORT_DIR': str(tmp_path),
+        'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+    }
+    with MockBingServer(latencia=0.01) as servidor:
+        log = executar_crawl(servidor.url, bairros, {**settings, 'CLOSESPIDER_PAGECOUNT': 20})
+        primeira = servidor.contadores['requisicoes']
+        concluidas = stat(log, 'checkpoint/concluidas')
+        assert 'será retomada na próxima vez' in log
+
+        log = executar_crawl(servidor.url, bairros, settings)
+        segunda = servidor.contadores['requisicoes'] - primeira
+
+    assert primeira < 60
+    assert segunda == 60 - concluidas
+    assert stat(log, 'checkpoint/puladas') == concluidas
+    assert 'Retomando a execução' in log
+
+    manifestos = list(tmp_path.glob('leads_*_manifest.json'))
+    assert len(manifestos) == 1
+    manifesto = json.loads(manifestos[0].read_text(encoding='utf-8'))
+    assert manifesto['completo'] is True
+    assert len(manifesto['partes']) == 2
+    # Cada consulta exportada uma única vez: 18 listagens por página da fixture
+    assert manifesto['total_linhas'] == 18 * 60
@@ -0,0 +1,30 @@
+"""Testes de integração do EgressPoolMiddleware com proxies locais"""
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.fixtures.stub_proxy import StubProxy
+from tests.integration.helpers import executar_crawl, stat
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_traffic_moves_away_from_blocked_proxy():
+    """
+    Verifica que, com um proxy bloqueado entre dois saudáveis, o bloqueado é
+    posto em quarentena e o tráfego segue pelos saudáveis.
+    """
+    with MockBingServer() as servidor, StubProxy() as ok1, StubProxy() as ok2, \
+            StubProxy(bloquear=True) as bloqueado:
+        nome_bloqueado = bloqueado.url[len('http://'):]
+        log = executar_crawl(servidor.url, [f'Bairro {i}' for i in range(60)], {
+            'EGRESS_POOL': f'{ok1.url},{ok2.url},{bloqueado.url}',
+            'EGRESS_COOLDOWN': 60,
+            'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+        })
+
+    assert ok1.contadores['repassadas'] + ok2.contadores['repassadas'] == servidor.contadores['requisicoes']
+    # Só as requisições já distribuídas quando veio o primeiro bloqueio chegam ao proxy bloqueado
+    assert bloqueado.contadores['requisicoes'] <= 10
+    assert ok1.contadores['repassadas'] > 0 and ok2.contadores['repassadas'] > 0
+    assert stat(log, 'egress/quarentenas') == 1
+    assert f'Saída {nome_bloqueado} em quarentena por 60s (bloqueio (HTTP 429))' in log
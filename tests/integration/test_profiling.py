@@ -0,0 +1,34 @@
+"""Testes de integração da ProfilingHooks contra o servidor local que imita o Bing"""
+import pstats
+import subprocess
+
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import PROJETO, comando_crawl, stat
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_profile_spider_argument(tmp_path):
+    """Verifica -a profile=all: um perfil por componente, 1 chamada a cada N e as pilhas colapsadas no fechamento"""
+    pasta = tmp_path / 'perfis'
+    with MockBingServer(listagens=20) as servidor:
+        resultado = subprocess.run(comando_crawl(servidor.url, [f'Bairro {i}' for i in range(6)], {
+            'PROFILE_DIR': str(pasta),
+            'PROFILE_EVERY': 3,
+            'ITEM_PIPELINES': {'lead_scraper.pipelines.StreamExportPipeline': 330},
+            'STREAM_EXPORT_URI': str(tmp_path / 'leads.ndjson'),
+        }, argumentos={'profile': 'all'}), cwd=PROJETO, capture_output=True, text=True, timeout=120)
+
+    log = resultado.stderr
+    assert resultado.returncode == 0, log[-3000:]
+    assert stat(log, 'perfil/BingMapsSpider.parse/chamadas') == 6
+    assert stat(log, 'perfil/BingMapsSpider.parse/perfiladas') == 2
+    assert stat(log, 'perfil/StreamExportPipeline.process_item/perfiladas') == 40
+    for componente in ('BingMapsSpider.parse', 'StreamExportPipeline.process_item',
+                       'StreamExportPipeline.close_spider'):
+        assert pstats.Stats(str(pasta / f'{componente}.prof')).total_calls > 0
+    pilhas = (pasta / 'pilhas.collapsed').read_text(encoding='utf-8').splitlines()
+    assert any(linha.startswith('BingMapsSpider.parse;') for linha in pilhas)
+    assert any(linha.startswith('StreamExportPipeline.process_item;') for linha in pilhas)
@@ -0,0 +1,16 @@
+"""Teste de integração da supressão de buscas equivalentes"""
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import executar_crawl, stat
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_equivalent_bairros_are_fetched_once():
+    """Verifica que bairros repetidos com outra grafia não chegam ao servidor e entram nas estatísticas"""
+    with MockBingServer() as servidor:
+        log = executar_crawl(servidor.url, ['Centro', ' centro', 'CÊNTRO', 'Moinhos de Vento', 'moinhos  de vento'], {})
+
+    assert servidor.contadores['requisicoes'] == 2
+    assert stat(log, 'dupefilter/filtered') == 3
@@ -0,0 +1,72 @@
+"""Testes de integração do ResponseGuardMiddleware contra o servidor local que imita o Bing"""
+import time
+
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import executar_crawl, stat
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_transient_errors_are_retried_within_budget():
+    """Verifica que erros 500 são refeitos com backoff sem passar do orçamento global"""
+    with MockBingServer(taxa_erro=0.3, semente=1) as servidor:
+        log = executar_crawl(servidor.url, [f'Bairro {i}' for i in range(60)], {
+            'RETRY_ENABLED': True,
+            'RETRY_BACKOFF_BASE': 0.05,
+            'RETRY_BACKOFF_MAX': 0.2,
+            'CIRCUIT_BREAKER_ENABLED': False,
+        })
+
+    refeitas = stat(log, 'retry/count')
+    assert 0 < refeitas <= 10 + 0.2 * 60
+    assert servidor.contadores['requisicoes'] == 60 + refeitas
+    assert stat(log, 'respostas/ok') == servidor.contadores['ok']
+    assert stat(log, 'retry/backoff_segundos') > 0
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_circuit_breaker_stops_requests_during_block():
+    """Verifica que, com o site bloqueando tudo, o circuito abre e as requisições deixam de sair"""
+    with MockBingServer(taxa_bloqueio=1.0) as servidor:
+        log = executar_crawl(servidor.url, [f'Bairro {i}' for i in range(60)], {
+            'CIRCUIT_BREAKER_MIN_SAMPLES': 5,
+            'CIRCUIT_BREAKER_COOLDOWN': 0.5,
+            'CIRCUIT_BREAKER_COOLDOWN_MAX': 1,
+            'CLOSESPIDER_TIMEOUT': 4,
+            'CONCURRENT_REQUESTS_PER_DOMAIN': 2,
+        })
+
+    assert 'Circuit breaker de 127.0.0.1 aberto por 0.5s (100% de bloqueios e erros nas últimas 5 respostas)' in log
+    assert stat(log, 'circuit_breaker/aberturas') >= 2
+    assert stat(log, 'respostas/bloqueada') == servidor.contadores['bloqueios']
+    # Pausado, o crawl faz só as requisições de teste em vez de esgotar a fila
+    assert servidor.contadores['requisicoes'] < 30
+    # No encerramento, as que esperavam o circuito são descartadas em vez de drenadas uma a uma
+    assert (stat(log, 'circuit_breaker/descartadas') or 0) + (stat(log, 'response_guard/descartadas') or 0) > 0
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_long_backoff_does_not_stall_crawl_or_close():
+    """Verifica que novas tentativas com backoff longo não ocupam a única vaga de download nem atrasam o fechamento"""
+    with MockBingServer(taxa_bloqueio=0.5, semente=0) as servidor:
+        inicio = time.monotonic()
+        log = executar_crawl(servidor.url, [f'Bairro {i}' for i in range(6)], {
+            'RETRY_ENABLED': True,
+            'RETRY_BACKOFF_BASE': 600,
+            'RETRY_BACKOFF_MAX': 600,
+            'CIRCUIT_BREAKER_ENABLED': False,
+            'CONCURRENT_REQUESTS': 1,
+            'CLOSESPIDER_TIMEOUT': 3,
+        })
+        duracao = time.monotonic() - inicio
+
+    # Todas as buscas originais saíram, apesar das novas tentativas esperando
+    assert servidor.contadores['requisicoes'] >= 6
+    assert servidor.contadores['bloqueios'] >= 1
+    # O fechamento não espera os até 600s de backoff
+    assert duracao < 30
+    assert stat(log, 'response_guard/descartadas') >= 1
@@ -0,0 +1,49 @@
+"""Teste de integração do runner com vários processos (python -m lead_scraper.run)"""
+import glob
+import json
+import os
+import subprocess
+import sys
+
+import openpyxl
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import PROJETO
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_shards_run_in_separate_processes_and_merge(tmp_path):
+    """Verifica que cada shard roda em um processo e que a saída mesclada não tem leads repetidos"""
+    with MockBingServer() as servidor:
+        resultado = subprocess.run(
+            [sys.executable, '-m', 'lead_scraper.run', '--termos', 'academias,padarias',
+             '--cidades', 'Canoas,Esteio,Gravataí', '--bairros', 'Centro,Niterói,centro', '--processos', '2',
+             '--pasta', str(tmp_path), '-s', f'BING_MAPS_URL={servidor.url}', '-s', 'BING_PARSE_ENGINE=regex',
+             '-s', 'BING_MAX_PAGES=1', '-s', 'LOG_LEVEL=INFO'],
+            cwd=PROJETO, capture_output=True, text=True, timeout=120,
+        )
+    assert resultado.returncode == 0, resultado.stderr[-3000:]
+
+    # 2 termos x 3 cidades x 2 bairros distintos
+    assert servidor.contadores['requisicoes'] == 12
+    resumo_path, = glob.glob(str(tmp_path / 'shards_*' / 'resumo.json'))
+    with open(resumo_path, encoding='utf-8') as f:
+        resumo = json.load(f)
+    shards = resumo['shards']
+    assert len(shards) == 2 and len({shard['pid'] for shard in shards}) == 2
+    assert sum(shard['consultas'] for shard in shards) == 12
+    assert all(shard['motivo'] == 'finished' and shard['itens_por_segundo'] > 0 for shard in shards)
+    assert 'Shard 0:' in resultado.stderr and 'Shard 1:' in resultado.stderr
+
+    # O servidor devolve as mesmas listagens para toda consulta: por chave (nome, endereço, cidade),
+    # sobra um lead por listagem e cidade
+    arquivo, = resumo['arquivos']
+    planilha = openpyxl.load_workbook(arquivo).active
+    linhas = list(planilha.iter_rows(min_row=2, values_only=True))
+    listagens = resumo['itens'] // 12
+    assert len(linhas) == resumo['linhas'] == listagens * 3
+    assert resumo['duplicados'] == resumo['itens'] - len(linhas)
+    assert {linha[2] for linha in linhas} == {'Canoas', 'Esteio', 'Gravataí'}
+    assert os.path.dirname(arquivo) == str(tmp_path)
@@ -0,0 +1,84 @@
+"""Teste de integração da frontier compartilhada com vários workers na mesma máquina"""
+import collections
+import json
+import subprocess
+import sys
+
+import pytest
+
+from lead_scraper.frontier import SQLiteFrontier
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import PROJETO, comando_crawl, stat
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_workers_share_plan_and_recover_dead_worker_leases(tmp_path):
+    """Verifica que cada consulta é buscada uma vez entre os workers, inclusive as de um worker que morreu"""
+    caminho = str(tmp_path / 'frontier.sqlite')
+    enfileirar = subprocess.run(
+        [sys.executable, '-m', 'lead_scraper.frontier', '--termos', 'academias,padarias',
+         '--cidades', 'Canoas,Esteio,Gravataí', '--bairros', 'Centro,Niterói,Fátima,Igara,Harmonia',
+         '-s', f'FRONTIER_PATH={caminho}'],
+        cwd=PROJETO, capture_output=True, text=True, timeout=60,
+    )
+    assert enfileirar.returncode == 0, enfileirar.stderr[-3000:]
+    assert '30 consultas novas enfileiradas' in enfileirar.stdout
+
+    # Um worker arrenda um lote e morre sem confirmar
+    frontier = SQLiteFrontier(caminho)
+    abandonadas = frontier.arrendar('worker-morto', 4, 1.0)
+
+    with MockBingServer(latencia=0.02) as servidor:
+        workers = []
+        for i in range(3):
+            comando = comando_crawl(servidor.url, [], {
+                'FRONTIER_ENABLED': True, 'FRONTIER_PATH': caminho, 'FRONTIER_BATCH_SIZE': 4,
+                'FRONTIER_VISIBILITY_TIMEOUT': 5,
+                'ITEM_PIPELINES': {'lead_scraper.pipelines.StreamExportPipeline': 330},
+                'STREAM_EXPORT_URI': str(tmp_path / f'worker_{i}.ndjson'),
+            })
+            workers.append(subprocess.Popen(comando, cwd=PROJETO, stderr=subprocess.PIPE, text=True))
+        logs = [worker.communicate(timeout=90)[1] for worker in workers]
+    assert all(worker.returncode == 0 for worker in workers), logs[0][-3000:]
+
+    assert frontier.resumo() == {'pendente': 0, 'arrendada': 0, 'concluida': 30, 'falhou': 0}
+    assert servidor.contadores['requisicoes'] == 30
+    assert sum(stat(log, 'frontier/confirmadas') or 0 for log in logs) == 30
+    assert sum(1 for log in logs if stat(log, 'frontier/confirmadas')) >= 2
+
+    consultas = collections.Counter()
+    for i in range(3):
+        with open(tmp_path / f'worker_{i}.ndjson', encoding='utf-8') as f:
+            for linha in f:
+                item = json.loads(linha)
+                consultas[(item['termo_busca'], item['cidade'], item['bairro'])] += 1
+    assert len(consultas) == 30 and len(set(consultas.values())) == 1
+    for _, (termo, _, cidade, bairro) in abandonadas:
+        assert (termo, cidade, bairro) in consultas
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_blocked_queries_are_fetched_again_when_re_leased(tmp_path):
+    """Verifica que uma consulta devolvida ao ficar ocioso é buscada de novo, sem cair no filtro de duplicatas"""
+    caminho = str(tmp_path / 'frontier.sqlite')
+    enfileirar = subprocess.run(
+        [sys.executable, '-m', 'lead_scraper.frontier', '--termos', 'academias', '--cidades', 'Canoas',
+         '--bairros', 'Centro,Niterói,Fátima', '-s', f'FRONTIER_PATH={caminho}'],
+        cwd=PROJETO, capture_output=True, text=True, timeout=60,
+    )
+    assert enfileirar.returncode == 0, enfileirar.stderr[-3000:]
+
+    with MockBingServer(taxa_bloqueio=1.0) as servidor:
+        resultado = subprocess.run(comando_crawl(servidor.url, [], {
+            'FRONTIER_ENABLED': True, 'FRONTIER_PATH': caminho, 'FRONTIER_BATCH_SIZE': 4,
+            'FRONTIER_MAX_ATTEMPTS': 3,
+        }), cwd=PROJETO, capture_output=True, text=True, timeout=90)
+    assert resultado.returncode == 0, resultado.stderr[-3000:]
+
+    # Cada arrendamento vira uma requisição de verdade até a consulta esgotar as tentativas
+    assert stat(resultado.stderr, 'frontier/arrendadas') == 9
+    assert servidor.contadores['requisicoes'] == 9
+    assert stat(resultado.stderr, 'dupefilter/filtered') is None
+    assert SQLiteFrontier(caminho).resumo() == {'pendente': 0, 'arrendada': 0, 'concluida': 0, 'falhou': 3}
@@ -0,0 +1,59 @@
+"""Testes de integração da StageMetrics contra o servidor local que imita o Bing"""
+import json
+import re
+import socket
+import subprocess
+import time
+import urllib.request
+
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import PROJETO, comando_crawl, stat
+
+
+def _porta_livre():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+@pytest.mark.slow
+@pytest.mark.integration
+def test_live_endpoint_and_snapshots(tmp_path):
+    """Verifica o endpoint do Prometheus durante o crawl, os snapshots periódicos e os quantis nas stats"""
+    porta = _porta_livre()
+    arquivo = tmp_path / 'metricas.ndjson'
+    with MockBingServer(latencia=0.1, listagens=20) as servidor:
+        processo = subprocess.Popen(comando_crawl(servidor.url, [f'Bairro {i}' for i in range(40)], {
+            'METRICS_ENABLED': True,
+            'METRICS_HTTP_PORT': porta,
+            'METRICS_SAMPLE_INTERVAL': 0.2,
+            'METRICS_SNAPSHOT_INTERVAL': 0.5,
+            'METRICS_SNAPSHOT_FILE': str(arquivo),
+            'ITEM_PIPELINES': {'lead_scraper.pipelines.StreamExportPipeline': 330},
+            'STREAM_EXPORT_URI': str(tmp_path / 'leads.ndjson'),
+            'CONCURRENT_REQUESTS': 2,
+        }), cwd=PROJETO, stderr=subprocess.PIPE, text=True)
+        texto = None
+        while processo.poll() is None and texto is None:
+            time.sleep(0.2)
+            try:
+                texto = urllib.request.urlopen(f'http://127.0.0.1:{porta}/metrics', timeout=5).read().decode()
+            except OSError:
+                continue
+        log = processo.communicate(timeout=120)[1]
+
+    assert processo.returncode == 0, log[-3000:]
+    assert texto is not None, 'endpoint não respondeu durante o crawl'
+    assert '# TYPE lead_scraper_download_segundos histogram' in texto
+    assert 'lead_scraper_pipeline_segundos_count{pipeline="StreamExportPipeline"}' in texto
+    assert re.search(r'lead_scraper_fila_atual\{fila="downloader"\} \d+', texto)
+
+    with open(arquivo, encoding='utf-8') as f:
+        snapshots = [json.loads(linha) for linha in f]
+    assert len(snapshots) >= 2
+    assert snapshots[-1]['respostas'] == 40
+    assert sum(s['etapas']['parse']['total'] for s in snapshots) == 40
+    assert stat(log, 'metricas/download/p50') >= 0.1
+    assert stat(log, 'metricas/pipeline/StreamExportPipeline/p99') is not None
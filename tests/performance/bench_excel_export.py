@@ -0,0 +1,62 @@
+"""
+Compara o ExcelExportPipeline em modo memória (openpyxl) e em modo streaming.
+
+Cada combinação (modo, linhas) roda em um processo novo para que o pico de
+RSS medido seja apenas daquela execução.
+
+Uso (a partir da raiz do repositório):
+    python -m tests.performance.bench_excel_export --linhas 10000 100000 1000000
+"""
+import argparse
+import multiprocessing
+import tempfile
+import time
+from unittest.mock import Mock
+
+from tests.performance.helpers import gerar_itens, pico_rss_mb
+
+MODOS = ('memoria', 'streaming')
+
+
+def medir(modo, linhas):
+    from lead_scraper.pipelines import ExcelExportPipeline
+
+    with tempfile.TemporaryDirectory() as pasta:
+        pipeline = ExcelExportPipeline(streaming=(modo == 'streaming'), results_folder=pasta)
+        spider = Mock()
+        rss_inicial = pico_rss_mb()
+        inicio = time.perf_counter()
+        pipeline.open_spider(spider)
+        for item in gerar_itens(linhas):
+            pipeline.process_item(item, spider)
+        pipeline.close_spider(spider)
+        duracao = time.perf_counter() - inicio
+
+    return {
+        'modo': modo,
+        'linhas': linhas,
+        'segundos': round(duracao, 2),
+        'linhas_por_segundo': round(linhas / duracao),
+        'pico_rss_mb': round(pico_rss_mb(), 1),
+        'rss_inicial_mb': round(rss_inicial, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--linhas', type=int, nargs='+', default=[10000, 100000, 1000000])
+    parser.add_argument('--modos', nargs='+', choices=MODOS, default=list(MODOS))
+    args = parser.parse_args()
+
+    contexto = multiprocessing.get_context('spawn')
+    print(f"{'modo':<10} {'linhas':>9} {'seg':>8} {'linhas/s':>10} {'pico RSS (MB)':>14}")
+    for linhas in args.linhas:
+        for modo in args.modos:
+            with contexto.Pool(1) as pool:
+                r = pool.apply(medir, (modo, linhas))
+            print(f"{r['modo']:<10} {r['linhas']:>9} {r['segundos']:>8} "
+                  f"{r['linhas_por_segundo']:>10} {r['pico_rss_mb']:>14}")
+
+
+if __name__ == '__main__':
+    main()
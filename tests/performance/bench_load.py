@@ -0,0 +1,164 @@
+"""
+Teste de carga offline: executa o BingMapsSpider, com as pipelines reais do
+projeto, contra o servidor local que imita o Bing (páginas sintéticas a partir
+da fixture, com latência e taxas de erro configuráveis) e mede requisições/s,
+itens/s, latência p50/p99 e pico de RSS.
+
+Cada cenário (listagens por página) roda em um processo novo: o reactor do
+Twisted não reinicia e o pico de RSS medido é só daquele crawl. O servidor
+fica no processo principal, fora da medição. O resultado vai para um JSON
+(data/benchmarks/carga_<timestamp>.json) com o commit e os parâmetros, para
+comparar versões.
+
+Uso (a partir da raiz do repositório):
+    python -m tests.performance.bench_load --consultas 200 --listagens 18 50 --latencia 0.05 --taxa-erro 0.02
+"""
+import argparse
+import datetime
+import json
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import time
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.performance.helpers import pico_rss_mb
+
+RAIZ = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..'))
+
+
+def percentil(valores, p):
+    """Percentil p (0-100) pelo método do posto mais próximo; None sem valores"""
+    if not valores:
+        return None
+    ordenados = sorted(valores)
+    posto = max(1, -(-len(ordenados) * p // 100))
+    return ordenados[int(posto) - 1]
+
+
+def _versao():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=RAIZ, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def medir(url, consultas, settings_extras=None):
+    """
+    Executa um crawl de `consultas` consultas (bairros de Canoas) contra url,
+    no processo atual, e retorna as métricas. O processo não pode ter rodado
+    outro crawl antes.
+    """
+    from scrapy import signals
+    from scrapy.crawler import CrawlerProcess
+    from scrapy.utils.project import get_project_settings
+
+    os.environ.setdefault('SCRAPY_SETTINGS_MODULE', 'lead_scraper.settings')
+    latencias = []
+    tempos = {}
+
+    with tempfile.TemporaryDirectory() as pasta:
+        settings = get_project_settings()
+        settings.setdict({
+            'LOG_LEVEL': 'WARNING',
+            'EXCEL_EXPORT_DIR': pasta,
+            'CHECKPOINT_ENABLED': False,
+        }, priority='project')
+        settings.setdict(settings_extras or {}, priority='cmdline')
+        # Uma página por consulta: requisições = consultas + retentativas
+        settings.setdict({'BING_MAPS_URL': url, 'BING_MAX_PAGES': 1}, priority='cmdline')
+
+        processo = CrawlerProcess(settings, install_root_handler=False)
+        crawler = processo.create_crawler('bing_maps')
+        crawler.signals.connect(lambda response, request, spider: latencias.append(request.meta['download_latency'])
+                                if 'download_latency' in request.meta else None,
+                                signal=signals.response_received, weak=False)
+        crawler.signals.connect(lambda spider: tempos.setdefault('inicio', time.perf_counter()),
+                                signal=signals.spider_opened, weak=False)
+        crawler.signals.connect(lambda spider, reason: tempos.setdefault('fim', time.perf_counter()),
+                                signal=signals.spider_closed, weak=False)
+        processo.crawl(crawler, termo='academias', cidade='Canoas',
+                       bairros=','.join(f'Bairro {i}' for i in range(consultas)))
+        processo.start()
+
+    stats = crawler.stats.get_stats()
+    segundos = tempos['fim'] - tempos['inicio']
+    requisicoes = stats.get('downloader/request_count', 0)
+    itens = stats.get('item_scraped_count', 0)
+    return {
+        'consultas': consultas,
+        'requisicoes': requisicoes,
+        'respostas': stats.get('downloader/response_count', 0),
+        'erros': sum(v for k, v in stats.items() if k.startswith('downloader/response_status_count/5')),
+        'itens': itens,
+        'segundos': round(segundos, 3),
+        'requisicoes_por_segundo': round(requisicoes / segundos, 2),
+        'itens_por_segundo': round(itens / segundos, 2),
+        'latencia_p50_ms': round(percentil(latencias, 50) * 1000, 1) if latencias else None,
+        'latencia_p99_ms': round(percentil(latencias, 99) * 1000, 1) if latencias else None,
+        'pico_rss_mb': round(pico_rss_mb(), 1),
+        'motivo': stats.get('finish_reason'),
+        # Com a extensão MemoryMonitor ligada (ver soak_memory.py)
+        'memoria': {chave[len('memoria/'):]: valor for chave, valor in stats.items() if chave.startswith('memoria/')},
+    }
+
+
+def cenario(listagens, consultas, latencia=0.0, taxa_erro=0.0, taxa_bloqueio=0.0, settings_extras=None):
+    """Sobe o servidor com `listagens` resultados por página e mede um crawl em um processo novo"""
+    contexto = multiprocessing.get_context('spawn')
+    with MockBingServer(latencia=latencia, taxa_erro=taxa_erro, taxa_bloqueio=taxa_bloqueio,
+                        listagens=listagens) as servidor:
+        # maxtasksperchild=1: o filho sai ao terminar; o CrawlerProcess deixa
+        # instalado um handler de SIGTERM que travaria o terminate() do Pool
+        with contexto.Pool(1, maxtasksperchild=1) as pool:
+            resultado = pool.apply(medir, (servidor.url, consultas, settings_extras))
+        resultado['servidor'] = dict(servidor.contadores)
+    return dict({'listagens': listagens}, **resultado)
+
+
+def _setting(valor):
+    nome, _, conteudo = valor.partition('=')
+    return nome, conteudo
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--consultas', type=int, default=200)
+    parser.add_argument('--listagens', type=int, nargs='+', default=[18, 50])
+    parser.add_argument('--latencia', type=float, default=0.05)
+    parser.add_argument('--taxa-erro', type=float, default=0.0)
+    parser.add_argument('--taxa-bloqueio', type=float, default=0.0)
+    parser.add_argument('--saida', default=None, help='Arquivo JSON (padrão: data/benchmarks/carga_<timestamp>.json)')
+    parser.add_argument('-s', '--set', dest='settings', action='append', type=_setting, default=[],
+                        metavar='NOME=VALOR', help='Setting do Scrapy (ex.: CONCURRENT_REQUESTS=32)')
+    args = parser.parse_args()
+
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    saida = args.saida or os.path.join(RAIZ, 'data', 'benchmarks', f'carga_{timestamp}.json')
+    parametros = {
+        'consultas': args.consultas, 'latencia': args.latencia, 'taxa_erro': args.taxa_erro,
+        'taxa_bloqueio': args.taxa_bloqueio, 'settings': dict(args.settings),
+    }
+
+    print(f"{'listagens':>9} {'req':>6} {'itens':>7} {'seg':>7} {'req/s':>8} {'itens/s':>9} "
+          f"{'p50 (ms)':>9} {'p99 (ms)':>9} {'pico RSS (MB)':>14}")
+    resultados = []
+    for listagens in args.listagens:
+        r = cenario(listagens, args.consultas, args.latencia, args.taxa_erro, args.taxa_bloqueio,
+                    dict(args.settings))
+        resultados.append(r)
+        print(f"{r['listagens']:>9} {r['requisicoes']:>6} {r['itens']:>7} {r['segundos']:>7} "
+              f"{r['requisicoes_por_segundo']:>8} {r['itens_por_segundo']:>9} {r['latencia_p50_ms']:>9} "
+              f"{r['latencia_p99_ms']:>9} {r['pico_rss_mb']:>14}")
+
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump({'versao': _versao(), 'data': datetime.datetime.now().isoformat(timespec='seconds'),
+                   'parametros': parametros, 'resultados': resultados}, f, ensure_ascii=False, indent=2)
+    print(f'Resultados em {saida}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+"""
+Compara N termos em uma única execução (`-a termos=...`) com N execuções de
+`scrapy crawl`, uma por termo, contra o servidor local que imita o Bing.
+
+Cada execução do Scrapy paga a partida do interpretador, do Twisted e do
+Scrapy e começa com conexões novas; em lote, isso acontece uma vez só.
+
+Uso (a partir da raiz do repositório):
+    python -m tests.performance.bench_multi_term --termos 10 50 --bairros 5 --latencia 0.05
+"""
+import argparse
+import subprocess
+import time
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.integration.helpers import PROJETO, comando_crawl
+from tests.performance.helpers import TERMOS
+
+ABORDAGENS = ('sequencial', 'lote')
+
+
+def gerar_termos(n):
+    return [f'{TERMOS[i % len(TERMOS)]} {i}' for i in range(n)]
+
+
+def medir(abordagem, url, termos, bairros, settings=None):
+    """Executa os termos em uma execução por termo ('sequencial') ou em uma só ('lote') e mede o tempo total"""
+    settings = dict({'LOG_LEVEL': 'WARNING'}, **(settings or {}))
+    if abordagem == 'sequencial':
+        comandos = [comando_crawl(url, bairros, settings, termo=termo) for termo in termos]
+    else:
+        comandos = [comando_crawl(url, bairros, settings, termo='', argumentos={'termos': ','.join(termos)})]
+
+    inicio = time.perf_counter()
+    for comando in comandos:
+        subprocess.run(comando, cwd=PROJETO, check=True, capture_output=True, timeout=600)
+    duracao = time.perf_counter() - inicio
+
+    consultas = len(termos) * len(bairros)
+    return {
+        'abordagem': abordagem,
+        'termos': len(termos),
+        'consultas': consultas,
+        'execucoes': len(comandos),
+        'segundos': round(duracao, 2),
+        'consultas_por_segundo': round(consultas / duracao, 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--termos', type=int, nargs='+', default=[10, 50])
+    parser.add_argument('--bairros', type=int, default=5)
+    parser.add_argument('--latencia', type=float, default=0.05)
+    args = parser.parse_args()
+
+    bairros = [f'Bairro {i}' for i in range(args.bairros)]
+    print(f"{'abordagem':<11} {'termos':>7} {'consultas':>10} {'execuções':>10} {'seg':>8} {'consultas/s':>12}")
+    with MockBingServer(latencia=args.latencia) as servidor:
+        for quantidade in args.termos:
+            for abordagem in ABORDAGENS:
+                r = medir(abordagem, servidor.url, gerar_termos(quantidade), bairros)
+                print(f"{r['abordagem']:<11} {r['termos']:>7} {r['consultas']:>10} {r['execucoes']:>10} "
+                      f"{r['segundos']:>8} {r['consultas_por_segundo']:>12}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+"""Utilitários compartilhados pelos benchmarks de performance"""
+import os
+import resource
+import sys
+
+# Permite executar os scripts de benchmark com `python -m tests.performance.<modulo>`
+# a partir da raiz do repositório (o pytest já configura o pythonpath)
+_PROJETO = os.path.abspath(os.path.join(os.path.dirname(__file__), '..', '..', 'lead_scraper'))
+if _PROJETO not in sys.path:
+    sys.path.insert(0, _PROJETO)
+
+from lead_scraper.items import LeadScraperItem  # noqa: E402
+
+ESTADOS = ['RS', 'SP', 'RJ', 'MG', 'BA', 'PR', 'SC', 'PE']
+CIDADES = ['Porto Alegre', 'São Paulo', 'Rio de Janeiro', 'Belo Horizonte',
+           'Salvador', 'Curitiba', 'Florianópolis', 'Recife']
+TERMOS = ['academias', 'restaurantes', 'cafés', 'padarias', 'farmácias']
+
+
+def gerar_item(i):
+    """Gera um LeadScraperItem sintético e determinístico com valores únicos por índice"""
+    item = LeadScraperItem()
+    item['termo_busca'] = TERMOS[i % len(TERMOS)]
+    item['estado'] = ESTADOS[i % len(ESTADOS)]
+    item['cidade'] = CIDADES[i % len(CIDADES)]
+    item['bairro'] = f'Bairro {i % 97}'
+    item['nome'] = f'Empresa Exemplo Nº {i}'
+    item['endereco'] = f'Rua da Conceição, {i} - Centro, {CIDADES[i % len(CIDADES)]}'
+    item['telefone'] = f'(51) 9{i % 10000:04d}-{i % 9973:04d}'
+    item['website'] = f'https://empresa{i}.com.br'
+    return item
+
+
+def gerar_itens(n):
+    for i in range(n):
+        yield gerar_item(i)
+
+
+def pico_rss_mb():
+    """Pico de memória residente (RSS) do processo atual em MB"""
+    pico = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reporta em KB, macOS em bytes
+    if sys.platform == 'darwin':
+        return pico / (1024 * 1024)
+    return pico / 1024
+
+
+def gerar_pagina_bing(n):
+    """Página sintética do Bing Maps com n listagens no formato da fixture (data-entity com HTML escapado)"""
+    import html
+    import json
+
+    listagens = []
+    for i in range(n):
+        item = gerar_item(i)
+        entity = {
+            'geometryType': 1,
+            'geometry': {'x': -51.15 - i / 1e4, 'y': -30.04, 'bounds': [-30.04, -51.15, -30.04, -51.15]},
+            'entity': {
+                'title': item['nome'], 'id': f'ypid:YN7993x{i}', 'address': item['endereco'],
+                'primaryCategoryName': 'Academia', 'entryName': 'Business',
+                'phone': item['telefone'], 'website': item['website'],
+                'infoboxHtml': f'<a class="infoBoxLink" role="button"><div class="bm_ib_title">'
+                               f'<span class="cnm">{item["nome"]}</span></div></a>' * 8,
+            },
+        }
+        payload = html.escape(json.dumps(entity, ensure_ascii=False), quote=True)
+        listagens.append(
+            f'<li><div class="b_card"><a class="listings-item" data-entity="{payload}">'
+            f'<div class="b_factrow">{html.escape(item["nome"])}</div></a></div></li>'
+        )
+    estilo = '.listings-item{width:100%}' * 200
+    return (
+        f'<html><head><style>{estilo}</style></head><body><ul class="b_vList">'
+        f'{"".join(listagens)}</ul></body></html>'
+    )
@@ -0,0 +1,80 @@
+"""
+Soak test de memória: executa o BingMapsSpider contra o servidor local que
+imita o Bing por alguns minutos, com a extensão MemoryMonitor, e falha
+(código de saída 1) se o RSS crescer mais rápido que o limite (MB por
+minuto) depois do aquecimento. O spider é fechado assim que a inclinação
+passa do limite (motivo memory_growth_exceeded).
+
+Os registros de memória (RSS, objetos vivos, scheduler e os locais de
+alocação que mais cresceram) ficam em data/memory/soak_<timestamp>.ndjson.
+A exportação Excel roda em streaming: em memória, a planilha cresce com os
+itens por natureza.
+
+Uso (a partir da raiz do repositório):
+    python -m tests.performance.soak_memory --minutos 10 --limite 2
+    python -m tests.performance.soak_memory --minutos 5 -s EXCEL_EXPORT_STREAMING=False
+"""
+import argparse
+import datetime
+import os
+import sys
+
+from tests.performance.bench_load import RAIZ, _setting, cenario
+
+# Teto de consultas, só para o crawl não terminar antes do tempo
+CONSULTAS_POR_SEGUNDO = 200
+
+
+def soak(minutos, limite, listagens=18, latencia=0.02, intervalo=10.0, aquecimento=60.0, arquivo=None,
+         settings_extras=None):
+    """
+    Executa o soak em um processo novo e retorna o resultado do cenário com
+    `passou` (RSS crescendo até `limite` MB/min depois do aquecimento).
+    """
+    timestamp = datetime.datetime.now().strftime("%Y%m%d_%H%M%S")
+    arquivo = arquivo or os.path.join(RAIZ, 'data', 'memory', f'soak_{timestamp}.ndjson')
+    settings = {
+        'EXCEL_EXPORT_STREAMING': True,
+        'CLOSESPIDER_TIMEOUT': minutos * 60,
+        'MEMORY_MONITOR_ENABLED': True,
+        'MEMORY_MONITOR_INTERVAL': intervalo,
+        'MEMORY_MONITOR_WARMUP': aquecimento,
+        'MEMORY_MONITOR_MAX_GROWTH': limite,
+        'MEMORY_MONITOR_FILE': arquivo,
+    }
+    settings.update(settings_extras or {})
+    consultas = int(minutos * 60 * CONSULTAS_POR_SEGUNDO) + 100
+    resultado = cenario(listagens, consultas, latencia=latencia, settings_extras=settings)
+    crescimento = resultado['memoria'].get('crescimento_mb_por_minuto')
+    resultado['arquivo'] = arquivo
+    resultado['passou'] = resultado['motivo'] != 'memory_growth_exceeded' and (
+        crescimento is None or crescimento <= limite)
+    return resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--minutos', type=float, default=10.0)
+    parser.add_argument('--limite', type=float, default=2.0, help='Crescimento máximo do RSS em MB por minuto')
+    parser.add_argument('--listagens', type=int, default=18)
+    parser.add_argument('--latencia', type=float, default=0.02)
+    parser.add_argument('--intervalo', type=float, default=10.0, help='Segundos entre registros de memória')
+    parser.add_argument('--aquecimento', type=float, default=60.0, help='Segundos fora da inclinação')
+    parser.add_argument('--saida', default=None, help='Arquivo NDJSON (padrão: data/memory/soak_<timestamp>.ndjson)')
+    parser.add_argument('-s', '--set', dest='settings', action='append', type=_setting, default=[],
+                        metavar='NOME=VALOR', help='Setting do Scrapy (ex.: CONCURRENT_REQUESTS=32)')
+    args = parser.parse_args()
+
+    r = soak(args.minutos, args.limite, args.listagens, args.latencia, args.intervalo, args.aquecimento,
+             args.saida, dict(args.settings))
+    memoria = r['memoria']
+    print(f"{r['requisicoes']} requisições, {r['itens']} itens em {r['segundos']} s ({r['motivo']})")
+    print(f"RSS final {memoria.get('rss_mb_final')} MB, máximo {memoria.get('rss_mb_max')} MB, "
+          f"crescimento {memoria.get('crescimento_mb_por_minuto')} MB/min (limite {args.limite})")
+    print(f"Registros em {r['arquivo']}")
+    print('OK' if r['passou'] else 'FALHOU: memória crescendo acima do limite')
+    sys.exit(0 if r['passou'] else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,46 @@
+"""Custo da retomada com um journal grande (executar com `pytest tests/performance/ --benchmark-only`)"""
+import pytest
+
+from lead_scraper.utils.checkpoint import CheckpointJournal
+
+pytest.importorskip('pytest_benchmark')
+
+CONCLUIDAS = 1_000_000
+
+
+@pytest.fixture(scope='module')
+def caminho_journal(tmp_path_factory):
+    caminho = str(tmp_path_factory.mktemp('checkpoint') / 'checkpoint.sqlite')
+    journal = CheckpointJournal(caminho)
+    journal.iniciar_execucao()
+    journal.marcar((f'academias em bairro {i}, cidade {i % 5570}, rs' for i in range(CONCLUIDAS)), 0)
+    journal.close()
+    return caminho
+
+
+@pytest.mark.slow
+def test_abrir_e_retomar(benchmark, caminho_journal):
+    """Mede a abertura do journal e a retomada da execução com um milhão de consultas concluídas"""
+    def retomar():
+        journal = CheckpointJournal(caminho_journal)
+        execucao = journal.iniciar_execucao()
+        journal.close()
+        return execucao
+
+    _, retomada = benchmark(retomar)
+    assert retomada is True
+    assert benchmark.stats.stats.mean < 0.05
+
+
+@pytest.mark.slow
+def test_verificar_consultas(benchmark, caminho_journal):
+    """Mede a verificação de 1000 consultas de start_requests (metade concluídas)"""
+    journal = CheckpointJournal(caminho_journal)
+    chaves = [f'academias em bairro {i * 1999}, cidade {(i * 1999) % 5570}, rs' for i in range(500)]
+    chaves += [f'padarias em bairro {i}, cidade {i}, rs' for i in range(500)]
+
+    concluidas = benchmark(lambda: sum(journal.concluida(chave) for chave in chaves))
+    assert concluidas == 500
+    # Abaixo de 10 µs por consulta
+    assert benchmark.stats.stats.mean < 0.01
+    journal.close()
@@ -0,0 +1,34 @@
+"""Abertura e vazão do Bloom filter do LeadDedupPipeline (executar com `pytest tests/performance/ --benchmark-only`)"""
+import pytest
+
+from lead_scraper.utils.bloom import BloomFilter
+
+pytest.importorskip('pytest_benchmark')
+
+CHAVES = 100000
+
+
+@pytest.mark.slow
+def test_abertura_filtro_grande(benchmark, tmp_path):
+    """Mede a reabertura de um filtro dimensionado para 50 milhões de chaves"""
+    caminho = str(tmp_path / 'leads.bloom')
+    BloomFilter(caminho, capacidade=50_000_000, taxa_fp=0.001).close()
+
+    benchmark(lambda: BloomFilter(caminho).close())
+    assert benchmark.stats.stats.mean < 0.05
+
+
+@pytest.mark.slow
+def test_add_por_segundo(benchmark, tmp_path):
+    """Mede a inserção de CHAVES chaves em um filtro vazio"""
+    rodada = iter(range(1000))
+    chaves = [f'academia {i}|rua exemplo {i}|porto alegre' for i in range(CHAVES)]
+
+    def inserir():
+        filtro = BloomFilter(str(tmp_path / f'leads_{next(rodada)}.bloom'), capacidade=1_000_000, taxa_fp=0.001)
+        for chave in chaves:
+            filtro.add(chave)
+        filtro.close()
+
+    benchmark.pedantic(inserir, rounds=3, iterations=1)
+    benchmark.extra_info['chaves_por_segundo'] = round(CHAVES / benchmark.stats.stats.mean)
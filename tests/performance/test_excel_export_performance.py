@@ -0,0 +1,31 @@
+"""Benchmarks do ExcelExportPipeline (executar com `pytest tests/performance/ --benchmark-only`)"""
+import pytest
+from unittest.mock import Mock
+
+from lead_scraper.pipelines import ExcelExportPipeline
+from tests.performance.helpers import gerar_item
+
+pytest.importorskip('pytest_benchmark')
+
+LINHAS = 5000
+
+
+@pytest.fixture(scope='module')
+def itens():
+    return [gerar_item(i) for i in range(LINHAS)]
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('streaming', [False, True], ids=['memoria', 'streaming'])
+def test_exportacao_excel(benchmark, itens, tmp_path, streaming):
+    """Mede o tempo total de open_spider + process_item + close_spider"""
+    spider = Mock()
+
+    def exportar():
+        pipeline = ExcelExportPipeline(streaming=streaming, results_folder=str(tmp_path))
+        pipeline.open_spider(spider)
+        for item in itens:
+            pipeline.process_item(item, spider)
+        pipeline.close_spider(spider)
+
+    benchmark.pedantic(exportar, rounds=3, iterations=1)
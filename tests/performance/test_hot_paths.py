@@ -0,0 +1,100 @@
+"""
+Micro-benchmarks dos caminhos quentes, cada um isolado e por tamanho de
+entrada: montagem do LeadScraperItem, ExcelExportPipeline.process_item e o
+salvamento em close_spider (o parse fica em test_parse_performance.py, grupo
+"parse").
+
+Comparação com uma baseline salva na máquina (ver `make bench-baseline` e
+`make bench-compare TOLERANCIA=10%`).
+"""
+import pytest
+from unittest.mock import Mock
+
+from lead_scraper.items import LeadScraperItem
+from lead_scraper.pipelines import ExcelExportPipeline
+from tests.performance.helpers import gerar_item
+
+pytest.importorskip('pytest_benchmark')
+
+TAMANHOS = [1000, 10000]
+MODOS = {'memoria': False, 'streaming': True}
+
+
+def _entidade(i):
+    item = gerar_item(i)
+    return {'title': item['nome'], 'address': item['endereco'], 'phone': item['telefone'], 'website': item['website']}
+
+
+@pytest.fixture(scope='module')
+def itens():
+    return [gerar_item(i) for i in range(max(TAMANHOS))]
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark(group='item')
+@pytest.mark.parametrize('quantidade', TAMANHOS)
+def test_montagem_item(benchmark, quantidade):
+    """Mede a montagem de N LeadScraperItem a partir das entidades, campo a campo como no parse"""
+    entidades = [_entidade(i) for i in range(quantidade)]
+
+    def montar():
+        itens = []
+        for entity in entidades:
+            item = LeadScraperItem()
+            item['termo_busca'] = 'academias'
+            item['estado'] = 'RS'
+            item['cidade'] = 'Canoas'
+            item['bairro'] = 'Não especificado'
+            item['nome'] = entity.get('title', 'Sem título')
+            item['endereco'] = entity.get('address', 'Sem endereço')
+            item['telefone'] = entity.get('phone', 'Telefone não disponível')
+            item['website'] = entity.get('website', 'Website não disponível')
+            itens.append(item)
+        return itens
+
+    assert len(benchmark(montar)) == quantidade
+    benchmark.extra_info['itens_por_segundo'] = round(quantidade / benchmark.stats.stats.mean)
+
+
+def _pipeline_aberta(streaming, pasta):
+    pipeline = ExcelExportPipeline(streaming=streaming, results_folder=pasta)
+    pipeline.open_spider(Mock())
+    return pipeline
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark(group='process_item')
+@pytest.mark.parametrize('quantidade', TAMANHOS)
+@pytest.mark.parametrize('modo', list(MODOS))
+def test_process_item(benchmark, itens, tmp_path, modo, quantidade):
+    """Mede só os process_item de N itens (a abertura da pipeline fica fora da medição)"""
+    spider = Mock()
+
+    def preparar():
+        return (_pipeline_aberta(MODOS[modo], str(tmp_path)),), {}
+
+    def processar(pipeline):
+        for item in itens[:quantidade]:
+            pipeline.process_item(item, spider)
+        return pipeline
+
+    benchmark.pedantic(processar, setup=preparar, rounds=5, iterations=1)
+    benchmark.extra_info['itens_por_segundo'] = round(quantidade / benchmark.stats.stats.mean)
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark(group='close_spider')
+@pytest.mark.parametrize('quantidade', TAMANHOS)
+@pytest.mark.parametrize('modo', list(MODOS))
+def test_close_spider(benchmark, itens, tmp_path, modo, quantidade):
+    """Mede só o close_spider (salvamento da planilha) depois de N itens"""
+    spider = Mock()
+
+    def preparar():
+        pipeline = _pipeline_aberta(MODOS[modo], str(tmp_path))
+        for item in itens[:quantidade]:
+            pipeline.process_item(item, spider)
+        return (pipeline,), {}
+
+    benchmark.pedantic(lambda pipeline: pipeline.close_spider(spider), setup=preparar, rounds=5, iterations=1)
+    assert list(tmp_path.glob('leads_*.xlsx'))
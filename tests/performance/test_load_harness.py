@@ -0,0 +1,40 @@
+"""Teste de carga offline contra o servidor local (ver bench_load.py)"""
+import json
+
+import pytest
+
+from lead_scraper.utils.extracao import extrair_data_entities
+from tests.fixtures.mock_bing_server import pagina_sintetica
+from tests.performance.bench_load import cenario, percentil
+
+
+def test_synthetic_page_has_unique_listings():
+    """Verifica que a página sintética traz o número pedido de listagens, com ids distintos"""
+    entidades = [json.loads(e)['entity'] for e in extrair_data_entities(pagina_sintetica(45))]
+
+    assert len(entidades) == 45
+    assert len({e['id'] for e in entidades}) == 45
+
+
+def test_percentile_nearest_rank():
+    """Verifica o percentil pelo posto mais próximo"""
+    valores = list(range(1, 101))
+
+    assert (percentil(valores, 50), percentil(valores, 99), percentil(valores, 100)) == (50, 99, 100)
+    assert percentil([0.3], 99) == 0.3
+    assert percentil([], 50) is None
+
+
+@pytest.mark.slow
+def test_load_report_with_real_pipelines():
+    """Verifica as métricas de um crawl curto com erros injetados e a exportação Excel ligada"""
+    r = cenario(30, 40, latencia=0.01, taxa_erro=0.1)
+
+    print(f"\n{r['requisicoes_por_segundo']} req/s, {r['itens_por_segundo']} itens/s, "
+          f"p50 {r['latencia_p50_ms']} ms, p99 {r['latencia_p99_ms']} ms, {r['pico_rss_mb']} MB")
+    assert r['motivo'] == 'finished'
+    assert r['requisicoes'] == r['servidor']['requisicoes'] == 40 + r['servidor']['erros']
+    assert r['erros'] == r['servidor']['erros'] > 0
+    assert r['itens'] == 40 * 30
+    assert 10 <= r['latencia_p50_ms'] <= r['latencia_p99_ms']
+    assert r['pico_rss_mb'] > 0
@@ -0,0 +1,30 @@
+"""Consultas e carga do índice de municípios (executar com `pytest tests/performance/ --benchmark-only`)"""
+import pytest
+
+from lead_scraper.utils.localidades_api import IndiceMunicipios
+
+pytest.importorskip('pytest_benchmark')
+
+# Aproximadamente a quantidade de municípios do Brasil
+MUNICIPIOS = [(1000000 + i, f'São Município {i}', ['RS', 'SP', 'MG', 'BA', 'PR'][i % 5]) for i in range(5570)]
+
+
+@pytest.fixture(scope='module')
+def indice():
+    return IndiceMunicipios(MUNICIPIOS)
+
+
+@pytest.mark.slow
+def test_resolver_nome(benchmark, indice):
+    """Mede a validação de um argumento cidade pelo nome"""
+    municipio = benchmark(indice.resolver, 'sao municipio 4320', 'RS')
+    assert municipio.id == 1004320
+
+
+@pytest.mark.slow
+def test_carregar_snapshot(benchmark, indice, tmp_path):
+    """Mede a carga do snapshot local na inicialização"""
+    caminho = str(tmp_path / 'municipios.json.gz')
+    indice.salvar(caminho)
+    carregado = benchmark(IndiceMunicipios.carregar, caminho)
+    assert len(carregado) == len(MUNICIPIOS)
@@ -0,0 +1,20 @@
+"""Vários termos em uma execução contra uma execução por termo (ver bench_multi_term.py)"""
+import pytest
+
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.performance.bench_multi_term import gerar_termos, medir
+
+
+@pytest.mark.slow
+def test_batch_beats_one_run_per_term():
+    """Verifica que 4 termos em uma execução levam menos da metade do tempo de 4 execuções"""
+    termos = gerar_termos(4)
+    bairros = ['Centro', 'Niterói', 'Fátima']
+    with MockBingServer(latencia=0.02) as servidor:
+        sequencial = medir('sequencial', servidor.url, termos, bairros)
+        lote = medir('lote', servidor.url, termos, bairros)
+        requisicoes = servidor.contadores['requisicoes']
+
+    print(f"\nsequencial: {sequencial['segundos']}s; lote: {lote['segundos']}s")
+    assert requisicoes == 2 * len(termos) * len(bairros)
+    assert lote['segundos'] < sequencial['segundos'] / 2
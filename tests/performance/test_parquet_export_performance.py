@@ -0,0 +1,66 @@
+"""Benchmarks de escrita e leitura: Parquet x xlsx (executar com `pytest tests/performance/ --benchmark-only`)"""
+import pytest
+from unittest.mock import Mock
+
+import openpyxl
+
+from lead_scraper.pipelines import ExcelExportPipeline
+from tests.performance.helpers import gerar_item
+
+pytest.importorskip('pytest_benchmark')
+pq = pytest.importorskip('pyarrow.parquet')
+
+from lead_scraper.pipelines import ParquetExportPipeline  # noqa: E402
+
+LINHAS = 20000
+
+FORMATOS = {
+    'xlsx': lambda pasta: ExcelExportPipeline(streaming=True, results_folder=pasta),
+    'parquet': lambda pasta: ParquetExportPipeline(results_folder=pasta),
+}
+
+
+@pytest.fixture(scope='module')
+def itens():
+    return [gerar_item(i) for i in range(LINHAS)]
+
+
+def _exportar(pipeline, itens):
+    spider = Mock()
+    pipeline.open_spider(spider)
+    for item in itens:
+        pipeline.process_item(item, spider)
+    pipeline.close_spider(spider)
+    return pipeline.filepath
+
+
+def _ler_xlsx(caminho):
+    workbook = openpyxl.load_workbook(caminho, read_only=True)
+    linhas = sum(1 for _ in workbook.active.iter_rows(min_row=2, values_only=True))
+    workbook.close()
+    return linhas
+
+
+def _ler_parquet(caminho):
+    return pq.read_table(caminho).num_rows
+
+
+LEITORES = {'xlsx': _ler_xlsx, 'parquet': _ler_parquet}
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('formato', list(FORMATOS))
+def test_escrita(benchmark, itens, tmp_path, formato):
+    """Mede a escrita de LINHAS itens pelo pipeline de cada formato"""
+    benchmark.pedantic(lambda: _exportar(FORMATOS[formato](str(tmp_path)), itens), rounds=3, iterations=1)
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('formato', list(FORMATOS))
+def test_leitura(benchmark, itens, tmp_path, formato):
+    """Mede a leitura completa do arquivo gerado por cada formato"""
+    caminho = _exportar(FORMATOS[formato](str(tmp_path)), itens)
+
+    linhas = benchmark.pedantic(LEITORES[formato], args=(caminho,), rounds=3, iterations=1)
+
+    assert linhas == LINHAS
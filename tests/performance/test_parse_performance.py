@@ -0,0 +1,34 @@
+"""Extração das listagens por motor e tamanho da página (executar com `pytest tests/performance/ --benchmark-only`)"""
+import pytest
+from scrapy.http import HtmlResponse, Request
+
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+from tests.performance.helpers import gerar_pagina_bing
+
+pytest.importorskip('pytest_benchmark')
+
+
+def _resposta(n):
+    request = Request(url='https://www.bing.com/maps?q=academias', meta={'bairro': None})
+    return HtmlResponse(url=request.url, request=request, body=gerar_pagina_bing(n).encode('utf-8'), encoding='utf-8')
+
+
+@pytest.mark.slow
+@pytest.mark.benchmark(group='parse')
+@pytest.mark.parametrize('listagens', [10, 100, 1000])
+@pytest.mark.parametrize('motor', ['parsel', 'regex'])
+def test_parse_por_motor(benchmark, motor, listagens):
+    """Mede o parse de uma página com N listagens, incluindo a montagem do DOM no motor parsel"""
+    spider = BingMapsSpider(termo='academias')
+    spider.motor_extracao = motor
+    corpo = _resposta(listagens).body
+
+    def extrair():
+        # Resposta nova a cada rodada: o parsel guarda o DOM em cache na resposta
+        request = Request(url='https://www.bing.com/maps?q=academias', meta={'bairro': None})
+        response = HtmlResponse(url=request.url, request=request, body=corpo, encoding='utf-8')
+        return list(spider.parse(response))
+
+    itens = benchmark(extrair)
+    assert len(itens) == listagens
+    benchmark.extra_info['listagens_por_segundo'] = round(listagens / benchmark.stats.stats.mean)
@@ -0,0 +1,40 @@
+"""Escalabilidade do runner com o número de processos, contra o servidor local que imita o Bing"""
+import os
+
+import pytest
+
+from lead_scraper.run import executar, montar_plano
+from tests.fixtures.mock_bing_server import MockBingServer
+from tests.performance.helpers import gerar_pagina_bing
+
+CONSULTAS = 120
+
+
+def _nucleos():
+    return len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else (os.cpu_count() or 1)
+
+
+def _executar(servidor, processos, pasta):
+    # Motor parsel e 100 listagens por página: o gargalo é a CPU do processo do Scrapy
+    plano = montar_plano(['academias'], 'RS', ['Canoas'], [f'Bairro {i}' for i in range(CONSULTAS)])
+    return executar(plano, processos, pasta=str(pasta), formato='ndjson', settings_extras={
+        'BING_MAPS_URL': servidor.url, 'BING_PARSE_ENGINE': 'parsel', 'BING_MAX_PAGES': 1,
+        'LOG_LEVEL': 'INFO', 'CONCURRENT_REQUESTS': 32, 'CONCURRENT_REQUESTS_PER_DOMAIN': 32,
+    })
+
+
+@pytest.mark.slow
+@pytest.mark.skipif(_nucleos() < 2, reason='requer ao menos 2 núcleos')
+def test_throughput_scales_with_processes(tmp_path):
+    """Verifica que, com N processos, as consultas por segundo chegam perto de N vezes as de um processo"""
+    processos = min(_nucleos(), 4)
+    with MockBingServer(html=gerar_pagina_bing(100)) as servidor:
+        um = _executar(servidor, 1, tmp_path / 'um')
+        varios = _executar(servidor, processos, tmp_path / 'varios')
+
+    assert um['linhas'] == varios['linhas'] == 100
+    aceleracao = varios['consultas_por_segundo'] / um['consultas_por_segundo']
+    print(f"\n1 processo: {um['consultas_por_segundo']} consultas/s; {processos} processos: "
+          f"{varios['consultas_por_segundo']} consultas/s ({aceleracao:.2f}x)")
+    # A partida de cada processo (interpretador, Twisted, Scrapy) não paraleliza com o crawl
+    assert aceleracao >= 0.6 * processos
@@ -0,0 +1,33 @@
+"""Vazão do SQLiteLeadStorePipeline por tamanho de batch (executar com `pytest tests/performance/ --benchmark-only`)"""
+import pytest
+from unittest.mock import Mock
+
+from lead_scraper.pipelines import SQLiteLeadStorePipeline
+from tests.performance.helpers import gerar_item
+
+pytest.importorskip('pytest_benchmark')
+
+LINHAS = 20000
+
+
+@pytest.fixture(scope='module')
+def itens():
+    return [gerar_item(i) for i in range(LINHAS)]
+
+
+@pytest.mark.slow
+@pytest.mark.parametrize('batch_size', [1, 10, 100, 1000, 10000])
+def test_upsert_por_batch(benchmark, itens, tmp_path, batch_size):
+    """Mede a gravação de LINHAS itens novos em um banco vazio"""
+    spider = Mock()
+    rodada = iter(range(1000))
+
+    def gravar():
+        pipeline = SQLiteLeadStorePipeline(database=str(tmp_path / f'leads_{next(rodada)}.db'), batch_size=batch_size)
+        pipeline.open_spider(spider)
+        for item in itens:
+            pipeline.process_item(item, spider)
+        pipeline.close_spider(spider)
+
+    benchmark.pedantic(gravar, rounds=3, iterations=1)
+    benchmark.extra_info['linhas_por_segundo'] = round(LINHAS / benchmark.stats.stats.mean)
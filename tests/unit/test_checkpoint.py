@@ -0,0 +1,250 @@
+import json
+import pytest
+import openpyxl
+from unittest.mock import Mock
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+from lead_scraper.extensions import Checkpoint, checkpoint_gravando, consulta_concluida
+from lead_scraper.items import LeadScraperItem
+from lead_scraper.pipelines import ExcelExportPipeline
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+from lead_scraper.utils.checkpoint import CheckpointJournal
+from lead_scraper.utils.normalizacao import chave_consulta
+
+
+def _itens(quantidade, inicio=0):
+    for i in range(inicio, inicio + quantidade):
+        item = LeadScraperItem()
+        for campo in ['termo_busca', 'estado', 'cidade', 'bairro', 'endereco', 'telefone', 'website']:
+            item[campo] = f'{campo}_{i}'
+        item['nome'] = f'Nome_{i}'
+        yield item
+
+
+class TestCheckpointJournal:
+    """Testes unitários para o CheckpointJournal"""
+
+    def test_new_run_then_resume(self, tmp_path):
+        """Verifica que uma execução interrompida é retomada com o mesmo id e as mesmas consultas"""
+        journal = CheckpointJournal(str(tmp_path / 'checkpoint.sqlite'))
+        execucao, retomada = journal.iniciar_execucao()
+        assert retomada is False
+        journal.marcar(['academias em centro, canoas, rs'], 0)
+        journal.close()
+
+        journal = CheckpointJournal(str(tmp_path / 'checkpoint.sqlite'))
+        assert journal.iniciar_execucao() == (execucao, True)
+        assert journal.execucao() == (execucao, True)
+        assert journal.concluida('academias em centro, canoas, rs')
+        assert not journal.concluida('academias em moinhos, canoas, rs')
+
+    def test_finished_run_starts_over(self, tmp_path):
+        """Verifica que, após uma execução concluída, a próxima começa sem consultas"""
+        journal = CheckpointJournal(str(tmp_path / 'checkpoint.sqlite'))
+        journal.iniciar_execucao()
+        journal.marcar(['a', 'b'], 0)
+        journal.concluir_execucao()
+        assert journal.execucao() is None
+
+        _, retomada = journal.iniciar_execucao()
+        assert retomada is False
+        assert len(journal) == 0
+
+    def test_marking_twice_is_idempotent(self, tmp_path):
+        """Verifica que marcar a mesma consulta de novo não falha nem duplica"""
+        journal = CheckpointJournal(str(tmp_path / 'checkpoint.sqlite'))
+        journal.iniciar_execucao()
+        journal.marcar(['a', 'b'], 0)
+        journal.marcar(['b', 'c'], 1)
+        assert len(journal) == 3
+
+
+def _extensao(tmp_path, **settings):
+    crawler = get_crawler(BingMapsSpider, settings_dict={
+        'CHECKPOINT_ENABLED': True, 'CHECKPOINT_FILE': str(tmp_path / 'checkpoint.sqlite'), **settings
+    })
+    crawler.stats.open_spider(None)
+    return Checkpoint.from_crawler(crawler), crawler
+
+
+class TestCheckpointExtension:
+    """Testes unitários para a extensão Checkpoint"""
+
+    def test_disabled_by_default(self):
+        """Verifica que a extensão não é carregada sem CHECKPOINT_ENABLED"""
+        with pytest.raises(NotConfigured):
+            Checkpoint.from_crawler(get_crawler(BingMapsSpider))
+
+    def test_flushes_pipelines_before_recording(self, tmp_path):
+        """Verifica que o sinal checkpoint_gravando é enviado antes de gravar as consultas"""
+        extensao, crawler = _extensao(tmp_path)
+        ordem = []
+        crawler.signals.connect(lambda: ordem.append(len(extensao.journal)), signal=checkpoint_gravando, weak=False)
+        crawler.signals.send_catch_log(signal=consulta_concluida, chave='a')
+        crawler.signals.send_catch_log(signal=consulta_concluida, chave='b')
+        extensao.gravar()
+
+        assert ordem == [0]
+        assert len(extensao.journal) == 2
+        assert crawler.stats.get_value('checkpoint/concluidas') == 2
+        # Sem consultas novas, nada é gravado
+        extensao.gravar()
+        assert ordem == [0]
+
+    def test_interrupted_run_is_resumed(self, tmp_path):
+        """Verifica que o spider pula as consultas concluídas de uma execução interrompida"""
+        extensao, crawler = _extensao(tmp_path)
+        spider = BingMapsSpider(termo='academias', cidade='Canoas', bairros='Centro,Moinhos,Niterói')
+        concluida = spider._url('academias', 'RS', 'Canoas', 'Moinhos')
+        crawler.signals.send_catch_log(signal=consulta_concluida, chave=chave_consulta(concluida))
+        extensao.spider_closed(spider, 'shutdown')
+
+        extensao, crawler = _extensao(tmp_path)
+        assert extensao.retomada is True
+        spider.checkpoint = extensao
+        urls = [request.url for request in spider.start_requests()]
+        assert len(urls) == 2 and concluida not in urls
+        assert crawler.stats.get_value('checkpoint/puladas') == 1
+
+    def test_finished_run_is_not_resumed(self, tmp_path):
+        """Verifica que, depois de uma execução concluída, todas as consultas são refeitas"""
+        extensao, crawler = _extensao(tmp_path)
+        spider = BingMapsSpider(termo='academias', cidade='Canoas', bairros='Centro,Moinhos')
+        concluida = spider._url('academias', 'RS', 'Canoas', 'Centro')
+        crawler.signals.send_catch_log(signal=consulta_concluida, chave=chave_consulta(concluida))
+        extensao.spider_closed(spider, 'finished')
+
+        extensao, _ = _extensao(tmp_path)
+        spider.checkpoint = extensao
+        assert extensao.retomada is False
+        assert len(list(spider.start_requests())) == 2
+
+
+class TestSpiderConclusao:
+    """Testa o sinal consulta_concluida enviado pelo spider"""
+
+    URL = 'https://www.bing.com/maps?q=academias%20em%20Centro%2C%20Canoas%2C%20RS'
+
+    def _spider(self, **settings):
+        crawler = get_crawler(BingMapsSpider, settings_dict=settings)
+        crawler.stats.open_spider(None)
+        concluidas = []
+        crawler.signals.connect(lambda chave: concluidas.append(chave), signal=consulta_concluida, weak=False)
+        return BingMapsSpider.from_crawler(crawler, termo='academias'), concluidas
+
+    def _resposta(self, html, classificacao=None, url=URL):
+        meta = {'bairro': 'Centro', 'estado': 'RS', 'cidade': 'Canoas'}
+        if classificacao:
+            meta['classificacao'] = classificacao
+        request = Request(url, meta=meta)
+        return HtmlResponse(url=url, request=request, body=html.encode('utf-8'), encoding='utf-8')
+
+    def test_query_concluded_after_parse(self, mock_bing_html):
+        """Verifica que a consulta é concluída ao processar sua página"""
+        spider, concluidas = self._spider()
+        list(spider.parse(self._resposta(mock_bing_html)))
+        assert concluidas == ['academias em centro, canoas, rs']
+
+    def test_empty_query_is_concluded(self):
+        """Verifica que uma busca legitimamente vazia também conta como concluída"""
+        spider, concluidas = self._spider()
+        list(spider.parse(self._resposta('<html></html>', classificacao='vazia')))
+        assert len(concluidas) == 1
+
+    @pytest.mark.parametrize('max_paginas', [1, 3])
+    @pytest.mark.parametrize('classificacao', ['bloqueada', 'truncada'])
+    def test_blocked_query_is_not_concluded(self, classificacao, max_paginas):
+        """Verifica que uma página bloqueada ou truncada deixa a consulta para a próxima execução"""
+        spider, concluidas = self._spider(BING_MAX_PAGES=max_paginas)
+        list(spider.parse(self._resposta('<html></html>', classificacao=classificacao)))
+        assert concluidas == []
+
+    def test_paginated_query_concluded_after_last_page(self, mock_bing_html):
+        """Verifica que, com paginação, a consulta só é concluída quando a última página termina"""
+        spider, concluidas = self._spider(BING_MAX_PAGES=2)
+        resultados = list(spider.parse(self._resposta(mock_bing_html)))
+        pagina2 = [r for r in resultados if isinstance(r, Request)][0]
+        assert concluidas == []
+
+        html = mock_bing_html.replace('ypid:', 'ypid:p2-')
+        response = HtmlResponse(url=pagina2.url, request=pagina2, body=html.encode('utf-8'), encoding='utf-8')
+        list(spider.parse(response))
+        assert concluidas == ['academias em centro, canoas, rs']
+
+
+class TestExcelExportResume:
+    """Testa a retomada da exportação em partes"""
+
+    def _executar(self, pasta, execucao, itens, interromper=False):
+        pipeline = ExcelExportPipeline(results_folder=str(pasta), max_rows=2, execucao=execucao,
+                                       journal_flush_items=1)
+        spider = Mock()
+        pipeline.open_spider(spider)
+        for item in itens:
+            pipeline.process_item(item, spider)
+        if interromper:
+            pipeline.abortar()
+        else:
+            pipeline.close_spider(spider)
+        return pipeline
+
+    def test_checkpoint_forces_parts_named_after_run(self, tmp_path):
+        """Verifica que com checkpoint a saída vai para partes com o id da execução"""
+        pipeline = ExcelExportPipeline(results_folder=str(tmp_path), execucao=('20240101_120000', False))
+        spider = Mock()
+        pipeline.open_spider(spider)
+        for item in _itens(3):
+            pipeline.process_item(item, spider)
+        pipeline.close_spider(spider)
+        assert [p.name for p in sorted(tmp_path.glob('*.xlsx'))] == ['leads_20240101_120000_part0001.xlsx']
+
+    def test_resume_continues_part_numbering(self, tmp_path):
+        """Verifica que a retomada recupera a parte interrompida e continua a numeração sem sobrescrever"""
+        # Primeira execução: 2 partes cheias + 1 linha na parte 3 quando o processo morre
+        self._executar(tmp_path, ('20240101_120000', False), _itens(5), interromper=True)
+        assert (tmp_path / 'leads_20240101_120000_part0003.parcial.csv').exists()
+        parte1 = (tmp_path / 'leads_20240101_120000_part0001.xlsx').read_bytes()
+
+        pipeline = self._executar(tmp_path, ('20240101_120000', True), _itens(3, inicio=5))
+
+        assert (tmp_path / 'leads_20240101_120000_part0001.xlsx').read_bytes() == parte1
+        assert not list(tmp_path.glob('*.parcial.csv'))
+        manifesto = json.loads((tmp_path / 'leads_20240101_120000_manifest.json').read_text(encoding='utf-8'))
+        assert manifesto['completo'] is True
+        assert [parte['arquivo'][-13:] for parte in manifesto['partes']] == [
+            'part0001.xlsx', 'part0002.xlsx', 'part0003.xlsx', 'part0004.xlsx', 'part0005.xlsx'
+        ]
+        assert manifesto['total_linhas'] == 8
+
+        nomes = []
+        for parte in manifesto['partes']:
+            workbook = openpyxl.load_workbook(tmp_path / parte['arquivo'])
+            nomes += [linha[4] for linha in list(workbook.active.iter_rows(values_only=True))[1:]]
+            workbook.close()
+        assert nomes == [f'Nome_{i}' for i in range(8)]
+        assert len(pipeline.partes) == 5
+
+    def test_resume_registers_part_missing_from_manifest(self, tmp_path):
+        """Verifica que uma parte fechada sem manifesto atualizado não é sobrescrita"""
+        self._executar(tmp_path, ('20240101_120000', False), _itens(4), interromper=True)
+        # Interrupção logo após fechar a parte 2, antes de regravar o manifesto
+        manifesto = tmp_path / 'leads_20240101_120000_manifest.json'
+        dados = json.loads(manifesto.read_text(encoding='utf-8'))
+        dados['partes'] = dados['partes'][:1]
+        manifesto.write_text(json.dumps(dados), encoding='utf-8')
+        for journal in tmp_path.glob('*.parcial.csv'):
+            journal.unlink()
+
+        self._executar(tmp_path, ('20240101_120000', True), _itens(1, inicio=4))
+        dados = json.loads(manifesto.read_text(encoding='utf-8'))
+        assert [parte['linhas'] for parte in dados['partes']] == [2, 2, 1]
+
+    def test_from_crawler_reads_run_from_journal(self, tmp_path):
+        """Verifica que a pipeline usa a execução registrada no journal do checkpoint"""
+        caminho = str(tmp_path / 'checkpoint.sqlite')
+        journal = CheckpointJournal(caminho)
+        execucao = journal.iniciar_execucao()
+        journal.close()
+        crawler = get_crawler(BingMapsSpider, settings_dict={'CHECKPOINT_ENABLED': True, 'CHECKPOINT_FILE': caminho})
+        assert ExcelExportPipeline.from_crawler(crawler).execucao == execucao
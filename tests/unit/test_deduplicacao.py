@@ -0,0 +1,121 @@
+import os
+import pytest
+from unittest.mock import Mock
+from scrapy.exceptions import DropItem
+from scrapy.utils.test import get_crawler
+from lead_scraper.pipelines import LeadDedupPipeline
+from lead_scraper.items import LeadScraperItem
+from lead_scraper.utils.bloom import BloomFilter, dimensionar
+
+
+def _criar_item(nome='Academia Fitness Plus', endereco='Rua Example, 123', cidade='Porto Alegre', bairro='Centro'):
+    item = LeadScraperItem()
+    item['termo_busca'] = 'academias'
+    item['estado'] = 'RS'
+    item['cidade'] = cidade
+    item['bairro'] = bairro
+    item['nome'] = nome
+    item['endereco'] = endereco
+    item['telefone'] = '(51) 3333-4444'
+    item['website'] = 'https://example.com'
+    return item
+
+
+class TestBloomFilter:
+    """Testes unitários para o Bloom filter persistente"""
+
+    def test_add_and_contains(self, tmp_path):
+        """Verifica que chaves adicionadas são encontradas e add indica duplicatas"""
+        filtro = BloomFilter(str(tmp_path / 'f.bloom'), capacidade=1000, taxa_fp=0.01)
+        assert 'a' not in filtro
+        assert filtro.add('a') is False
+        assert filtro.add('a') is True
+        assert 'a' in filtro
+        assert filtro.inseridos == 1
+        filtro.close()
+
+    def test_persists_between_openings(self, tmp_path):
+        """Verifica que o filtro reaberto mantém chaves e parâmetros gravados"""
+        caminho = str(tmp_path / 'f.bloom')
+        filtro = BloomFilter(caminho, capacidade=1000, taxa_fp=0.01)
+        for i in range(100):
+            filtro.add(f'chave-{i}')
+        filtro.close()
+
+        reaberto = BloomFilter(caminho, capacidade=5, taxa_fp=0.5)
+        assert reaberto.capacidade == 1000
+        assert reaberto.taxa_fp == 0.01
+        assert reaberto.inseridos == 100
+        assert all(f'chave-{i}' in reaberto for i in range(100))
+        reaberto.close()
+
+    def test_false_positive_rate_within_bound(self, tmp_path):
+        """Verifica que a taxa de falso positivo na capacidade fica próxima da configurada"""
+        filtro = BloomFilter(str(tmp_path / 'f.bloom'), capacidade=10000, taxa_fp=0.01)
+        for i in range(10000):
+            filtro.add(f'lead-{i}')
+        falsos = sum(f'outro-{i}' in filtro for i in range(10000))
+        filtro.close()
+        assert falsos / 10000 < 0.02
+
+    def test_file_size_matches_dimensioning(self, tmp_path):
+        """Verifica que o arquivo tem o tamanho do vetor de bits calculado"""
+        caminho = str(tmp_path / 'f.bloom')
+        BloomFilter(caminho, capacidade=1_000_000, taxa_fp=0.001).close()
+        bits, _ = dimensionar(1_000_000, 0.001)
+        assert (bits + 7) // 8 <= os.path.getsize(caminho) < (bits + 7) // 8 + 64
+
+    def test_invalid_file(self, tmp_path):
+        """Verifica que um arquivo que não é um filtro é rejeitado"""
+        caminho = tmp_path / 'f.bloom'
+        caminho.write_bytes(b'x' * 100)
+        with pytest.raises(ValueError):
+            BloomFilter(str(caminho))
+
+
+class TestLeadDedupPipeline:
+    """Testes unitários para LeadDedupPipeline"""
+
+    def _pipeline(self, tmp_path, crawler=None):
+        crawler = crawler or get_crawler(settings_dict={'DEDUP_FILTER_PATH': str(tmp_path / 'leads.bloom'),
+                                                        'DEDUP_CAPACITY': 1000})
+        pipeline = LeadDedupPipeline.from_crawler(crawler)
+        pipeline.open_spider(Mock())
+        return crawler, pipeline
+
+    def test_drops_duplicates_across_bairros(self, tmp_path):
+        """Verifica que o mesmo negócio em outro bairro e com grafia diferente é descartado"""
+        crawler, pipeline = self._pipeline(tmp_path)
+        item = _criar_item()
+        assert pipeline.process_item(item, Mock()) is item
+        with pytest.raises(DropItem):
+            pipeline.process_item(_criar_item(nome='ACADEMIA  fitness plus', bairro='Moinhos'), Mock())
+        pipeline.process_item(_criar_item(nome='Outra Academia'), Mock())
+        pipeline.close_spider(Mock())
+
+        stats = crawler.stats
+        assert stats.get_value('dedup/novos') == 2
+        assert stats.get_value('dedup/duplicados') == 1
+        assert stats.get_value('dedup/taxa_acerto') == round(1 / 3, 4)
+        assert stats.get_value('dedup/chaves_no_filtro') == 2
+
+    def test_drops_duplicates_from_previous_run(self, tmp_path):
+        """Verifica que leads vistos em uma execução anterior são descartados"""
+        _, pipeline = self._pipeline(tmp_path)
+        pipeline.process_item(_criar_item(), Mock())
+        pipeline.close_spider(Mock())
+
+        crawler, pipeline = self._pipeline(tmp_path)
+        with pytest.raises(DropItem):
+            pipeline.process_item(_criar_item(), Mock())
+        pipeline.close_spider(Mock())
+        assert crawler.stats.get_value('dedup/taxa_acerto') == 1.0
+
+    def test_default_path(self, tmp_path, mocker):
+        """Verifica que sem DEDUP_FILTER_PATH o filtro fica na pasta de resultados"""
+        mocker.patch('lead_scraper.pipelines.pasta_resultados', return_value=str(tmp_path))
+        pipeline = LeadDedupPipeline()
+        pipeline.open_spider(Mock())
+        pipeline.close_spider(Mock())
+        assert pipeline.path == str(tmp_path / 'leads.bloom')
+        assert os.path.exists(pipeline.path)
@@ -0,0 +1,105 @@
+import pytest
+from unittest.mock import Mock
+from scrapy.core.downloader import Slot
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+from lead_scraper.extensions import AdaptiveConcurrency
+
+
+def _extensao(concorrencia=8, **settings):
+    crawler = get_crawler(settings_dict={'ADAPTIVE_CONCURRENCY_ENABLED': True, **settings})
+    crawler.engine = Mock()
+    crawler.engine.downloader.slots = {'bing': Slot(concorrencia, 0, False)}
+    return AdaptiveConcurrency.from_crawler(crawler), crawler.engine.downloader.slots['bing']
+
+
+def _observar(extensao, n, status=200, latencia=0.1, listagens=18, excecao=False):
+    """Simula n requisições passando pelo downloader e pelo parse do spider"""
+    for i in range(n):
+        request = Request(f'https://www.bing.com/maps?q={i}', meta={'download_slot': 'bing', 'download_latency': latencia})
+        extensao.request_left_downloader(request, None)
+        if excecao:
+            continue
+        response = HtmlResponse(request.url, status=status, request=request, body=b'')
+        extensao.response_downloaded(response, request, None)
+        if status == 200:
+            extensao.pagina_processada(response, listagens)
+
+
+class TestAdaptiveConcurrency:
+    """Testes unitários para a extensão AdaptiveConcurrency"""
+
+    def test_disabled_by_default(self):
+        """Verifica que a extensão não é carregada sem ADAPTIVE_CONCURRENCY_ENABLED"""
+        with pytest.raises(NotConfigured):
+            AdaptiveConcurrency.from_crawler(get_crawler())
+
+    def test_additive_increase_when_healthy_with_queue(self):
+        """Verifica o aumento aditivo quando o slot está saudável e há fila"""
+        extensao, slot = _extensao(concorrencia=4)
+        slot.queue.append((Mock(), Mock()))
+        _observar(extensao, 20)
+        extensao.ajustar()
+        assert slot.concurrency == 5
+        assert extensao.stats.get_value('adaptive_concurrency/aumentos') == 1
+        assert extensao.stats.get_value('adaptive_concurrency/concorrencia/bing') == 5
+
+    def test_holds_without_queue(self):
+        """Verifica que sem demanda a concorrência não aumenta"""
+        extensao, slot = _extensao(concorrencia=4)
+        _observar(extensao, 20)
+        extensao.ajustar()
+        assert slot.concurrency == 4
+        assert extensao.stats.get_value('adaptive_concurrency/mantidas') == 1
+
+    def test_caps_at_max(self):
+        """Verifica que a concorrência não passa de ADAPTIVE_CONCURRENCY_MAX"""
+        extensao, slot = _extensao(concorrencia=6, ADAPTIVE_CONCURRENCY_MAX=6)
+        slot.queue.append((Mock(), Mock()))
+        _observar(extensao, 20)
+        extensao.ajustar()
+        assert slot.concurrency == 6
+
+    @pytest.mark.parametrize('observacao, motivo', [
+        ({'status': 429}, 'bloqueios'),
+        ({'status': 500}, 'erros'),
+        ({'excecao': True}, 'erros'),
+        ({'listagens': 0}, 'páginas vazias'),
+        ({'latencia': 5.0}, 'latência'),
+    ])
+    def test_multiplicative_backoff(self, observacao, motivo, caplog):
+        """Verifica a redução multiplicativa para cada sinal de sobrecarga e o log da decisão"""
+        extensao, slot = _extensao(concorrencia=8)
+        slot.queue.append((Mock(), Mock()))
+        _observar(extensao, 5)
+        _observar(extensao, 15, **observacao)
+        with caplog.at_level('INFO', logger='lead_scraper.extensions'):
+            extensao.ajustar()
+        assert slot.concurrency == 4
+        assert f'8 -> 4 ({motivo};' in caplog.text
+        assert extensao.stats.get_value('adaptive_concurrency/reducoes') == 1
+
+    def test_backoff_floor(self):
+        """Verifica que a concorrência nunca fica abaixo de ADAPTIVE_CONCURRENCY_MIN"""
+        extensao, slot = _extensao(concorrencia=2, ADAPTIVE_CONCURRENCY_MIN=2)
+        _observar(extensao, 10, status=429)
+        extensao.ajustar()
+        assert slot.concurrency == 2
+
+    def test_too_few_samples(self):
+        """Verifica que janelas com poucas amostras não geram decisão"""
+        extensao, slot = _extensao(concorrencia=8)
+        _observar(extensao, 2, status=429)
+        extensao.ajustar()
+        assert slot.concurrency == 8
+
+    def test_window_resets_between_adjustments(self):
+        """Verifica que cada ajuste considera apenas as observações desde o anterior"""
+        extensao, slot = _extensao(concorrencia=8)
+        _observar(extensao, 10, status=429)
+        extensao.ajustar()
+        slot.queue.append((Mock(), Mock()))
+        _observar(extensao, 10)
+        extensao.ajustar()
+        assert slot.concurrency == 5
@@ -0,0 +1,86 @@
+import pytest
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+from lead_scraper.utils.extracao import extrair_data_entities, carregar_json
+
+
+HTML_CASOS_LIMITE = '''
+<html><body>
+    <a class="listings-item" data-entity='{"entity": {"title": "Aspas Simples", "phone": "(51) 1111-1111"}}'></a>
+    <a data-entity="{&quot;entity&quot;:{&quot;title&quot;:&quot;Ordem Invertida &amp; Cia&quot;}}" class="b_card listings-item"></a>
+    <a class="listings-item"></a>
+    <a class="listings-item-extra" data-entity='{"entity": {"title": "Outra Classe"}}'></a>
+    <div class="listings-item" data-entity='{"entity": {"title": "Não é link"}}'></div>
+    <a title="x > y" class="listings-item" data-entity='{"entity": {"title": "Maior que &#234; no atributo", "website": "https://a.com/?a=1&amp;b=2"}}'></a>
+    <a class="listings-item" data-entity='{"entity": {"title": "JSON inválido"'></a>
+    <A CLASS="listings-item" DATA-ENTITY='{"entity": {"title": "Maiúsculas"}}'></A>
+    <a class="listings-item" data-entity="{&quot;entity&quot;:{&quot;title&quot;:&quot;Literal &amp;quot; &lt;b&gt;&quot;}}"></a>
+</body></html>
+'''
+
+
+def _resposta(html):
+    request = Request(url='https://www.bing.com/maps?q=test', meta={'bairro': 'Centro'})
+    return HtmlResponse(url=request.url, request=request, body=html.encode('utf-8'), encoding='utf-8')
+
+
+def _itens(html, motor):
+    spider = BingMapsSpider(termo='academias', estado='RS', cidade='Porto Alegre')
+    spider.motor_extracao = motor
+    return [dict(item) for item in spider.parse(_resposta(html))]
+
+
+class TestExtrairDataEntities:
+    """Testa a extração das listagens direto dos bytes da página"""
+
+    def test_same_payloads_as_parsel_on_fixture(self, mock_bing_html):
+        """Verifica que os data-entity extraídos são idênticos aos do seletor CSS"""
+        response = _resposta(mock_bing_html)
+        esperado = [a.attrib.get('data-entity') for a in response.css('a.listings-item')]
+        assert len(esperado) == 18
+        assert extrair_data_entities(response.body, response.encoding) == esperado
+
+    def test_same_payloads_as_parsel_on_edge_cases(self):
+        """Verifica aspas simples, ordem dos atributos, classes múltiplas e atributo ausente"""
+        response = _resposta(HTML_CASOS_LIMITE)
+        esperado = [a.attrib.get('data-entity') for a in response.css('a.listings-item')]
+        assert extrair_data_entities(response.body, response.encoding) == esperado
+        assert None in esperado
+
+    def test_carregar_json_fallback(self):
+        """Verifica que valores aceitos apenas pelo json padrão continuam funcionando"""
+        assert carregar_json('{"a": 1}') == {'a': 1}
+        assert carregar_json('{"a": NaN}')['a'] != 0
+
+
+class TestMotorExtracao:
+    """Testa a seleção do motor de extração do spider"""
+
+    def test_same_items_on_fixture(self, mock_bing_html):
+        """Verifica que os dois motores geram os mesmos itens na fixture do Bing"""
+        itens = _itens(mock_bing_html, 'regex')
+        assert len(itens) == 18
+        assert itens == _itens(mock_bing_html, 'parsel')
+
+    def test_same_items_on_edge_cases(self):
+        """Verifica que os dois motores geram os mesmos itens nos casos limite"""
+        itens = _itens(HTML_CASOS_LIMITE, 'regex')
+        assert [i['nome'] for i in itens] == [
+            'Aspas Simples', 'Ordem Invertida & Cia', 'Maior que ê no atributo', 'Maiúsculas',
+            'Literal &quot; <b>'
+        ]
+        assert itens == _itens(HTML_CASOS_LIMITE, 'parsel')
+
+    def test_engine_from_settings(self):
+        """Verifica que BING_PARSE_ENGINE seleciona o motor"""
+        crawler = get_crawler(BingMapsSpider, settings_dict={'BING_PARSE_ENGINE': 'regex'})
+        spider = BingMapsSpider.from_crawler(crawler, termo='academias')
+        assert spider.motor_extracao == 'regex'
+        assert BingMapsSpider(termo='academias').motor_extracao == 'parsel'
+
+    def test_invalid_engine(self):
+        """Verifica que um motor desconhecido é rejeitado"""
+        crawler = get_crawler(BingMapsSpider, settings_dict={'BING_PARSE_ENGINE': 'xpath'})
+        with pytest.raises(ValueError):
+            BingMapsSpider.from_crawler(crawler, termo='academias')
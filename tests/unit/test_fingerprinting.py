@@ -0,0 +1,52 @@
+from scrapy import Request
+from scrapy.utils.test import get_crawler
+from lead_scraper.fingerprinting import QueryRequestFingerprinter
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+
+
+def _fingerprinter():
+    return QueryRequestFingerprinter.from_crawler(get_crawler(BingMapsSpider))
+
+
+class TestQueryRequestFingerprinter:
+    """Testes unitários para QueryRequestFingerprinter"""
+
+    def test_equivalent_queries_share_fingerprint(self):
+        """Verifica que variações de caixa, acentos, espaços e codificação geram o mesmo fingerprint"""
+        fingerprinter = _fingerprinter()
+        urls = [
+            'https://www.bing.com/maps?q=academias%20em%20Centro%2C%20Porto%20Alegre%2C%20RS',
+            'https://www.bing.com/maps?q=Academias+em++centro,+Porto+Alegre,+rs',
+            'https://www.bing.com/maps?q=ACADEMIAS%20em%20C%C3%A9ntro%2C%20P%C3%B4rto%20Alegre%2C%20RS',
+        ]
+        assert len({fingerprinter.fingerprint(Request(url)) for url in urls}) == 1
+
+    def test_different_queries_and_pages_differ(self):
+        """Verifica que outro bairro, outro termo ou outra página não colidem"""
+        fingerprinter = _fingerprinter()
+        base = 'https://www.bing.com/maps?q=academias%20em%20Centro%2C%20Porto%20Alegre%2C%20RS'
+        outras = [
+            base,
+            base.replace('Centro', 'Moinhos'),
+            base.replace('academias', 'padarias'),
+            f'{base}&first=19',
+        ]
+        assert len({fingerprinter.fingerprint(Request(url)) for url in outras}) == 4
+
+    def test_non_search_requests_use_default_fingerprint(self):
+        """Verifica que URLs sem q e requisições POST seguem o fingerprint padrão"""
+        fingerprinter = _fingerprinter()
+        assert fingerprinter.fingerprint(Request('https://example.com/A')) != \
+            fingerprinter.fingerprint(Request('https://example.com/a'))
+        url = 'https://www.bing.com/maps?q=academias'
+        assert fingerprinter.fingerprint(Request(url, method='POST', body=b'1')) != \
+            fingerprinter.fingerprint(Request(url, method='POST', body=b'2'))
+
+    def test_spider_duplicate_bairros_are_suppressed(self):
+        """Verifica que bairros repetidos com outra grafia geram requisições com o mesmo fingerprint"""
+        fingerprinter = _fingerprinter()
+        spider = BingMapsSpider(termo='academias', estado='RS', cidade='Porto Alegre',
+                                bairros='Centro, centro,Cêntro ,Moinhos de Vento')
+        fingerprints = [fingerprinter.fingerprint(r) for r in spider.start_requests()]
+        assert len(fingerprints) == 4
+        assert len(set(fingerprints)) == 2
@@ -0,0 +1,182 @@
+import time
+import pytest
+from unittest.mock import Mock
+from scrapy.exceptions import DontCloseSpider, NotConfigured
+from scrapy.utils.test import get_crawler
+from lead_scraper.extensions import SharedFrontier, checkpoint_gravando, consulta_concluida
+from lead_scraper.frontier import SQLiteFrontier
+from lead_scraper.run import chave
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+from lead_scraper.utils.normalizacao import chave_consulta
+
+
+def _consultas(quantidade, termo='academias'):
+    for i in range(quantidade):
+        consulta = (termo, 'RS', 'Canoas', f'Bairro {i}')
+        yield f'{termo}|{i}', consulta
+
+
+class TestSQLiteFrontier:
+    """Testes unitários para o backend SQLite da frontier"""
+
+    def test_add_is_idempotent(self, tmp_path):
+        """Verifica que consultas já na fila não entram de novo"""
+        frontier = SQLiteFrontier(str(tmp_path / 'frontier.sqlite'))
+
+        assert frontier.adicionar(_consultas(3)) == 3
+        assert frontier.adicionar(_consultas(5)) == 2
+        assert frontier.resumo() == {'pendente': 5, 'arrendada': 0, 'concluida': 0, 'falhou': 0}
+
+    def test_workers_never_share_a_lease(self, tmp_path):
+        """Verifica que dois workers (conexões separadas) recebem lotes disjuntos, na ordem da fila"""
+        caminho = str(tmp_path / 'frontier.sqlite')
+        SQLiteFrontier(caminho).adicionar(_consultas(5))
+        worker_a, worker_b = SQLiteFrontier(caminho), SQLiteFrontier(caminho)
+
+        lote_a = worker_a.arrendar('a', 3, 60)
+        lote_b = worker_b.arrendar('b', 3, 60)
+
+        assert [c for c, _ in lote_a] == ['academias|0', 'academias|1', 'academias|2']
+        assert [c for c, _ in lote_b] == ['academias|3', 'academias|4']
+        assert lote_a[0][1] == ('academias', 'RS', 'Canoas', 'Bairro 0')
+        assert worker_a.arrendar('a', 3, 60) == []
+
+    def test_expired_lease_is_taken_by_another_worker(self, tmp_path):
+        """Verifica que um arrendamento vencido volta para a fila e só renova quem ainda é dono"""
+        frontier = SQLiteFrontier(str(tmp_path / 'frontier.sqlite'))
+        frontier.adicionar(_consultas(2))
+        frontier.arrendar('morto', 1, 0.05)
+        frontier.arrendar('vivo', 1, 60)
+        time.sleep(0.1)
+
+        assert [c for c, _ in frontier.arrendar('outro', 5, 60)] == ['academias|0']
+        assert frontier.renovar('morto', ['academias|0'], 60) == []
+        assert frontier.renovar('vivo', ['academias|1'], 60) == ['academias|1']
+
+    def test_confirm_and_return(self, tmp_path):
+        """Verifica a confirmação e a devolução de consultas arrendadas"""
+        frontier = SQLiteFrontier(str(tmp_path / 'frontier.sqlite'))
+        frontier.adicionar(_consultas(3))
+        frontier.arrendar('a', 3, 60)
+
+        assert frontier.confirmar(['academias|0', 'academias|1']) == 2
+        frontier.devolver('a', ['academias|2'])
+
+        assert frontier.resumo() == {'pendente': 1, 'arrendada': 0, 'concluida': 2, 'falhou': 0}
+        assert frontier.em_aberto() == 1
+        assert [c for c, _ in frontier.arrendar('b', 5, 60)] == ['academias|2']
+
+    def test_fails_after_max_attempts(self, tmp_path):
+        """Verifica que uma consulta arrendada max_tentativas vezes sem confirmação é marcada como falhou"""
+        frontier = SQLiteFrontier(str(tmp_path / 'frontier.sqlite'), max_tentativas=2)
+        frontier.adicionar(_consultas(2))
+        for _ in range(2):
+            frontier.arrendar('a', 1, 60)
+            frontier.devolver('a', ['academias|0'])
+        # Arrendamentos vencidos também contam como tentativas
+        for worker in ('a', 'b'):
+            assert [c for c, _ in frontier.arrendar(worker, 1, 0.01)] == ['academias|1']
+            time.sleep(0.05)
+
+        assert frontier.arrendar('c', 5, 60) == []
+        assert frontier.resumo()['falhou'] == 2
+        assert frontier.em_aberto() == 0
+
+
+def _extensao(tmp_path, **settings):
+    crawler = get_crawler(BingMapsSpider, settings_dict={
+        'FRONTIER_ENABLED': True, 'FRONTIER_PATH': str(tmp_path / 'frontier.sqlite'), 'FRONTIER_BATCH_SIZE': 4,
+        **settings
+    })
+    crawler.stats.open_spider(None)
+    crawler.engine = Mock()
+    extensao = SharedFrontier.from_crawler(crawler)
+    extensao.spider = BingMapsSpider(termo='ignorado')
+    extensao.spider.frontier = extensao
+    plano = [('academias', 'RS', 'Canoas', f'Bairro {i}') for i in range(10)]
+    extensao.backend.adicionar((chave(consulta), consulta) for consulta in plano)
+    return extensao, crawler
+
+
+class TestSharedFrontierExtension:
+    """Testes unitários para a extensão SharedFrontier"""
+
+    def test_disabled_by_default(self):
+        """Verifica que a extensão não é carregada sem FRONTIER_ENABLED"""
+        with pytest.raises(NotConfigured):
+            SharedFrontier.from_crawler(get_crawler(BingMapsSpider))
+
+    def test_spider_starts_with_a_leased_batch(self, tmp_path):
+        """Verifica que, com a frontier, o spider ignora termo/cidade/bairros e busca o primeiro lote"""
+        extensao, crawler = _extensao(tmp_path)
+
+        requests = list(extensao.spider.start_requests())
+
+        assert [r.meta['bairro'] for r in requests] == ['Bairro 0', 'Bairro 1', 'Bairro 2', 'Bairro 3']
+        assert all(r.meta['termo'] == 'academias' for r in requests)
+        assert crawler.stats.get_value('frontier/arrendadas') == 4
+
+    def test_next_batch_is_leased_when_half_done(self, tmp_path):
+        """Verifica que o próximo lote é agendado quando metade do lote atual terminou"""
+        extensao, crawler = _extensao(tmp_path)
+        requests = list(extensao.spider.start_requests())
+
+        for request in requests[:2]:
+            crawler.signals.send_catch_log(signal=consulta_concluida, chave=chave_consulta(request.url))
+
+        agendadas = [c.args[0] for c in crawler.engine.crawl.call_args_list]
+        assert [r.meta['bairro'] for r in agendadas] == ['Bairro 4', 'Bairro 5', 'Bairro 6', 'Bairro 7']
+        assert crawler.stats.get_value('frontier/lotes') == 2
+
+    def test_confirms_after_pipelines_flush(self, tmp_path):
+        """Verifica que as consultas só são confirmadas depois do sinal checkpoint_gravando"""
+        extensao, crawler = _extensao(tmp_path)
+        requests = list(extensao.spider.start_requests())
+        ordem = []
+        crawler.signals.connect(lambda: ordem.append(extensao.backend.resumo()['concluida']),
+                                signal=checkpoint_gravando, weak=False)
+        crawler.signals.send_catch_log(signal=consulta_concluida, chave=chave_consulta(requests[0].url))
+
+        extensao.renovar()
+
+        assert ordem == [0]
+        assert extensao.backend.resumo()['concluida'] == 1
+        assert crawler.stats.get_value('frontier/confirmadas') == 1
+
+    def test_idle_returns_unfinished_and_leases_more(self, tmp_path):
+        """Verifica que, ocioso, o spider devolve o que não concluiu e arrenda outro lote"""
+        extensao, crawler = _extensao(tmp_path)
+        requests = list(extensao.spider.start_requests())
+        crawler.signals.send_catch_log(signal=consulta_concluida, chave=chave_consulta(requests[0].url))
+
+        with pytest.raises(DontCloseSpider):
+            extensao.spider_idle(extensao.spider)
+
+        assert crawler.stats.get_value('frontier/devolvidas') == 3
+        # As devolvidas voltam para a fila antes das ainda não arrendadas
+        agendadas = [c.args[0].meta['bairro'] for c in crawler.engine.crawl.call_args_list]
+        assert agendadas == ['Bairro 1', 'Bairro 2', 'Bairro 3', 'Bairro 4']
+
+    def test_idle_waits_for_other_workers_leases(self, tmp_path):
+        """Verifica que o worker só encerra quando não há consultas arrendadas por outros workers"""
+        extensao, crawler = _extensao(tmp_path)
+        outro = SQLiteFrontier(str(tmp_path / 'frontier.sqlite'))
+        arrendadas = outro.arrendar('outro', 10, 60)
+
+        with pytest.raises(DontCloseSpider):
+            extensao.spider_idle(extensao.spider)
+
+        outro.confirmar([c for c, _ in arrendadas])
+        extensao.spider_idle(extensao.spider)
+        assert not crawler.engine.crawl.called
+
+    def test_close_returns_leases(self, tmp_path):
+        """Verifica que um encerramento antecipado devolve à fila as consultas não concluídas"""
+        extensao, crawler = _extensao(tmp_path)
+        requests = list(extensao.spider.start_requests())
+        crawler.signals.send_catch_log(signal=consulta_concluida, chave=chave_consulta(requests[0].url))
+
+        extensao.spider_closed(extensao.spider, 'shutdown')
+
+        resumo = SQLiteFrontier(str(tmp_path / 'frontier.sqlite')).resumo()
+        assert resumo == {'pendente': 9, 'arrendada': 0, 'concluida': 1, 'falhou': 0}
@@ -0,0 +1,209 @@
+import os
+import time
+from unittest.mock import Mock
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+from lead_scraper.httpcache import PackFileCacheStorage
+from lead_scraper.utils.normalizacao import chave_consulta
+
+URL = 'https://www.bing.com/maps?q=academias%20em%20Centro%2C%20Porto%20Alegre%2C%20RS'
+
+
+def _storage(tmp_path, **settings):
+    crawler = get_crawler(settings_dict={'HTTPCACHE_DIR': str(tmp_path / 'cache'), **settings})
+    spider = Mock()
+    spider.name = 'bing_maps'
+    spider.crawler = crawler
+    storage = PackFileCacheStorage(crawler.settings)
+    storage.open_spider(spider)
+    return storage, spider
+
+
+def _corpo_aleatorio(tamanho):
+    # Página completa: sem o </html>, a resposta seria classificada como truncada e não entraria no cache
+    return b'<html>' + os.urandom(tamanho) + b'</html>'
+
+
+def _resposta(url=URL, corpo=b'<html>academias</html>', status=200):
+    return HtmlResponse(url, status=status, body=corpo, headers={'Content-Type': 'text/html; charset=utf-8'})
+
+
+class TestChaveConsulta:
+    """Testa a chave normalizada das buscas"""
+
+    def test_normalizes_encoding_case_and_accents(self):
+        """Verifica que variações de codificação, caixa e acentos geram a mesma chave"""
+        assert chave_consulta(URL) == 'academias em centro, porto alegre, rs'
+        assert chave_consulta('http://127.0.0.1:8765/maps?q=Academias+em+CENTRO,+Pórto+Alegre,+RS') == chave_consulta(URL)
+
+    def test_page_and_non_search_urls(self):
+        """Verifica que a página faz parte da chave e URLs sem q não têm chave"""
+        assert chave_consulta(f'{URL}&first=19').endswith('|first=19')
+        assert chave_consulta('https://www.bing.com/') is None
+
+
+class TestPackFileCacheStorage:
+    """Testes unitários para PackFileCacheStorage"""
+
+    def test_store_and_retrieve(self, tmp_path):
+        """Verifica que a resposta armazenada é recuperada com URL, status, headers e corpo"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request(URL), _resposta())
+
+        response = storage.retrieve_response(spider, Request(URL))
+        assert isinstance(response, HtmlResponse)
+        assert response.body == b'<html>academias</html>'
+        assert response.status == 200
+        assert response.url == URL
+        assert response.headers['Content-Type'] == b'text/html; charset=utf-8'
+        assert storage.retrieve_response(spider, Request(f'{URL}&first=19')) is None
+
+    def test_key_is_normalized_query(self, tmp_path):
+        """Verifica que outra URL para a mesma busca encontra a resposta"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request(URL), _resposta())
+        outra = Request('http://127.0.0.1:8765/maps?q=ACADEMIAS+em+Centro,+Porto+Alegre,+RS')
+        assert storage.retrieve_response(spider, outra).body == b'<html>academias</html>'
+
+    def test_non_search_requests_use_fingerprint(self, tmp_path):
+        """Verifica que requisições sem q usam o fingerprint do Scrapy"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request('https://example.com/a'), _resposta('https://example.com/a'))
+        assert storage.retrieve_response(spider, Request('https://example.com/a')) is not None
+        assert storage.retrieve_response(spider, Request('https://example.com/b')) is None
+
+    def test_blocked_responses_are_not_stored(self, tmp_path):
+        """Verifica que status de bloqueio e páginas de captcha não entram no cache"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request(URL), _resposta(status=429))
+        storage.store_response(spider, Request(f'{URL}&first=19'), _resposta(corpo=b'<html>b_captcha</html>'))
+        assert storage.retrieve_response(spider, Request(URL)) is None
+        assert storage.retrieve_response(spider, Request(f'{URL}&first=19')) is None
+        assert spider.crawler.stats.get_value('httpcache/not_stored/bloqueada') == 2
+
+        # Listagens na página: o marcador no corpo não indica bloqueio
+        storage.store_response(spider, Request(URL), _resposta(corpo=b'<a class="listings-item">b_captcha</a>'))
+        assert storage.retrieve_response(spider, Request(URL)) is not None
+
+    def test_error_and_truncated_responses_are_not_stored(self, tmp_path):
+        """Verifica que erros de RETRY_HTTP_CODES e páginas sem </html> não entram no cache"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request(URL), _resposta(corpo=b'indisponivel', status=503))
+        storage.store_response(spider, Request(f'{URL}&first=19'), _resposta(corpo=b'<html><body><div class="b_vList">'))
+        assert storage.retrieve_response(spider, Request(URL)) is None
+        assert storage.retrieve_response(spider, Request(f'{URL}&first=19')) is None
+        assert spider.crawler.stats.get_value('httpcache/not_stored/erro') == 1
+        assert spider.crawler.stats.get_value('httpcache/not_stored/truncada') == 1
+
+        # Busca completa sem listagens é um resultado legítimo
+        storage.store_response(spider, Request(URL), _resposta(corpo=b'<html><body></body></html>'))
+        assert storage.retrieve_response(spider, Request(URL)) is not None
+
+    def test_identical_bodies_stored_once(self, tmp_path):
+        """Verifica que corpos idênticos são gravados uma única vez (endereçados pelo conteúdo)"""
+        storage, spider = _storage(tmp_path)
+        corpo = b'<html>' + os.urandom(4096).hex().encode() + b'</html>'
+        storage.store_response(spider, Request(URL), _resposta(corpo=corpo))
+        tamanho = os.path.getsize(storage.caminho_pack)
+        storage.store_response(spider, Request(f'{URL}&first=19'), _resposta(corpo=corpo))
+        assert os.path.getsize(storage.caminho_pack) - tamanho < 1024
+        assert len(storage.corpos) == 1
+
+    def test_bodies_are_compressed(self, tmp_path):
+        """Verifica que o corpo é comprimido no pack"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request(URL), _resposta(corpo=b'<li>academia</li>' * 10000))
+        assert os.path.getsize(storage.caminho_pack) < 10000
+
+    def test_ttl_expiration(self, tmp_path, mocker):
+        """Verifica que entradas mais velhas que HTTPCACHE_EXPIRATION_SECS não são usadas"""
+        storage, spider = _storage(tmp_path, HTTPCACHE_EXPIRATION_SECS=60)
+        storage.store_response(spider, Request(URL), _resposta())
+        mocker.patch('lead_scraper.httpcache.time.time', return_value=time.time() + 120)
+        assert storage.retrieve_response(spider, Request(URL)) is None
+
+    def test_offline_mode_ignores_ttl(self, tmp_path, mocker):
+        """Verifica que no modo offline (HTTPCACHE_IGNORE_MISSING) o TTL não vale"""
+        storage, spider = _storage(tmp_path, HTTPCACHE_EXPIRATION_SECS=60, HTTPCACHE_IGNORE_MISSING=True)
+        storage.store_response(spider, Request(URL), _resposta())
+        mocker.patch('lead_scraper.httpcache.time.time', return_value=time.time() + 120)
+        assert storage.retrieve_response(spider, Request(URL)) is not None
+
+    def test_lru_eviction(self, tmp_path):
+        """Verifica que, acima de HTTPCACHE_PACK_MAX_BYTES, as entradas usadas há mais tempo saem"""
+        storage, spider = _storage(tmp_path, HTTPCACHE_PACK_MAX_BYTES=3500)
+        for i in range(3):
+            corpo = _corpo_aleatorio(800)
+            storage.store_response(spider, Request(f'{URL}&first={i}'), _resposta(corpo=corpo))
+        # Acessa a primeira: passa a ser a mais recente
+        assert storage.retrieve_response(spider, Request(f'{URL}&first=0')) is not None
+        storage.store_response(spider, Request(f'{URL}&first=3'), _resposta(corpo=_corpo_aleatorio(800)))
+
+        assert storage.retrieve_response(spider, Request(f'{URL}&first=1')) is None
+        assert storage.retrieve_response(spider, Request(f'{URL}&first=0')) is not None
+        assert storage.bytes_vivos <= 3500
+        storage.close_spider(spider)
+        assert spider.crawler.stats.get_value('httpcache/evicted') >= 1
+
+    def test_reopen_with_index(self, tmp_path):
+        """Verifica que uma nova execução reaproveita o pack pelo índice salvo"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request(URL), _resposta())
+        storage.close_spider(spider)
+        assert os.path.exists(storage.caminho_indice)
+
+        storage, spider = _storage(tmp_path)
+        assert storage.retrieve_response(spider, Request(URL)).body == b'<html>academias</html>'
+
+    def test_rebuilds_index_and_discards_partial_record(self, tmp_path):
+        """Verifica que, após uma interrupção, o índice é reconstruído e o registro incompleto descartado"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request(URL), _resposta())
+        storage.store_response(spider, Request(f'{URL}&first=19'), _resposta(corpo=b'<html>pagina 2</html>'))
+        storage._pack.close()  # sem close_spider: sem índice
+        with open(storage.caminho_pack, 'ab') as f:
+            f.write(b'LFPK\x01lixo')
+
+        storage, spider = _storage(tmp_path)
+        assert storage.retrieve_response(spider, Request(f'{URL}&first=19')).body == b'<html>pagina 2</html>'
+        storage.store_response(spider, Request(f'{URL}&first=37'), _resposta(corpo=b'<html>pagina 3</html>'))
+        storage.close_spider(spider)
+
+        storage, spider = _storage(tmp_path)
+        assert len(storage.entradas) == 3
+
+    def test_replacing_entry_keeps_latest(self, tmp_path):
+        """Verifica que regravar a mesma busca substitui a resposta anterior"""
+        storage, spider = _storage(tmp_path)
+        storage.store_response(spider, Request(URL), _resposta(corpo=b'<html>v1</html>'))
+        storage.store_response(spider, Request(URL), _resposta(corpo=b'<html>v2</html>'))
+        storage._pack.close()
+
+        storage, spider = _storage(tmp_path)
+        assert storage.retrieve_response(spider, Request(URL)).body == b'<html>v2</html>'
+        assert len(storage.corpos) == 1
+
+    def test_compaction(self, tmp_path):
+        """Verifica que o espaço morto é compactado ao fechar"""
+        storage, spider = _storage(tmp_path)
+        for i in range(3):
+            storage.store_response(spider, Request(URL), _resposta(corpo=_corpo_aleatorio(600 * 1024)))
+        storage.close_spider(spider)
+        assert os.path.getsize(storage.caminho_pack) < 700 * 1024
+
+        storage, spider = _storage(tmp_path)
+        assert len(storage.retrieve_response(spider, Request(URL)).body) == 600 * 1024 + 13
+
+    def test_stats(self, tmp_path):
+        """Verifica hit ratio e bytes economizados nas estatísticas"""
+        storage, spider = _storage(tmp_path)
+        stats = spider.crawler.stats
+        storage.store_response(spider, Request(URL), _resposta())
+        storage.retrieve_response(spider, Request(URL))
+        stats.inc_value('httpcache/hit')
+        stats.inc_value('httpcache/miss')
+        storage.close_spider(spider)
+
+        assert stats.get_value('httpcache/bytes_saved') == len(b'<html>academias</html>')
+        assert stats.get_value('httpcache/hit_ratio') == 0.5
+        assert stats.get_value('httpcache/pack_bytes') > 0
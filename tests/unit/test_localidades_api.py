@@ -1,7 +1,14 @@
 import pytest
 import requests
 from unittest.mock import patch, Mock
-from lead_scraper.utils.localidades_api import get_estados, get_cidades_por_estado
+from lead_scraper.utils import localidades_api
+from lead_scraper.utils.localidades_api import get_estados, get_cidades_por_estado, LocalidadesClient
+
+
+@pytest.fixture(autouse=True)
+def cliente_sem_disco(monkeypatch):
+    """Cliente padrão novo a cada teste, sem cache em disco"""
+    monkeypatch.setattr(localidades_api, '_cliente', LocalidadesClient(cache_dir=None))
 
 
 class TestGetEstados:
@@ -16,8 +23,8 @@ class TestGetEstados:
             {"id": 33, "sigla": "RJ", "nome": "Rio de Janeiro"}
         ]
         
-        # Simula a chamada requests.get
-        with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+        # Simula a chamada Session.get
+        with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.json.return_value = mock_estados
             mock_response.raise_for_status.return_value = None
@@ -28,7 +35,8 @@ class TestGetEstados:
             
             # Verifica que a API foi chamada com URL correto
             mock_get.assert_called_once_with(
-                "https://servicodados.ibge.gov.br/api/v1/localidades/estados"
+                "https://servicodados.ibge.gov.br/api/v1/localidades/estados",
+                headers={}, timeout=10
             )
             
             # Verifica o resultado
@@ -40,8 +48,8 @@ class TestGetEstados:
     
     def test_get_estados_api_error(self):
         """Verifica tratamento de erros para falhas de API"""
-        # Simula a chamada requests.get para lançar um erro HTTP
-        with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+        # Simula a chamada Session.get para lançar um erro HTTP
+        with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
                 "404 Client Error: Not Found"
@@ -68,8 +76,8 @@ class TestGetCidadesPorEstado:
             {"id": 4304606, "nome": "Caxias do Sul"}
         ]
         
-        # Simula a chamada requests.get
-        with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+        # Simula a chamada Session.get
+        with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.json.return_value = mock_cidades
             mock_response.raise_for_status.return_value = None
@@ -80,7 +88,8 @@ class TestGetCidadesPorEstado:
             
             # Verifica que a API foi chamada com URL correto
             mock_get.assert_called_once_with(
-                "https://servicodados.ibge.gov.br/api/v1/localidades/estados/RS/municipios"
+                "https://servicodados.ibge.gov.br/api/v1/localidades/estados/RS/municipios",
+                headers={}, timeout=10
             )
             
             # Verifica o resultado
@@ -92,8 +101,8 @@ class TestGetCidadesPorEstado:
     
     def test_get_cidades_por_estado_invalid_uf(self):
         """Verifica tratamento de erros para parâmetro UF inválido"""
-        # Simula a chamada requests.get para lançar um erro HTTP para UF inválido
-        with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+        # Simula a chamada Session.get para lançar um erro HTTP para UF inválido
+        with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
             mock_response = Mock()
             mock_response.raise_for_status.side_effect = requests.exceptions.HTTPError(
                 "404 Client Error: Not Found for url"
@@ -106,7 +115,8 @@ class TestGetCidadesPorEstado:
             
             # Verifica que a API foi chamada com o UF inválido
             mock_get.assert_called_once_with(
-                "https://servicodados.ibge.gov.br/api/v1/localidades/estados/INVALID/municipios"
+                "https://servicodados.ibge.gov.br/api/v1/localidades/estados/INVALID/municipios",
+                headers={}, timeout=10
             )
     
     def test_get_cidades_por_estado_different_states(self):
@@ -114,7 +124,7 @@ class TestGetCidadesPorEstado:
         states_to_test = ['SP', 'RJ', 'MG', 'BA']
         
         for uf in states_to_test:
-            with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+            with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
                 mock_response = Mock()
                 mock_response.json.return_value = [{"id": 1, "nome": f"Cidade de {uf}"}]
                 mock_response.raise_for_status.return_value = None
@@ -124,7 +134,7 @@ class TestGetCidadesPorEstado:
                 
                 # Verifica que URL correto foi chamado
                 expected_url = f"https://servicodados.ibge.gov.br/api/v1/localidades/estados/{uf}/municipios"
-                mock_get.assert_called_once_with(expected_url)
+                mock_get.assert_called_once_with(expected_url, headers={}, timeout=10)
                 
                 # Verifica resultado
                 assert len(result) == 1
@@ -136,8 +146,8 @@ class TestAPITimeoutHandling:
     
     def test_api_timeout_handling(self):
         """Verifica tratamento de erro de timeout"""
-        # Simula a chamada requests.get para lançar um erro de timeout
-        with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+        # Simula a chamada Session.get para lançar um erro de timeout
+        with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
             mock_get.side_effect = requests.exceptions.Timeout(
                 "Connection timeout"
             )
@@ -151,8 +161,8 @@ class TestAPITimeoutHandling:
     
     def test_get_cidades_timeout_handling(self):
         """Verifica tratamento de erro de timeout para get_cidades_por_estado"""
-        # Simula a chamada requests.get para lançar um erro de timeout
-        with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+        # Simula a chamada Session.get para lançar um erro de timeout
+        with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
             mock_get.side_effect = requests.exceptions.Timeout(
                 "Connection timeout"
             )
@@ -166,8 +176,8 @@ class TestAPITimeoutHandling:
     
     def test_connection_error_handling(self):
         """Verifica tratamento de erro de conexão"""
-        # Simula a chamada requests.get para lançar um erro de conexão
-        with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+        # Simula a chamada Session.get para lançar um erro de conexão
+        with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
             mock_get.side_effect = requests.exceptions.ConnectionError(
                 "Failed to establish connection"
             )
@@ -181,8 +191,8 @@ class TestAPITimeoutHandling:
     
     def test_request_exception_handling(self):
         """Verifica tratamento de exceção geral de requisição"""
-        # Simula a chamada requests.get para lançar uma exceção geral de requisição
-        with patch('lead_scraper.utils.localidades_api.requests.get') as mock_get:
+        # Simula a chamada Session.get para lançar uma exceção geral de requisição
+        with patch('lead_scraper.utils.localidades_api.requests.Session.get') as mock_get:
             mock_get.side_effect = requests.exceptions.RequestException(
                 "General request error"
             )
@@ -193,3 +203,186 @@ class TestAPITimeoutHandling:
             
             # Verifica que a API foi chamada
             mock_get.assert_called_once()
+
+
+def _resposta(dados, status_code=200, etag=None):
+    response = Mock()
+    response.status_code = status_code
+    response.headers = {'ETag': etag} if etag else {}
+    response.json.return_value = dados
+    if status_code >= 400:
+        response.raise_for_status.side_effect = requests.exceptions.HTTPError(f"HTTP {status_code}")
+    else:
+        response.raise_for_status.return_value = None
+    return response
+
+
+class TestLocalidadesClientCache:
+    """Testa os caches em memória e em disco do LocalidadesClient"""
+
+    ESTADOS = [{"id": 43, "sigla": "RS", "nome": "Rio Grande do Sul"}]
+
+    def test_repeated_lookup_hits_memory(self, tmp_path):
+        """Verifica que a segunda consulta não acessa a rede"""
+        session = Mock()
+        session.get.return_value = _resposta(self.ESTADOS)
+        cliente = LocalidadesClient(cache_dir=str(tmp_path), session=session)
+
+        assert cliente.estados() == self.ESTADOS
+        assert cliente.estados() == self.ESTADOS
+        assert session.get.call_count == 1
+        assert cliente.estatisticas() == {'hits': 1, 'misses': 1, 'revalidados': 0}
+
+    def test_disk_cache_shared_between_clients(self, tmp_path):
+        """Verifica que um novo cliente (nova execução) reaproveita o cache em disco"""
+        session = Mock()
+        session.get.return_value = _resposta(self.ESTADOS)
+        LocalidadesClient(cache_dir=str(tmp_path), session=session).estados()
+
+        outra_session = Mock()
+        cliente = LocalidadesClient(cache_dir=str(tmp_path), session=outra_session)
+        assert cliente.estados() == self.ESTADOS
+        outra_session.get.assert_not_called()
+        assert cliente.hits == 1
+
+    def test_expired_entry_revalidated_with_etag(self, tmp_path, mocker):
+        """Verifica que uma entrada vencida é revalidada com If-None-Match e 304 reaproveita os dados"""
+        session = Mock()
+        session.get.return_value = _resposta(self.ESTADOS, etag='"v1"')
+        cliente = LocalidadesClient(cache_dir=str(tmp_path), ttl=60, session=session)
+        relogio = mocker.patch('lead_scraper.utils.localidades_api.time.time', return_value=1000.0)
+        cliente.estados()
+
+        relogio.return_value = 1100.0
+        session.get.return_value = _resposta(None, status_code=304)
+        assert cliente.estados() == self.ESTADOS
+        _, kwargs = session.get.call_args
+        assert kwargs['headers'] == {'If-None-Match': '"v1"'}
+        assert cliente.revalidados == 1
+
+        # A revalidação renova o TTL
+        relogio.return_value = 1150.0
+        cliente.estados()
+        assert session.get.call_count == 2
+
+    def test_expired_entry_replaced_when_changed(self, tmp_path, mocker):
+        """Verifica que uma resposta 200 na revalidação substitui os dados"""
+        session = Mock()
+        session.get.return_value = _resposta(self.ESTADOS, etag='"v1"')
+        cliente = LocalidadesClient(cache_dir=str(tmp_path), ttl=60, session=session)
+        relogio = mocker.patch('lead_scraper.utils.localidades_api.time.time', return_value=1000.0)
+        cliente.estados()
+
+        novos = self.ESTADOS + [{"id": 35, "sigla": "SP", "nome": "São Paulo"}]
+        relogio.return_value = 1100.0
+        session.get.return_value = _resposta(novos, etag='"v2"')
+        assert cliente.estados() == novos
+        assert cliente.misses == 2
+
+    def test_stale_entry_used_when_network_fails(self, tmp_path, mocker):
+        """Verifica que, sem rede, uma entrada vencida é usada em vez de falhar"""
+        session = Mock()
+        session.get.return_value = _resposta(self.ESTADOS)
+        cliente = LocalidadesClient(cache_dir=str(tmp_path), ttl=60, session=session)
+        relogio = mocker.patch('lead_scraper.utils.localidades_api.time.time', return_value=1000.0)
+        cliente.estados()
+
+        relogio.return_value = 2000.0
+        session.get.side_effect = requests.exceptions.ConnectionError("sem rede")
+        assert cliente.estados() == self.ESTADOS
+
+    def test_errors_are_not_cached(self, tmp_path):
+        """Verifica que respostas de erro não são gravadas no cache"""
+        session = Mock()
+        session.get.return_value = _resposta(None, status_code=404)
+        cliente = LocalidadesClient(cache_dir=str(tmp_path), session=session)
+
+        with pytest.raises(requests.exceptions.HTTPError):
+            cliente.cidades_por_estado('XX')
+        assert list(tmp_path.iterdir()) == []
+
+    def test_lru_bounded(self, tmp_path):
+        """Verifica que o LRU em memória respeita o tamanho máximo"""
+        session = Mock()
+        session.get.return_value = _resposta([])
+        cliente = LocalidadesClient(cache_dir=None, lru_size=2, session=session)
+
+        for uf in ['RS', 'SC', 'PR']:
+            cliente.cidades_por_estado(uf)
+        assert len(cliente._lru) == 2
+        cliente.cidades_por_estado('RS')
+        assert session.get.call_count == 4
+
+
+class TestMockLocalidadesFixture:
+    """Testa o cliente padrão com a fixture mock_localidades_api"""
+
+    def test_module_functions_use_fixture(self, mock_localidades_api):
+        """Verifica estados e municípios pela fixture compartilhada"""
+        assert [e['sigla'] for e in get_estados()] == ['RS', 'SP']
+        assert [c['nome'] for c in get_cidades_por_estado('RS')] == ['Porto Alegre', 'Canoas']
+        get_estados()
+        assert localidades_api.get_cliente().hits == 1
+
+
+class TestIndiceMunicipios:
+    """Testa o índice de municípios em memória"""
+
+    MUNICIPIOS = [
+        (4314902, 'Porto Alegre', 'RS'),
+        (4304606, 'Canoas', 'RS'),
+        (4305108, 'Caxias do Sul', 'RS'),
+        (4302303, 'Bom Jesus', 'RS'),
+        (2201903, 'Bom Jesus', 'PI'),
+        (3550308, 'São Paulo', 'SP'),
+        (3548708, 'São Bernardo do Campo', 'SP'),
+    ]
+
+    def test_lookup_by_id_and_uf(self):
+        """Verifica consultas por id do IBGE e por UF"""
+        indice = localidades_api.IndiceMunicipios(self.MUNICIPIOS)
+        assert len(indice) == 7
+        assert indice.municipio(4314902).nome == 'Porto Alegre'
+        assert indice.municipio('4304606').nome == 'Canoas'
+        assert indice.municipio(1) is None
+        assert [m.nome for m in indice.da_uf('sp')] == ['São Paulo', 'São Bernardo do Campo']
+
+    def test_lookup_by_normalized_name(self):
+        """Verifica busca por nome sem acentos e sem distinção de caixa"""
+        indice = localidades_api.IndiceMunicipios(self.MUNICIPIOS)
+        assert indice.resolver('sao paulo', 'SP').nome == 'São Paulo'
+        assert indice.resolver('  SÃO   PAULO ', 'sp').id == 3550308
+        assert indice.resolver('São Paulo', 'RS') is None
+        assert {m.uf for m in indice.buscar('bom jesus')} == {'RS', 'PI'}
+        assert indice.buscar('bom jesus', 'PI') == [localidades_api.Municipio(2201903, 'Bom Jesus', 'PI')]
+
+    def test_prefix_search(self):
+        """Verifica a busca por prefixo, com filtro de UF e limite"""
+        indice = localidades_api.IndiceMunicipios(self.MUNICIPIOS)
+        assert [m.nome for m in indice.prefixo('sao')] == ['São Bernardo do Campo', 'São Paulo']
+        assert [m.nome for m in indice.prefixo('ca')] == ['Canoas', 'Caxias do Sul']
+        assert [m.uf for m in indice.prefixo('bom', uf='pi')] == ['PI']
+        assert len(indice.prefixo('', limite=3)) == 3
+        assert indice.prefixo('xyz') == []
+
+    def test_snapshot_roundtrip(self, tmp_path):
+        """Verifica que o snapshot salvo recria o mesmo índice"""
+        caminho = str(tmp_path / 'municipios.json.gz')
+        localidades_api.IndiceMunicipios(self.MUNICIPIOS).salvar(caminho)
+        indice = localidades_api.IndiceMunicipios.carregar(caminho)
+        assert sorted(indice.por_id.values()) == sorted(localidades_api.Municipio(*m) for m in self.MUNICIPIOS)
+
+    def test_bulk_loader_single_request(self, mock_localidades_api, tmp_path, mocker):
+        """Verifica que o índice é montado com uma única requisição e depois lido do snapshot"""
+        espiao = mocker.spy(requests.Session, 'get')
+        indice = localidades_api.get_indice_municipios()
+        assert indice.resolver('sao paulo', 'SP').id == 3550308
+        assert espiao.call_count == 1
+        assert 'view=nivelado' in espiao.call_args.args[1]
+        assert localidades_api.get_indice_municipios() is indice
+
+        # Novo processo: o snapshot evita a rede
+        localidades_api._indice = None
+        recarregado = localidades_api.get_indice_municipios()
+        assert espiao.call_count == 1
+        assert recarregado.resolver('Canoas', 'RS').id == 4304606
@@ -0,0 +1,138 @@
+import json
+import tracemalloc
+import pytest
+from unittest.mock import Mock
+from scrapy.exceptions import NotConfigured
+from scrapy.http import Request
+from scrapy.utils.test import get_crawler
+from lead_scraper import extensions
+from lead_scraper.extensions import MemoryMonitor
+from lead_scraper.items import LeadScraperItem
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+from lead_scraper.utils import memoria
+
+
+def _alocar(quantidade):
+    return [bytearray(1024) for _ in range(quantidade)]
+
+
+class TestUtilitariosMemoria:
+    """Testes unitários para os utilitários de memória"""
+
+    def test_live_objects_by_class(self):
+        """Verifica a contagem de Request e LeadScraperItem vivos pelo trackref do Scrapy"""
+        antes = memoria.contar_objetos()
+        objetos = [Request('https://www.bing.com/maps'), Request('https://www.bing.com/maps'), LeadScraperItem()]
+
+        depois = memoria.contar_objetos()
+
+        assert depois['Request'] - antes.get('Request', 0) == 2
+        assert depois['LeadScraperItem'] - antes.get('LeadScraperItem', 0) == 1
+        assert objetos
+
+    def test_package_and_short_location(self):
+        """Verifica o pacote e o local curto de arquivos de dependências, do projeto e da stdlib"""
+        dependencia = '/usr/lib/python3.11/site-packages/openpyxl/cell/_writer.py'
+        projeto = f'{memoria._PROJETO}/lead_scraper/lead_scraper/pipelines.py'
+
+        assert memoria.pacote(dependencia) == 'openpyxl'
+        assert memoria.pacote(projeto) == 'lead_scraper'
+        assert memoria.pacote('/usr/lib/python3.11/json/decoder.py') == 'stdlib'
+        assert memoria.local_curto(dependencia, 12) == 'openpyxl/cell/_writer.py:12'
+        assert memoria.local_curto(projeto, 5) == 'lead_scraper/lead_scraper/pipelines.py:5'
+
+    def test_growth_points_to_allocation_site(self):
+        """Verifica que o local que mais cresceu entre dois snapshots é o da alocação"""
+        tracemalloc.start(1)
+        try:
+            base = tracemalloc.take_snapshot().filter_traces(memoria.FILTROS)
+            blocos = _alocar(2000)
+            atual = tracemalloc.take_snapshot().filter_traces(memoria.FILTROS)
+        finally:
+            tracemalloc.stop()
+
+        maior = memoria.crescimento(atual, base, top=3)[0]
+
+        assert maior['local'].startswith('tests/unit/test_memoria.py:')
+        assert maior['kb'] >= 2000 and maior['blocos'] >= 2000
+        assert memoria.por_pacote(atual)['projeto'] >= 2
+        assert blocos
+
+    def test_least_squares_slope(self):
+        """Verifica a inclinação da reta de mínimos quadrados"""
+        assert memoria.inclinacao([(0, 100), (1, 102), (2, 104)]) == pytest.approx(2.0)
+        assert memoria.inclinacao([(0, 100), (1, 110), (2, 100)]) == pytest.approx(0.0)
+        assert memoria.inclinacao([(1, 100)]) is None
+        assert memoria.inclinacao([(1, 100), (1, 200)]) is None
+
+
+def _extensao(tmp_path, **settings):
+    crawler = get_crawler(BingMapsSpider, settings_dict={
+        'MEMORY_MONITOR_ENABLED': True, 'MEMORY_MONITOR_INTERVAL': 0, 'MEMORY_MONITOR_WARMUP': 0,
+        'MEMORY_MONITOR_FILE': str(tmp_path / 'memoria.ndjson'), **settings
+    })
+    crawler.stats.open_spider(None)
+    crawler.engine = Mock()
+    crawler.engine.slot.scheduler = [1, 2, 3]
+    return MemoryMonitor.from_crawler(crawler), crawler
+
+
+def _registros(tmp_path):
+    with open(tmp_path / 'memoria.ndjson', encoding='utf-8') as f:
+        return [json.loads(linha) for linha in f]
+
+
+class TestMemoryMonitor:
+    """Testes unitários para a extensão MemoryMonitor"""
+
+    def test_disabled_by_default(self):
+        """Verifica que a extensão não é carregada sem MEMORY_MONITOR_ENABLED"""
+        with pytest.raises(NotConfigured):
+            MemoryMonitor.from_crawler(get_crawler(BingMapsSpider))
+
+    def test_records_every_n_items(self, tmp_path):
+        """Verifica os registros a cada N itens com RSS, objetos, scheduler e os locais que cresceram"""
+        extensao, crawler = _extensao(tmp_path, MEMORY_MONITOR_ITEMS=2)
+        extensao.spider_opened(crawler.spider)
+        retidos = [Request('https://www.bing.com/maps')]
+        for _ in range(4):
+            retidos.append(_alocar(500))
+            extensao.item_scraped({}, crawler.spider)
+        extensao.spider_closed(crawler.spider, 'finished')
+
+        registros = _registros(tmp_path)
+        assert len(registros) == 3
+        assert registros[0]['rss_mb'] > 0 and registros[0]['scheduler'] == 3
+        assert registros[0]['objetos']['Request'] >= 1
+        assert any(c['local'].startswith('tests/unit/test_memoria.py:') for c in registros[0]['tracemalloc']['crescimento'])
+        assert crawler.stats.get_value('memoria/rss_mb_max') >= registros[0]['rss_mb']
+        assert not tracemalloc.is_tracing()
+
+    def test_without_tracemalloc(self, tmp_path):
+        """Verifica que MEMORY_MONITOR_TRACEMALLOC_FRAMES = 0 deixa só RSS e objetos"""
+        extensao, crawler = _extensao(tmp_path, MEMORY_MONITOR_TRACEMALLOC_FRAMES=0)
+        extensao.spider_opened(crawler.spider)
+        extensao.spider_closed(crawler.spider, 'finished')
+
+        registro = _registros(tmp_path)[0]
+        assert 'tracemalloc' not in registro and 'objetos' in registro
+        assert not tracemalloc.is_tracing()
+
+    def test_soak_closes_spider_when_growth_exceeds_limit(self, tmp_path, monkeypatch):
+        """Verifica que o modo soak fecha o spider quando o RSS cresce mais rápido que o limite, depois do aquecimento"""
+        extensao, crawler = _extensao(tmp_path, MEMORY_MONITOR_TRACEMALLOC_FRAMES=0, MEMORY_MONITOR_MAX_GROWTH=5.0)
+        relogio = iter(range(0, 600, 60))
+        monkeypatch.setattr(extensions.time, 'monotonic', lambda: next(relogio))
+        rss = iter([100.0, 101.0, 102.0, 115.0, 130.0, 140.0])
+        monkeypatch.setattr(memoria, 'rss_mb', lambda: next(rss))
+        extensao.spider_opened(crawler.spider)
+
+        for _ in range(3):
+            extensao.registrar()
+        crawler.engine.close_spider.assert_not_called()
+        for _ in range(2):
+            extensao.registrar()
+
+        crawler.engine.close_spider.assert_called_once_with(crawler.spider, 'memory_growth_exceeded')
+        extensao.spider_closed(crawler.spider, 'memory_growth_exceeded')
+        assert crawler.stats.get_value('memoria/crescimento_mb_por_minuto') > 5.0
@@ -0,0 +1,203 @@
+import json
+import pytest
+from unittest.mock import Mock
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.test import get_crawler
+from twisted.internet import defer
+from lead_scraper.extensions import StageMetrics, callback_medido
+from lead_scraper.middlewares import CallbackTimingMiddleware
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+from lead_scraper.utils.metricas import BUCKETS_FILA, Histograma, formatar_prometheus
+
+
+class TestHistograma:
+    """Testes unitários para o histograma de buckets fixos"""
+
+    def test_buckets_are_upper_bounds(self):
+        """Verifica que cada valor cai no primeiro bucket com limite maior ou igual, e acima de todos em +Inf"""
+        histograma = Histograma((1, 2, 4))
+        for valor in (0.5, 1, 1.5, 4, 9):
+            histograma.observar(valor)
+
+        assert histograma.contagens == [2, 1, 1, 1]
+        assert (histograma.total, histograma.soma) == (5, 16.0)
+
+    def test_quantile_interpolates_within_bucket(self):
+        """Verifica a estimativa de quantis por interpolação, como o histogram_quantile"""
+        histograma = Histograma((0.1, 0.2, 0.4))
+        for _ in range(50):
+            histograma.observar(0.05)
+        for _ in range(50):
+            histograma.observar(0.3)
+
+        assert histograma.quantil(0.5) == pytest.approx(0.1)
+        assert histograma.quantil(0.75) == pytest.approx(0.3)
+        assert histograma.quantil(0.99) == pytest.approx(0.396)
+        assert Histograma().quantil(0.5) is None
+
+    def test_interval_since_copy(self):
+        """Verifica que desde() isola as observações feitas depois da cópia"""
+        histograma = Histograma((1, 10))
+        histograma.observar(0.5)
+        anterior = histograma.copia()
+        histograma.observar(5)
+        histograma.observar(5)
+
+        intervalo = histograma.desde(anterior)
+
+        assert (intervalo.contagens, intervalo.total, intervalo.soma) == ([0, 2, 0], 2, 10.0)
+        assert histograma.total == 3
+
+    def test_prometheus_text_format(self):
+        """Verifica buckets cumulativos, _sum, _count e rótulos no formato de texto do Prometheus"""
+        histograma = Histograma((0.5, 1.0))
+        histograma.observar(0.2)
+        histograma.observar(3)
+
+        texto = formatar_prometheus([
+            ('x_segundos', 'histogram', 'Tempo', [({'pipeline': 'P'}, histograma)]),
+            ('x_total', 'counter', 'Total', [({}, 7)]),
+        ])
+
+        assert texto.splitlines() == [
+            '# HELP x_segundos Tempo',
+            '# TYPE x_segundos histogram',
+            'x_segundos_bucket{pipeline="P",le="0.5"} 1',
+            'x_segundos_bucket{pipeline="P",le="1.0"} 1',
+            'x_segundos_bucket{pipeline="P",le="+Inf"} 2',
+            'x_segundos_sum{pipeline="P"} 3.2',
+            'x_segundos_count{pipeline="P"} 2',
+            '# HELP x_total Total',
+            '# TYPE x_total counter',
+            'x_total 7',
+        ]
+
+
+class _Pipeline:
+    def __init__(self, resultado=None):
+        self.resultado = resultado
+
+    def process_item(self, item, spider):
+        return self.resultado if self.resultado is not None else item
+
+
+def _extensao(tmp_path, pipelines=(), **settings):
+    crawler = get_crawler(BingMapsSpider, settings_dict={
+        'METRICS_ENABLED': True, 'METRICS_HTTP_ENABLED': False, 'METRICS_SAMPLE_INTERVAL': 0,
+        'METRICS_SNAPSHOT_FILE': str(tmp_path / 'metricas.ndjson'), **settings
+    })
+    crawler.stats.open_spider(None)
+    crawler.engine = Mock()
+    crawler.engine.scraper.itemproc.middlewares = pipelines
+    crawler.engine.scraper.itemproc.methods = {'process_item': [p.process_item for p in pipelines]}
+    extensao = StageMetrics.from_crawler(crawler)
+    return extensao, crawler
+
+
+class TestStageMetrics:
+    """Testes unitários para a extensão StageMetrics"""
+
+    def test_disabled_by_default(self):
+        """Verifica que a extensão e o middleware não são carregados sem METRICS_ENABLED"""
+        with pytest.raises(NotConfigured):
+            StageMetrics.from_crawler(get_crawler(BingMapsSpider))
+        with pytest.raises(NotConfigured):
+            CallbackTimingMiddleware.from_crawler(get_crawler(BingMapsSpider))
+
+    def test_times_each_pipeline(self, tmp_path):
+        """Verifica que o process_item de cada pipeline é medido, inclusive quando retorna um Deferred"""
+        adiado = defer.Deferred()
+        extensao, crawler = _extensao(tmp_path, pipelines=(_Pipeline(), _Pipeline(adiado)))
+        extensao.spider_opened(crawler.spider)
+        metodos = crawler.engine.scraper.itemproc.methods['process_item']
+
+        assert metodos[0]({'nome': 'A'}, None) == {'nome': 'A'}
+        resultado = metodos[1]({'nome': 'A'}, None)
+        assert extensao.pipelines['_Pipeline'].total == 1
+        adiado.callback({'nome': 'A'})
+
+        assert resultado is adiado
+        assert extensao.pipelines['_Pipeline'].total == 2
+        extensao.spider_closed(crawler.spider, 'finished')
+
+    def test_pipeline_mismatch_is_skipped(self, tmp_path, caplog):
+        """Verifica que, se os métodos não casam com os pipelines, nada é envolvido em vez de medir o pipeline errado"""
+        extensao, crawler = _extensao(tmp_path, pipelines=(_Pipeline(),))
+        metodos = crawler.engine.scraper.itemproc.methods['process_item']
+        metodos.append(_Pipeline().process_item)
+        originais = list(metodos)
+
+        extensao.spider_opened(crawler.spider)
+
+        assert metodos == originais
+        assert extensao.pipelines == {}
+        assert '2 métodos process_item para 1 pipelines' in caplog.text
+        extensao.spider_closed(crawler.spider, 'finished')
+
+    def test_download_and_parse_histograms(self, tmp_path):
+        """Verifica que download_latency e o sinal callback_medido alimentam os histogramas"""
+        extensao, crawler = _extensao(tmp_path)
+        request = Request('https://www.bing.com/maps?q=a', meta={'download_latency': 0.3})
+        extensao.response_downloaded(Mock(), request, None)
+        crawler.signals.send_catch_log(signal=callback_medido, response=Mock(), segundos=0.02)
+
+        texto = extensao.prometheus()
+
+        assert 'lead_scraper_download_segundos_count 1' in texto
+        assert 'lead_scraper_parse_segundos_bucket{le="0.025"} 1' in texto
+
+    def test_queue_sampling(self, tmp_path):
+        """Verifica a amostragem das filas do scheduler, dos slots do downloader, do scraper e das pipelines"""
+        extensao, crawler = _extensao(tmp_path)
+        engine = crawler.engine
+        engine.slot.scheduler = [1, 2, 3]
+        engine.downloader.slots = {'a': Mock(queue=[1, 2]), 'b': Mock(queue=[3])}
+        engine.scraper.slot = Mock(queue=[1], active={2}, itemproc_size=5)
+        engine.downloader.active = {1, 2}
+
+        extensao.amostrar()
+
+        assert extensao.profundidade == {'scheduler': 3, 'downloader': 3, 'scraper': 2, 'pipelines': 5}
+        assert extensao.filas['pipelines'].contagens[BUCKETS_FILA.index(8)] == 1
+        assert 'lead_scraper_downloads_ativos 2' in extensao.prometheus()
+
+    def test_snapshots_cover_each_interval(self, tmp_path):
+        """Verifica que cada snapshot traz taxas e quantis só do intervalo e o fechamento vai para as stats"""
+        extensao, crawler = _extensao(tmp_path)
+        extensao.spider_opened(crawler.spider)
+        extensao.download.observar(0.1)
+        crawler.stats.set_value('downloader/response_count', 1)
+        extensao.gravar()
+        extensao.download.observar(2.0)
+        crawler.stats.set_value('downloader/response_count', 2)
+
+        extensao.spider_closed(crawler.spider, 'finished')
+
+        with open(tmp_path / 'metricas.ndjson', encoding='utf-8') as f:
+            snapshots = [json.loads(linha) for linha in f]
+        assert [s['respostas'] for s in snapshots] == [1, 2]
+        assert [s['etapas']['download']['total'] for s in snapshots] == [1, 1]
+        assert snapshots[1]['etapas']['download']['p50'] > 1.0
+        assert crawler.stats.get_value('metricas/download/p99') > 1.0
+
+
+class TestCallbackTimingMiddleware:
+    """Testes unitários para a medição do tempo no callback"""
+
+    def test_measures_time_inside_generator_only(self, mock_bing_html):
+        """Verifica que o sinal sai ao esgotar a saída, sem contar o tempo gasto fora do gerador"""
+        crawler = get_crawler(BingMapsSpider, settings_dict={'METRICS_ENABLED': True})
+        medidas = []
+        crawler.signals.connect(lambda response, segundos: medidas.append(segundos),
+                                signal=callback_medido, weak=False)
+        middleware = CallbackTimingMiddleware.from_crawler(crawler)
+        spider = BingMapsSpider(termo='academias')
+        request = Request('https://www.bing.com/maps?q=academias', meta={'bairro': None})
+        response = HtmlResponse(url=request.url, body=mock_bing_html, encoding='utf-8', request=request)
+
+        saida = middleware.process_spider_output(response, spider.parse(response), spider)
+        itens = list(saida)
+
+        assert itens and len(medidas) == 1
+        assert 0 < medidas[0] < 5
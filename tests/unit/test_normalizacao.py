@@ -0,0 +1,35 @@
+from lead_scraper.utils.normalizacao import normalizar_texto, chave_lead
+
+
+class TestNormalizarTexto:
+    """Testa a normalização de textos para comparação"""
+
+    def test_removes_accents_and_case(self):
+        """Verifica remoção de acentos e conversão para minúsculas"""
+        assert normalizar_texto('São José dos Campos') == 'sao jose dos campos'
+        assert normalizar_texto('AÇOUGUE') == 'acougue'
+
+    def test_collapses_whitespace(self):
+        """Verifica remoção de espaços nas bordas e colapso de espaços internos"""
+        assert normalizar_texto('  Moinhos   de\tVento ') == 'moinhos de vento'
+
+    def test_empty_values(self):
+        """Verifica que valores vazios ou None viram string vazia"""
+        assert normalizar_texto('') == ''
+        assert normalizar_texto(None) == ''
+
+
+class TestChaveLead:
+    """Testa a chave natural usada para deduplicar leads"""
+
+    def test_equivalent_leads_share_key(self):
+        """Verifica que variações de acento, caixa e pontuação geram a mesma chave"""
+        a = chave_lead('Academia Três Figueiras', 'Rua Carlos Huber, 547', 'Porto Alegre')
+        b = chave_lead('academia tres figueiras', 'Rua Carlos Huber 547', ' PORTO ALEGRE ')
+        assert a == b
+
+    def test_different_leads_have_different_keys(self):
+        """Verifica que leads distintos não colidem"""
+        a = chave_lead('Academia Um', 'Rua A, 1', 'Canoas')
+        b = chave_lead('Academia Um', 'Rua A, 1', 'Porto Alegre')
+        assert a != b
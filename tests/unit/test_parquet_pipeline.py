@@ -0,0 +1,124 @@
+import pytest
+from unittest.mock import Mock
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+from lead_scraper.items import LeadScraperItem
+
+pq = pytest.importorskip('pyarrow.parquet')
+
+from lead_scraper.extensions import checkpoint_gravando  # noqa: E402
+from lead_scraper.pipelines import ParquetExportPipeline, CAMPOS  # noqa: E402
+
+
+def _gerar_itens(quantidade):
+    for i in range(quantidade):
+        item = LeadScraperItem()
+        item['termo_busca'] = 'academias'
+        item['estado'] = 'RS' if i % 2 else 'SP'
+        item['cidade'] = 'Porto Alegre' if i % 2 else 'São Paulo'
+        item['bairro'] = f'Bairro {i % 3}'
+        item['nome'] = f'Academia {i}'
+        item['endereco'] = f'Rua da Conceição, {i}'
+        item['telefone'] = f'(51) 3333-{i:04d}'
+        item['website'] = f'https://academia{i}.com.br'
+        yield item
+
+
+class TestParquetExportPipeline:
+    """Testes unitários para ParquetExportPipeline"""
+
+    def test_writes_all_items(self, tmp_path):
+        """Verifica que todos os itens são gravados, inclusive o último batch incompleto"""
+        pipeline = ParquetExportPipeline(batch_size=4, results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        itens = list(_gerar_itens(10))
+        for item in itens:
+            assert pipeline.process_item(item, mock_spider) is item
+        pipeline.close_spider(mock_spider)
+
+        arquivos = list(tmp_path.glob('leads_*.parquet'))
+        assert len(arquivos) == 1
+
+        tabela = pq.read_table(arquivos[0])
+        assert tabela.column_names == CAMPOS
+        assert tabela.num_rows == 10
+        assert tabela.column('nome').to_pylist() == [item['nome'] for item in itens]
+        assert tabela.column('cidade').to_pylist()[:2] == ['São Paulo', 'Porto Alegre']
+
+    def test_writes_record_batches_as_row_groups(self, tmp_path):
+        """Verifica que cada batch vira um row group do arquivo"""
+        pipeline = ParquetExportPipeline(batch_size=4, results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in _gerar_itens(10):
+            pipeline.process_item(item, mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        metadata = pq.ParquetFile(pipeline.filepath).metadata
+        assert metadata.num_row_groups == 3
+        assert [metadata.row_group(i).num_rows for i in range(3)] == [4, 4, 2]
+
+    def test_low_cardinality_columns_are_dictionary_encoded(self, tmp_path):
+        """Verifica que estado, cidade e termo_busca são lidos como colunas de dicionário"""
+        import pyarrow
+
+        pipeline = ParquetExportPipeline(results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in _gerar_itens(6):
+            pipeline.process_item(item, mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        schema = pq.read_schema(pipeline.filepath)
+        for campo in ['termo_busca', 'estado', 'cidade']:
+            assert pyarrow.types.is_dictionary(schema.field(campo).type)
+        assert schema.field('nome').type == pyarrow.string()
+
+    def test_checkpoint_signal_writes_pending_batch(self, tmp_path):
+        """Verifica que o sinal checkpoint_gravando grava o batch incompleto como um row group"""
+        crawler = get_crawler(settings_dict={'PARQUET_EXPORT_BATCH_SIZE': 100, 'PARQUET_EXPORT_DIR': str(tmp_path)})
+        pipeline = ParquetExportPipeline.from_crawler(crawler)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in _gerar_itens(3):
+            pipeline.process_item(item, mock_spider)
+        crawler.signals.send_catch_log(signal=checkpoint_gravando)
+        assert pipeline.linhas == 3
+        for item in _gerar_itens(2):
+            pipeline.process_item(item, mock_spider)
+        pipeline.close_spider(mock_spider)
+        pipeline.sincronizar()
+
+        metadata = pq.ParquetFile(pipeline.filepath).metadata
+        assert metadata.num_row_groups == 2
+        assert metadata.num_rows == 5
+
+    def test_from_crawler_reads_settings(self, tmp_path):
+        """Verifica que batch, colunas de dicionário e pasta vêm das settings"""
+        crawler = get_crawler(settings_dict={
+            'PARQUET_EXPORT_BATCH_SIZE': 2,
+            'PARQUET_EXPORT_DICTIONARY_FIELDS': ['estado'],
+            'PARQUET_EXPORT_COMPRESSION': 'snappy',
+            'PARQUET_EXPORT_DIR': str(tmp_path),
+        })
+
+        pipeline = ParquetExportPipeline.from_crawler(crawler)
+
+        assert pipeline.batch_size == 2
+        assert pipeline.dictionary_fields == ['estado']
+        assert pipeline.compression == 'snappy'
+        pipeline.open_spider(Mock())
+        pipeline.close_spider(Mock())
+        assert pipeline.filepath.startswith(str(tmp_path))
+
+    def test_missing_pyarrow_disables_pipeline(self, monkeypatch):
+        """Verifica que sem pyarrow o pipeline é desativado com NotConfigured"""
+        monkeypatch.setattr('lead_scraper.pipelines.pyarrow', None)
+
+        with pytest.raises(NotConfigured):
+            ParquetExportPipeline()
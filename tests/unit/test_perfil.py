@@ -0,0 +1,185 @@
+import cProfile
+import pstats
+import time
+import pytest
+from collections import Counter
+from unittest.mock import Mock
+from scrapy.exceptions import NotConfigured
+from scrapy.http import HtmlResponse, Request
+from scrapy.utils.request import request_from_dict
+from scrapy.utils.test import get_crawler
+from lead_scraper.extensions import ProfilingHooks
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+from lead_scraper.utils.perfil import colapsar_pstats, formatar_colapsadas
+
+
+def _folha():
+    return sum(range(20000))
+
+
+def _meio():
+    return _folha() + _folha()
+
+
+def _raiz():
+    return _meio() + _folha()
+
+
+def _ocupar(segundos):
+    fim = time.perf_counter() + segundos
+    while time.perf_counter() < fim:
+        pass
+
+
+class TestPilhasColapsadas:
+    """Testes unitários para a conversão de perfis em pilhas colapsadas"""
+
+    def test_collapsed_format(self):
+        """Verifica o formato "a;b peso", sem pesos zerados e sem ';' dentro dos quadros"""
+        texto = formatar_colapsadas(Counter({('a', 'b'): 3, ('a',): 0, ('x;y',): 1}))
+
+        assert texto.splitlines() == ['a;b 3', 'x,y 1']
+        assert formatar_colapsadas(Counter()) == ''
+
+    def test_cprofile_call_graph_to_stacks(self):
+        """Verifica que o grafo do cProfile vira pilhas completas da raiz à folha, com o tempo em microssegundos"""
+        perfil = cProfile.Profile()
+        perfil.enable()
+        _raiz()
+        perfil.disable()
+        estatisticas = pstats.Stats(perfil).stats
+
+        pilhas = colapsar_pstats(estatisticas)
+
+        nomes = {tuple(quadro.split(' ')[0] for quadro in pilha) for pilha in pilhas}
+        assert ('_raiz', '_meio', '_folha') in nomes
+        assert ('_raiz', '_folha') in nomes
+        assert not any('_lsprof' in quadro for pilha in pilhas for quadro in pilha)
+        total = sum(valores[3] for funcao, valores in estatisticas.items() if funcao[2] == '_raiz')
+        assert sum(pilhas.values()) == pytest.approx(total * 1e6, rel=0.05)
+
+
+def _extensao(tmp_path, spider=None, pipelines=(), **settings):
+    crawler = get_crawler(BingMapsSpider, settings_dict={'PROFILE_DIR': str(tmp_path / 'perfis'), **settings})
+    crawler.spider = spider
+    crawler.stats.open_spider(None)
+    crawler.engine = Mock()
+    crawler.engine.scraper.itemproc.middlewares = pipelines
+    crawler.engine.scraper.itemproc.methods = {
+        'process_item': [p.process_item for p in pipelines],
+        'close_spider': [p.close_spider for p in reversed(pipelines)],
+    }
+    return ProfilingHooks.from_crawler(crawler), crawler
+
+
+class _Pipeline:
+    def __init__(self, segundos=0.0):
+        self.segundos = segundos
+        self.fechada = False
+
+    def process_item(self, item, spider):
+        _ocupar(self.segundos)
+        return item
+
+    def close_spider(self, spider):
+        self.fechada = True
+
+
+class _Exportacao(_Pipeline):
+    pass
+
+
+def _resposta(html):
+    request = Request('https://www.bing.com/maps?q=academias', meta={'bairro': None})
+    return HtmlResponse(url=request.url, body=html, encoding='utf-8', request=request)
+
+
+class TestProfilingHooks:
+    """Testes unitários para a extensão ProfilingHooks"""
+
+    def test_disabled_by_default(self, tmp_path):
+        """Verifica que a extensão não é carregada sem PROFILE_MODE nem -a profile"""
+        with pytest.raises(NotConfigured):
+            _extensao(tmp_path)
+
+    def test_spider_argument_and_invalid_values(self, tmp_path):
+        """Verifica -a profile=..., o atalho all e os erros de modo e motor"""
+        extensao, _ = _extensao(tmp_path, spider=BingMapsSpider(profile='callbacks'))
+        assert extensao.componentes == ('callbacks',)
+        extensao, _ = _extensao(tmp_path, PROFILE_MODE='all')
+        assert extensao.componentes == ('callbacks', 'pipelines')
+        with pytest.raises(ValueError, match='parser'):
+            _extensao(tmp_path, PROFILE_MODE='callbacks,parser')
+        with pytest.raises(ValueError, match='PROFILE_ENGINE'):
+            _extensao(tmp_path, PROFILE_MODE='callbacks', PROFILE_ENGINE='perf')
+
+    def test_profiles_one_response_in_every_n(self, tmp_path, mock_bing_html):
+        """Verifica que o parse é envolvido, só 1 resposta a cada N é perfilada e os arquivos saem no fechamento"""
+        spider = BingMapsSpider(termo='academias', profile='callbacks')
+        extensao, crawler = _extensao(tmp_path, spider=spider, PROFILE_EVERY=2)
+        extensao.spider_opened(spider)
+
+        itens = [list(spider.parse(_resposta(mock_bing_html))) for _ in range(3)]
+        extensao.spider_closed(spider, 'finished')
+
+        assert all(itens) and len({len(lista) for lista in itens}) == 1
+        assert crawler.stats.get_value('perfil/BingMapsSpider.parse/chamadas') == 3
+        assert crawler.stats.get_value('perfil/BingMapsSpider.parse/perfiladas') == 2
+        pasta = tmp_path / 'perfis'
+        assert pstats.Stats(str(pasta / 'BingMapsSpider.parse.prof')).total_calls > 0
+        linhas = (pasta / 'pilhas.collapsed').read_text(encoding='utf-8').splitlines()
+        assert linhas and all(linha.startswith('BingMapsSpider.parse;') for linha in linhas)
+        assert any(';parse (bing_maps_spider.py:' in linha for linha in linhas)
+
+    def test_callback_stays_serializable(self, tmp_path):
+        """Verifica que requisições com o parse envolvido continuam serializáveis para o JOBDIR"""
+        spider = BingMapsSpider(termo='academias', profile='callbacks')
+        extensao, _ = _extensao(tmp_path, spider=spider)
+        extensao.spider_opened(spider)
+        request = Request('https://www.bing.com/maps?q=academias', callback=spider.parse)
+
+        restaurada = request_from_dict(request.to_dict(spider=spider), spider=spider)
+
+        assert restaurada.callback == spider.parse
+
+    def test_already_wrapped_pipelines_keep_their_names(self, tmp_path):
+        """Verifica que métodos já envolvidos por outra extensão são perfilados com o nome do pipeline certo"""
+        primeira, segunda = _Pipeline(), _Exportacao()
+        extensao, crawler = _extensao(tmp_path, pipelines=(primeira, segunda), PROFILE_MODE='pipelines')
+        itemproc = crawler.engine.scraper.itemproc
+        for metodos in itemproc.methods.values():
+            for indice, metodo in enumerate(list(metodos)):
+                metodos[indice] = lambda *args, metodo=metodo: metodo(*args)
+        extensao.spider_opened(None)
+
+        for metodo in itemproc.methods['process_item']:
+            metodo({'nome': 'A'}, None)
+        for metodo in itemproc.methods['close_spider']:
+            metodo(None)
+        extensao.spider_closed(None, 'finished')
+
+        assert primeira.fechada and segunda.fechada
+        for componente in ('_Pipeline', '_Exportacao'):
+            assert crawler.stats.get_value(f'perfil/{componente}.process_item/chamadas') == 1
+            assert crawler.stats.get_value(f'perfil/{componente}.close_spider/chamadas') == 1
+
+    def test_pipelines_with_sampling(self, tmp_path):
+        """Verifica que process_item e close_spider são perfilados por amostragem, com a pilha a partir do componente"""
+        pipeline = _Pipeline(segundos=0.05)
+        extensao, crawler = _extensao(tmp_path, pipelines=(pipeline,), PROFILE_MODE='pipelines',
+                                      PROFILE_ENGINE='sampling', PROFILE_SAMPLE_INTERVAL=0.001)
+        extensao.spider_opened(None)
+        itemproc = crawler.engine.scraper.itemproc
+
+        for _ in range(4):
+            assert itemproc.methods['process_item'][0]({'nome': 'A'}, None) == {'nome': 'A'}
+        itemproc.methods['close_spider'][0](None)
+        extensao.spider_closed(None, 'finished')
+
+        assert pipeline.fechada
+        assert crawler.stats.get_value('perfil/_Pipeline.process_item/perfiladas') == 4
+        assert crawler.stats.get_value('perfil/_Pipeline.close_spider/chamadas') == 1
+        linhas = (tmp_path / 'perfis' / '_Pipeline.process_item.collapsed').read_text(encoding='utf-8').splitlines()
+        assert any(linha.startswith('process_item (test_perfil.py:') and '_ocupar' in linha for linha in linhas)
+        assert (tmp_path / 'perfis' / 'pilhas.collapsed').read_text(encoding='utf-8').startswith('_Pipeline.')
+        assert not extensao.amostrador.is_alive()
@@ -3,7 +3,8 @@ import os
 import openpyxl
 from datetime import datetime
 from unittest.mock import Mock, patch
-from lead_scraper.pipelines import ExcelExportPipeline
+from scrapy.utils.test import get_crawler
+from lead_scraper.pipelines import ExcelExportPipeline, recuperar_exportacao_parcial
 from lead_scraper.items import LeadScraperItem
 
 
@@ -222,3 +223,218 @@ class TestExcelExportPipeline:
             assert data_row[6] == '(51) 3333-4444'
             
             workbook.close()
+
+
+class TestExcelExportPipelineStreaming:
+    """Testes unitários do modo streaming do ExcelExportPipeline"""
+
+    def test_streaming_writes_readable_file(self, tmp_path, sample_lead_item):
+        """Verifica que o arquivo gerado em streaming é um Excel válido com cabeçalhos e dados"""
+        pipeline = ExcelExportPipeline(streaming=True, results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        result = pipeline.process_item(sample_lead_item, mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        assert result == sample_lead_item
+
+        excel_files = list(tmp_path.glob('leads_*.xlsx'))
+        assert len(excel_files) == 1
+
+        workbook = openpyxl.load_workbook(excel_files[0])
+        assert "Resultados" in workbook.sheetnames
+        rows = list(workbook["Resultados"].iter_rows(values_only=True))
+        assert list(rows[0]) == [
+            "Termo", "Estado", "Cidade", "Bairro",
+            "Nome", "Endereço", "Telefone", "Website"
+        ]
+        assert rows[1][4] == 'Academia Fitness Plus'
+        assert rows[1][6] == '(51) 3333-4444'
+        workbook.close()
+
+    def test_streaming_preserves_unicode_and_special_characters(self, tmp_path, sample_lead_item):
+        """Verifica acentos, caracteres XML reservados e espaços nas bordas"""
+        pipeline = ExcelExportPipeline(streaming=True, results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        sample_lead_item['nome'] = 'Açougue <Pai & Filho> "João"'
+        sample_lead_item['endereco'] = '  Rua da Conceição, 123  '
+
+        pipeline.open_spider(mock_spider)
+        pipeline.process_item(sample_lead_item, mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        workbook = openpyxl.load_workbook(list(tmp_path.glob('leads_*.xlsx'))[0])
+        row = [cell.value for cell in workbook.active[2]]
+        assert row[4] == 'Açougue <Pai & Filho> "João"'
+        assert row[5] == '  Rua da Conceição, 123  '
+        workbook.close()
+
+    def test_streaming_removes_journal_on_success(self, tmp_path, sample_lead_item):
+        """Verifica que o journal de recuperação é removido após o fechamento normal"""
+        pipeline = ExcelExportPipeline(streaming=True, results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        assert os.path.exists(pipeline.journal_path)
+        pipeline.process_item(sample_lead_item, mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        assert not os.path.exists(pipeline.journal_path)
+        assert list(tmp_path.glob('*.parcial.csv')) == []
+
+    def test_streaming_journal_recovers_interrupted_run(self, tmp_path):
+        """Verifica que as linhas já escritas podem ser recuperadas se o processo morrer"""
+        pipeline = ExcelExportPipeline(streaming=True, results_folder=str(tmp_path), journal_flush_items=1)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for i in range(3):
+            item = LeadScraperItem()
+            for campo in ['termo_busca', 'estado', 'cidade', 'bairro', 'endereco', 'telefone', 'website']:
+                item[campo] = f'{campo}_{i}'
+            item['nome'] = f'Nome_{i}'
+            pipeline.process_item(item, mock_spider)
+
+        # Simula interrupção: close_spider nunca é chamado
+        recuperado = recuperar_exportacao_parcial(pipeline.journal_path)
+
+        workbook = openpyxl.load_workbook(recuperado)
+        rows = list(workbook.active.iter_rows(values_only=True))
+        assert len(rows) == 4  # 1 cabeçalho + 3 itens
+        assert [row[4] for row in rows[1:]] == ['Nome_0', 'Nome_1', 'Nome_2']
+        workbook.close()
+
+    def test_from_crawler_reads_settings(self, tmp_path):
+        """Verifica que o modo streaming é configurável pelas settings"""
+        crawler = get_crawler(settings_dict={
+            'EXCEL_EXPORT_STREAMING': True,
+            'EXCEL_EXPORT_JOURNAL': False,
+            'EXCEL_EXPORT_DIR': str(tmp_path),
+        })
+
+        pipeline = ExcelExportPipeline.from_crawler(crawler)
+        pipeline.open_spider(Mock())
+        pipeline.close_spider(Mock())
+
+        assert pipeline.streaming is True
+        assert pipeline.journal_path is None
+        assert len(list(tmp_path.glob('leads_*.xlsx'))) == 1
+
+
+class TestExcelExportPipelineSharding:
+    """Testes unitários do rollover em partes e do manifesto"""
+
+    def _gerar_itens(self, quantidade):
+        for i in range(quantidade):
+            item = LeadScraperItem()
+            for campo in ['termo_busca', 'estado', 'cidade', 'bairro', 'endereco', 'telefone', 'website']:
+                item[campo] = f'{campo}_{i}'
+            item['nome'] = f'Nome_{i}'
+            yield item
+
+    def test_rollover_by_row_count(self, tmp_path):
+        """Verifica que a saída é dividida em partes com no máximo max_rows linhas"""
+        pipeline = ExcelExportPipeline(results_folder=str(tmp_path), max_rows=2)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in self._gerar_itens(5):
+            pipeline.process_item(item, mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        partes = sorted(tmp_path.glob('leads_*_part*.xlsx'))
+        assert [p.name[-13:] for p in partes] == ['part0001.xlsx', 'part0002.xlsx', 'part0003.xlsx']
+
+        nomes = []
+        for parte in partes:
+            workbook = openpyxl.load_workbook(parte)
+            rows = list(workbook.active.iter_rows(values_only=True))
+            assert list(rows[0])[0] == "Termo"
+            nomes.extend(row[4] for row in rows[1:])
+            workbook.close()
+        assert nomes == [f'Nome_{i}' for i in range(5)]
+
+        # Nenhum journal de recuperação deve sobrar
+        assert list(tmp_path.glob('*.parcial.csv')) == []
+
+    def test_manifest_lists_parts_with_checksums(self, tmp_path):
+        """Verifica o manifesto JSON com partes, contagem de linhas e sha256"""
+        import hashlib
+        import json
+
+        pipeline = ExcelExportPipeline(results_folder=str(tmp_path), max_rows=3)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in self._gerar_itens(7):
+            pipeline.process_item(item, mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        manifests = list(tmp_path.glob('leads_*_manifest.json'))
+        assert len(manifests) == 1
+        with open(manifests[0], encoding='utf-8') as f:
+            manifesto = json.load(f)
+
+        assert manifesto['completo'] is True
+        assert manifesto['total_linhas'] == 7
+        assert [parte['linhas'] for parte in manifesto['partes']] == [3, 3, 1]
+        for parte in manifesto['partes']:
+            conteudo = (tmp_path / parte['arquivo']).read_bytes()
+            assert parte['sha256'] == hashlib.sha256(conteudo).hexdigest()
+            assert parte['bytes'] == len(conteudo)
+
+    def test_part_is_closed_as_soon_as_full(self, tmp_path):
+        """Verifica que uma parte cheia já está fechada e listada antes do fim da execução"""
+        import json
+
+        pipeline = ExcelExportPipeline(results_folder=str(tmp_path), max_rows=2)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in self._gerar_itens(3):
+            pipeline.process_item(item, mock_spider)
+
+        # Primeira parte já pode ser lida enquanto a execução continua
+        primeira = tmp_path / pipeline.partes[0]['arquivo']
+        workbook = openpyxl.load_workbook(primeira)
+        assert workbook.active.max_row == 3
+        workbook.close()
+
+        with open(pipeline.manifest_path, encoding='utf-8') as f:
+            manifesto = json.load(f)
+        assert manifesto['completo'] is False
+        assert len(manifesto['partes']) == 1
+
+        pipeline.close_spider(mock_spider)
+
+    def test_rollover_by_byte_size(self, tmp_path):
+        """Verifica que o limite em bytes também gera novas partes"""
+        pipeline = ExcelExportPipeline(results_folder=str(tmp_path), max_bytes=1)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in self._gerar_itens(3):
+            pipeline.process_item(item, mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        assert len(pipeline.partes) == 3
+        assert all(parte['linhas'] == 1 for parte in pipeline.partes)
+
+    def test_streaming_splits_at_excel_row_limit(self, tmp_path):
+        """Verifica que o streaming sem rollover divide a saída ao atingir o limite do Excel"""
+        pipeline = ExcelExportPipeline(streaming=True, results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        with patch('lead_scraper.pipelines.EXCEL_MAX_LINHAS', 3):
+            pipeline.open_spider(mock_spider)
+            for item in self._gerar_itens(5):
+                pipeline.process_item(item, mock_spider)
+            pipeline.close_spider(mock_spider)
+
+        partes = sorted(p.name for p in tmp_path.glob('leads_*.xlsx'))
+        assert len(partes) == 3
+        assert all('_part' in nome for nome in partes)
+        assert [parte['linhas'] for parte in pipeline.partes] == [2, 2, 1]
+        assert len(list(tmp_path.glob('leads_*_manifest.json'))) == 1
@@ -0,0 +1,139 @@
+import json
+import openpyxl
+from scrapy.http import HtmlResponse, Request
+from lead_scraper.run import Consulta, chave, dividir_plano, mesclar, montar_plano, shard_da_consulta
+from lead_scraper.spiders.bing_maps_spider import BingMapsSpider
+from lead_scraper.utils.normalizacao import chave_consulta
+
+
+def _lead(nome, cidade='Canoas', termo='academias'):
+    return {'termo_busca': termo, 'estado': 'RS', 'cidade': cidade, 'bairro': 'Centro', 'nome': nome,
+            'endereco': f'Rua {nome}, 1', 'telefone': '', 'website': ''}
+
+
+def _ndjson(caminho, leads):
+    with open(caminho, 'w', encoding='utf-8') as f:
+        for lead in leads:
+            f.write(json.dumps(lead, ensure_ascii=False) + '\n')
+    return str(caminho)
+
+
+class TestPlano:
+    """Testes unitários para a montagem e a divisão do plano de consultas"""
+
+    def test_crosses_terms_cities_and_bairros(self):
+        """Verifica que o plano cruza termos x cidades x bairros"""
+        plano = montar_plano(['academias', 'padarias'], 'RS', ['Canoas', 'Esteio'], ['Centro', 'Niterói'])
+
+        assert len(plano) == 8
+        assert plano[0] == Consulta('academias', 'RS', 'Canoas', 'Centro')
+        assert plano[-1] == Consulta('padarias', 'RS', 'Esteio', 'Niterói')
+
+    def test_equivalent_queries_enter_once(self):
+        """Verifica que consultas iguais após a normalização entram uma vez só"""
+        plano = montar_plano(['academias', 'Academias'], 'RS', ['Canoas'], ['Centro', 'centro', 'Cêntro'])
+
+        assert plano == [Consulta('academias', 'RS', 'Canoas', 'Centro')]
+
+    def test_fan_out_uses_municipality_index(self, mock_localidades_api):
+        """Verifica que cidade '*' expande pelo índice de municípios, como no spider"""
+        plano = montar_plano(['academias'], 'RS', ['*'])
+
+        assert [(c.estado, c.cidade) for c in plano] == [('RS', 'Porto Alegre'), ('RS', 'Canoas')]
+
+    def test_key_matches_spider_url(self):
+        """Verifica que a chave da consulta é a mesma usada pelo fingerprint e pelo checkpoint"""
+        consulta = Consulta('Academias', 'RS', 'Canoas', 'Niterói')
+        url = BingMapsSpider()._url(*consulta)
+
+        assert chave(consulta) == chave_consulta(url)
+
+    def test_sharding_is_deterministic_and_complete(self):
+        """Verifica que a divisão é estável, cobre o plano e mantém consultas equivalentes juntas"""
+        plano = montar_plano(['academias', 'padarias', 'bares'], 'RS', ['Canoas', 'Esteio'],
+                             [f'Bairro {i}' for i in range(20)])
+
+        divisao = dividir_plano(plano, 4)
+
+        assert divisao == dividir_plano(plano, 4)
+        assert sorted(c for shard in divisao for c in shard) == sorted(plano)
+        assert all(len(shard) > 20 for shard in divisao)
+        equivalente = Consulta('ACADEMIAS', 'rs', 'canoas', 'bairro  3')
+        assert shard_da_consulta(Consulta('academias', 'RS', 'Canoas', 'Bairro 3'), 4) == shard_da_consulta(equivalente, 4)
+
+
+class TestMesclar:
+    """Testes unitários para a mescla das saídas dos shards"""
+
+    def test_merges_without_duplicates(self, tmp_path):
+        """Verifica que leads repetidos entre shards aparecem uma vez só na planilha"""
+        shard_0 = _ndjson(tmp_path / 's0.ndjson', [_lead('A'), _lead('B')])
+        shard_1 = _ndjson(tmp_path / 's1.ndjson', [_lead('b'), _lead('C'), _lead('A', cidade='Esteio')])
+        destino = str(tmp_path / 'leads.xlsx')
+
+        arquivos, linhas, duplicados = mesclar([shard_0, shard_1, str(tmp_path / 'ausente.ndjson')], destino)
+
+        assert arquivos == [destino]
+        assert (linhas, duplicados) == (4, 1)
+        planilha = openpyxl.load_workbook(destino).active
+        assert [linha[4] for linha in planilha.iter_rows(min_row=2, values_only=True)] == ['A', 'B', 'C', 'A']
+
+    def test_ndjson_output(self, tmp_path):
+        """Verifica a mescla em NDJSON"""
+        shard_0 = _ndjson(tmp_path / 's0.ndjson', [_lead('A'), _lead('A')])
+        destino = str(tmp_path / 'leads.ndjson')
+
+        arquivos, linhas, duplicados = mesclar([shard_0], destino, formato='ndjson')
+
+        with open(destino, encoding='utf-8') as f:
+            assert [json.loads(linha)['nome'] for linha in f] == ['A']
+        assert (arquivos, linhas, duplicados) == ([destino], 1, 1)
+
+    def test_splits_xlsx_above_row_limit(self, tmp_path):
+        """Verifica que a planilha é dividida em partes acima do limite de linhas"""
+        shard_0 = _ndjson(tmp_path / 's0.ndjson', [_lead(f'L{i}') for i in range(5)])
+
+        arquivos, linhas, _ = mesclar([shard_0], str(tmp_path / 'leads.xlsx'), max_linhas=2)
+
+        assert [a.rsplit('/', 1)[-1] for a in arquivos] == [
+            'leads_part0001.xlsx', 'leads_part0002.xlsx', 'leads_part0003.xlsx'
+        ]
+        assert [openpyxl.load_workbook(a).active.max_row - 1 for a in arquivos] == [2, 2, 1]
+        assert not (tmp_path / 'leads.xlsx').exists()
+
+    def test_empty_merge_writes_header(self, tmp_path):
+        """Verifica que, sem leads, a planilha é criada só com o cabeçalho"""
+        destino = str(tmp_path / 'leads.xlsx')
+
+        assert mesclar([], destino) == ([destino], 0, 0)
+        assert openpyxl.load_workbook(destino).active.max_row == 1
+
+
+class TestSpiderPlano:
+    """Testes unitários para o spider executando um plano de consultas"""
+
+    def test_start_requests_follow_plan(self, tmp_path):
+        """Verifica que, com plano, o spider busca as consultas do arquivo em vez de termo/cidade/bairros"""
+        plano = tmp_path / 'plano.jsonl'
+        plano.write_text('["academias", "RS", "Canoas", "Centro"]\n["padarias", "SC", "Joinville", ""]\n',
+                         encoding='utf-8')
+        spider = BingMapsSpider(termo='ignorado', plano=str(plano))
+
+        requests = list(spider.start_requests())
+
+        assert [r.meta for r in requests] == [
+            {'termo': 'academias', 'bairro': 'Centro', 'estado': 'RS', 'cidade': 'Canoas'},
+            {'termo': 'padarias', 'bairro': None, 'estado': 'SC', 'cidade': 'Joinville'},
+        ]
+        assert 'padarias%20em%20Joinville%2C%20SC' in requests[1].url
+
+    def test_items_tagged_with_request_term(self, mock_bing_html):
+        """Verifica que os itens levam o termo da consulta que os encontrou"""
+        spider = BingMapsSpider(termo='academias')
+        request = Request('https://www.bing.com/maps?q=padarias',
+                          meta={'termo': 'padarias', 'bairro': None, 'estado': 'RS', 'cidade': 'Canoas'})
+        response = HtmlResponse(url=request.url, body=mock_bing_html, encoding='utf-8', request=request)
+
+        itens = list(spider.parse(response))
+
+        assert itens and all(item['termo_busca'] == 'padarias' for item in itens)
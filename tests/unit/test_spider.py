@@ -93,6 +93,42 @@ class TestStartRequests:
         assert requests[2].meta['bairro'] == 'Bela Vista'
 
 
+class TestMultiplosTermos:
+    """Testa vários termos na mesma execução"""
+
+    def test_terms_from_list_and_file(self, tmp_path):
+        """Verifica que termo, termos e termos_arquivo são somados, sem repetições após a normalização"""
+        arquivo = tmp_path / 'termos.txt'
+        arquivo.write_text('# categorias\npadarias\n\nfarmácias\nACADEMIAS\n', encoding='utf-8')
+
+        spider = BingMapsSpider(termo='academias', termos='cafés, Padarias', termos_arquivo=str(arquivo))
+
+        assert spider.termos == ['academias', 'cafés', 'Padarias', 'farmácias']
+        assert spider.termo == 'academias'
+
+    def test_terms_are_interleaved(self):
+        """Verifica que os termos se alternam por bairro, em vez de um termo inteiro depois do outro"""
+        spider = BingMapsSpider(termos='academias,padarias', cidade='Canoas', bairros='Centro,Niterói')
+
+        requests = list(spider.start_requests())
+
+        assert [(r.meta['termo'], r.meta['bairro']) for r in requests] == [
+            ('academias', 'Centro'), ('padarias', 'Centro'), ('academias', 'Niterói'), ('padarias', 'Niterói'),
+        ]
+        assert 'padarias%20em%20Centro%2C%20Canoas' in requests[1].url
+
+    def test_items_tagged_with_each_term(self, mock_bing_html):
+        """Verifica que os itens de cada consulta levam o termo dela em termo_busca"""
+        spider = BingMapsSpider(termos='academias,padarias', cidade='Canoas')
+
+        termos = set()
+        for request in spider.start_requests():
+            response = HtmlResponse(url=request.url, body=mock_bing_html, encoding='utf-8', request=request)
+            termos |= {item['termo_busca'] for item in spider.parse(response) if isinstance(item, LeadScraperItem)}
+
+        assert termos == {'academias', 'padarias'}
+
+
 class TestParse:
     """Testa parsing e extração de dados de respostas HTML"""
     
@@ -339,3 +375,186 @@ class TestParse:
         
         assert len(items) == 1
         assert items[0]['bairro'] == 'Não especificado'
+
+
+class TestFanOut:
+    """Testa o modo fan-out com estado='*' ou cidade='*'"""
+
+    def test_fan_out_all_cities_of_state(self, mock_localidades_api):
+        """Verifica que cidade='*' gera uma requisição por município da UF"""
+        spider = BingMapsSpider(termo='academias', estado='RS', cidade='*')
+
+        requests = list(spider.start_requests())
+
+        assert [(r.meta['estado'], r.meta['cidade']) for r in requests] == [
+            ('RS', 'Porto Alegre'), ('RS', 'Canoas')
+        ]
+        assert 'Canoas%2C%20RS' in requests[1].url
+        assert all(r.meta['bairro'] is None for r in requests)
+
+    def test_fan_out_whole_country_with_bairros(self, mock_localidades_api):
+        """Verifica que estado='*' e cidade='*' cruzam todos os municípios com os bairros"""
+        spider = BingMapsSpider(termo='academias', estado='*', cidade='*', bairros='Centro,Norte')
+
+        requests = list(spider.start_requests())
+
+        assert len(requests) == 6
+        assert {r.meta['estado'] for r in requests} == {'RS', 'SP'}
+        assert requests[0].meta == {'termo': 'academias', 'bairro': 'Centro', 'estado': 'RS', 'cidade': 'Porto Alegre'}
+        assert 'Centro%2C%20Porto%20Alegre%2C%20RS' in requests[0].url
+
+    def test_fan_out_city_in_every_state(self, mock_localidades_api):
+        """Verifica que estado='*' com cidade específica busca a cidade em todas as UFs"""
+        spider = BingMapsSpider(termo='academias', estado='*', cidade='sao paulo')
+
+        requests = list(spider.start_requests())
+
+        assert len(requests) == 1
+        assert requests[0].meta['cidade'] == 'São Paulo'
+        assert requests[0].meta['estado'] == 'SP'
+
+    def test_fan_out_is_lazy(self, mock_localidades_api):
+        """Verifica que as requisições são geradas sob demanda"""
+        spider = BingMapsSpider(termo='academias', estado='*', cidade='*')
+
+        requests = spider.start_requests()
+
+        assert next(requests).meta['cidade'] == 'Porto Alegre'
+
+    def test_parse_uses_location_from_meta(self, mock_response):
+        """Verifica que os itens recebem estado e cidade da requisição do fan-out"""
+        spider = BingMapsSpider(termo='academias', estado='*', cidade='*')
+        mock_response.meta.update({'bairro': None, 'estado': 'SP', 'cidade': 'São Paulo'})
+
+        items = list(spider.parse(mock_response))
+
+        assert items
+        assert all(item['estado'] == 'SP' and item['cidade'] == 'São Paulo' for item in items)
+
+
+class TestPaginacao:
+    """Testa a paginação com janelas de páginas simultâneas"""
+
+    URL = 'https://www.bing.com/maps?q=academias%20em%20Porto%20Alegre%2C%20RS'
+
+    def _spider(self, max_paginas=4, janela=2):
+        from scrapy.utils.test import get_crawler
+        crawler = get_crawler(BingMapsSpider, settings_dict={
+            'BING_MAX_PAGES': max_paginas, 'BING_PAGINATION_WINDOW': janela
+        })
+        crawler.stats.open_spider(None)
+        return BingMapsSpider.from_crawler(crawler, termo='academias')
+
+    def _resposta(self, html, request):
+        return HtmlResponse(url=request.url, request=request, body=html.encode('utf-8'), encoding='utf-8')
+
+    def _separar(self, resultados):
+        itens = [r for r in resultados if isinstance(r, LeadScraperItem)]
+        requests = [r for r in resultados if isinstance(r, Request)]
+        return itens, requests
+
+    def _pagina(self, mock_bing_html, prefixo, ultima=False):
+        """Fixture com ids (e nomes) trocados, simulando outra página de resultados"""
+        html = mock_bing_html.replace('ypid:', f'ypid:{prefixo}-')
+        if ultima:
+            html = html.replace('aria-label="Próxima Página" style=""', 'aria-label="Próxima Página" style="display: none;"')
+        return html
+
+    def test_disabled_by_default(self, mock_response):
+        """Verifica que sem BING_MAX_PAGES apenas a primeira página é lida"""
+        spider = BingMapsSpider(termo='academias')
+        mock_response.meta['bairro'] = None
+        itens, requests = self._separar(list(spider.parse(mock_response)))
+        assert len(itens) == 18
+        assert requests == []
+
+    def test_first_page_schedules_window(self, mock_bing_html):
+        """Verifica que a primeira página agenda a janela de páginas seguintes de uma vez"""
+        spider = self._spider()
+        request = Request(self.URL, meta={'bairro': 'Centro', 'estado': 'RS', 'cidade': 'Porto Alegre'})
+        itens, requests = self._separar(list(spider.parse(self._resposta(mock_bing_html, request))))
+
+        assert len(itens) == 18
+        assert [r.url for r in requests] == [f'{self.URL}&first=19', f'{self.URL}&first=37']
+        assert [r.meta['pagina'] for r in requests] == [2, 3]
+        assert requests[0].meta['bairro'] == 'Centro'
+        assert requests[0].meta['consulta'] == self.URL
+
+    def test_stops_when_page_has_no_new_entities(self, mock_bing_html):
+        """Verifica que uma página repetida encerra a paginação da consulta"""
+        spider = self._spider()
+        primeira = Request(self.URL, meta={'bairro': None})
+        _, requests = self._separar(list(spider.parse(self._resposta(mock_bing_html, primeira))))
+
+        # Página 2 repete as entidades da primeira: nenhum item, nada agendado
+        itens, novas = self._separar(list(spider.parse(self._resposta(mock_bing_html, requests[0]))))
+        assert itens == [] and novas == []
+        # Página 3 (última da janela) traz novidades, mas a consulta já foi encerrada
+        itens, novas = self._separar(list(spider.parse(self._resposta(self._pagina(mock_bing_html, 'p3'), requests[1]))))
+        assert len(itens) == 18 and novas == []
+
+        stats = spider.crawler.stats
+        assert stats.get_value('bing/paginacao_interrompida') == 1
+        assert stats.get_value('bing/max_paginas_por_consulta') == 3
+        assert spider._paginacao == {}
+
+    def test_repeated_entities_without_id_stop_pagination(self, mock_bing_html):
+        """Verifica que entidades sem id repetidas não contam como novas e encerram a paginação"""
+        spider = self._spider()
+        sem_id = mock_bing_html.replace('&quot;id&quot;:&quot;ypid:', '&quot;sem_id&quot;:&quot;ypid:')
+        primeira = Request(self.URL, meta={'termo': 'academias', 'bairro': None, 'estado': 'RS', 'cidade': 'Porto Alegre'})
+        itens, requests = self._separar(list(spider.parse(self._resposta(sem_id, primeira))))
+        assert len(itens) == 18 and len(requests) == 2
+
+        itens, novas = self._separar(list(spider.parse(self._resposta(sem_id, requests[0]))))
+        assert itens == [] and novas == []
+        assert spider.crawler.stats.get_value('bing/paginacao_interrompida') == 1
+
+    def test_last_page_of_window_schedules_next(self, mock_bing_html):
+        """Verifica que a última página da janela agenda a próxima, até BING_MAX_PAGES"""
+        spider = self._spider(max_paginas=4, janela=2)
+        primeira = Request(self.URL, meta={'bairro': None})
+        _, janela = self._separar(list(spider.parse(self._resposta(mock_bing_html, primeira))))
+
+        _, novas = self._separar(list(spider.parse(self._resposta(self._pagina(mock_bing_html, 'p2'), janela[0]))))
+        assert novas == []
+        _, novas = self._separar(list(spider.parse(self._resposta(self._pagina(mock_bing_html, 'p3'), janela[1]))))
+        assert [r.meta['pagina'] for r in novas] == [4]
+
+        itens, novas = self._separar(list(spider.parse(self._resposta(self._pagina(mock_bing_html, 'p4'), novas[0]))))
+        assert len(itens) == 18 and novas == []
+        assert spider.crawler.stats.get_value('bing/max_paginas_por_consulta') == 4
+
+    def test_page_without_next_is_not_paginated(self, mock_bing_html):
+        """Verifica que uma primeira página sem seta de próxima não agenda páginas"""
+        spider = self._spider()
+        request = Request(self.URL, meta={'bairro': None})
+        html = self._pagina(mock_bing_html, 'p1', ultima=True)
+        _, requests = self._separar(list(spider.parse(self._resposta(html, request))))
+        assert requests == []
+
+    def test_failed_page_releases_query(self, mock_bing_html):
+        """Verifica que falhas nas páginas agendadas liberam o estado da consulta"""
+        from twisted.python.failure import Failure
+        spider = self._spider(max_paginas=2)
+        primeira = Request(self.URL, meta={'bairro': None})
+        _, requests = self._separar(list(spider.parse(self._resposta(mock_bing_html, primeira))))
+
+        falha = Failure(Exception('timeout'))
+        falha.request = requests[0]
+        requests[0].errback(falha)
+        assert spider._paginacao == {}
+
+    def test_stats_on_close(self, mock_bing_html):
+        """Verifica as estatísticas de páginas por consulta e listagens por página"""
+        spider = self._spider(max_paginas=2)
+        primeira = Request(self.URL, meta={'bairro': None})
+        _, requests = self._separar(list(spider.parse(self._resposta(mock_bing_html, primeira))))
+        list(spider.parse(self._resposta(self._pagina(mock_bing_html, 'p2', ultima=True), requests[0])))
+        spider.closed('finished')
+
+        stats = spider.crawler.stats
+        assert stats.get_value('bing/consultas') == 1
+        assert stats.get_value('bing/paginas') == 2
+        assert stats.get_value('bing/paginas_por_consulta') == 2.0
+        assert stats.get_value('bing/listagens_por_pagina') == 18.0
@@ -0,0 +1,121 @@
+import sqlite3
+from unittest.mock import Mock
+from scrapy.utils.test import get_crawler
+from lead_scraper.pipelines import SQLiteLeadStorePipeline
+from lead_scraper.items import LeadScraperItem
+
+
+def _criar_item(nome='Academia Fitness Plus', endereco='Rua Example, 123', cidade='Porto Alegre',
+                telefone='(51) 3333-4444'):
+    item = LeadScraperItem()
+    item['termo_busca'] = 'academias'
+    item['estado'] = 'RS'
+    item['cidade'] = cidade
+    item['bairro'] = 'Centro'
+    item['nome'] = nome
+    item['endereco'] = endereco
+    item['telefone'] = telefone
+    item['website'] = 'https://example.com'
+    return item
+
+
+def _linhas(database):
+    conn = sqlite3.connect(database)
+    try:
+        return conn.execute('SELECT nome, telefone, coletas FROM leads ORDER BY id').fetchall()
+    finally:
+        conn.close()
+
+
+class TestSQLiteLeadStorePipeline:
+    """Testes unitários para SQLiteLeadStorePipeline"""
+
+    def test_persists_items(self, tmp_path, sample_lead_item):
+        """Verifica que itens são gravados no banco e retornados para o próximo pipeline"""
+        database = str(tmp_path / 'leads.db')
+        pipeline = SQLiteLeadStorePipeline(database=database)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        assert pipeline.process_item(sample_lead_item, mock_spider) is sample_lead_item
+        pipeline.close_spider(mock_spider)
+
+        assert _linhas(database) == [('Academia Fitness Plus', '(51) 3333-4444', 1)]
+
+    def test_uses_wal_mode(self, tmp_path):
+        """Verifica que o banco é aberto em modo WAL"""
+        database = str(tmp_path / 'leads.db')
+        pipeline = SQLiteLeadStorePipeline(database=database)
+
+        pipeline.open_spider(Mock())
+        modo = pipeline.conn.execute('PRAGMA journal_mode').fetchone()[0]
+        pipeline.close_spider(Mock())
+
+        assert modo == 'wal'
+
+    def test_recrawl_upserts_instead_of_duplicating(self, tmp_path):
+        """Verifica que uma nova coleta da mesma entidade atualiza a linha existente"""
+        database = str(tmp_path / 'leads.db')
+        mock_spider = Mock()
+
+        primeira = SQLiteLeadStorePipeline(database=database)
+        primeira.open_spider(mock_spider)
+        primeira.process_item(_criar_item(telefone='(51) 1111-1111'), mock_spider)
+        primeira.close_spider(mock_spider)
+
+        segunda = SQLiteLeadStorePipeline(database=database)
+        segunda.open_spider(mock_spider)
+        # Mesma entidade com variações de acento, caixa e pontuação
+        segunda.process_item(
+            _criar_item(nome='ACADEMIA fitness plus', endereco='Rua Example 123', telefone='(51) 2222-2222'),
+            mock_spider
+        )
+        segunda.close_spider(mock_spider)
+
+        assert _linhas(database) == [('ACADEMIA fitness plus', '(51) 2222-2222', 2)]
+
+    def test_duplicates_within_same_batch(self, tmp_path):
+        """Verifica deduplicação quando a mesma entidade aparece duas vezes no mesmo batch"""
+        database = str(tmp_path / 'leads.db')
+        pipeline = SQLiteLeadStorePipeline(database=database, batch_size=10)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        pipeline.process_item(_criar_item(), mock_spider)
+        pipeline.process_item(_criar_item(), mock_spider)
+        pipeline.process_item(_criar_item(nome='Outra Academia'), mock_spider)
+        pipeline.close_spider(mock_spider)
+
+        linhas = _linhas(database)
+        assert len(linhas) == 2
+        assert linhas[0][2] == 2
+
+    def test_batches_are_committed_when_full(self, tmp_path):
+        """Verifica que um batch cheio é confirmado antes do fechamento"""
+        database = str(tmp_path / 'leads.db')
+        pipeline = SQLiteLeadStorePipeline(database=database, batch_size=2)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for i in range(3):
+            pipeline.process_item(_criar_item(nome=f'Academia {i}'), mock_spider)
+
+        # Dois itens confirmados, o terceiro ainda no buffer
+        assert len(_linhas(database)) == 2
+        pipeline.close_spider(mock_spider)
+        assert len(_linhas(database)) == 3
+
+    def test_from_crawler_reads_settings(self, tmp_path):
+        """Verifica que caminho e tamanho do batch vêm das settings"""
+        database = str(tmp_path / 'custom.db')
+        crawler = get_crawler(settings_dict={
+            'SQLITE_STORE_PATH': database,
+            'SQLITE_STORE_BATCH_SIZE': 7,
+        })
+
+        pipeline = SQLiteLeadStorePipeline.from_crawler(crawler)
+        pipeline.open_spider(Mock())
+        pipeline.close_spider(Mock())
+
+        assert pipeline.batch_size == 7
+        assert pipeline.database == database
@@ -0,0 +1,184 @@
+import csv
+import gzip
+import io
+import json
+import os
+import threading
+import pytest
+from unittest.mock import Mock
+from scrapy.exceptions import NotConfigured
+from scrapy.utils.test import get_crawler
+from lead_scraper.extensions import checkpoint_gravando
+from lead_scraper.pipelines import StreamExportPipeline, CAMPOS
+from lead_scraper.items import LeadScraperItem
+
+
+def _gerar_itens(quantidade):
+    for i in range(quantidade):
+        item = LeadScraperItem()
+        item['termo_busca'] = 'açougues'
+        item['estado'] = 'SP'
+        item['cidade'] = 'São Paulo'
+        item['bairro'] = f'Bairro {i}'
+        item['nome'] = f'Açougue "do João" {i}'
+        item['endereco'] = f'Rua da Conceição, {i}'
+        item['telefone'] = f'(11) 3333-{i:04d}'
+        item['website'] = f'https://acougue{i}.com.br'
+        yield item
+
+
+def _exportar(pipeline, quantidade):
+    mock_spider = Mock()
+    pipeline.open_spider(mock_spider)
+    itens = list(_gerar_itens(quantidade))
+    for item in itens:
+        assert pipeline.process_item(item, mock_spider) is item
+    pipeline.close_spider(mock_spider)
+    return itens
+
+
+class TestStreamExportPipeline:
+    """Testes unitários para StreamExportPipeline"""
+
+    def test_ndjson_to_file(self, tmp_path):
+        """Verifica uma linha JSON por item, preservando acentos"""
+        pipeline = StreamExportPipeline(results_folder=str(tmp_path))
+        itens = _exportar(pipeline, 3)
+
+        assert pipeline.destino.endswith('.ndjson')
+        with open(pipeline.destino, encoding='utf-8') as f:
+            linhas = f.read().splitlines()
+        assert len(linhas) == 3
+        assert json.loads(linhas[0]) == dict(itens[0])
+        assert 'São Paulo' in linhas[0]
+
+    def test_csv_with_gzip(self, tmp_path):
+        """Verifica CSV com cabeçalho comprimido com gzip"""
+        pipeline = StreamExportPipeline(formato='csv', compressao='gzip', results_folder=str(tmp_path))
+        itens = _exportar(pipeline, 3)
+
+        assert pipeline.destino.endswith('.csv.gz')
+        with gzip.open(pipeline.destino, 'rt', encoding='utf-8', newline='') as f:
+            linhas = list(csv.reader(f))
+        assert linhas[0] == CAMPOS
+        assert linhas[1] == [itens[0][campo] for campo in CAMPOS]
+        assert len(linhas) == 4
+
+    def test_ndjson_with_zstd(self, tmp_path):
+        """Verifica NDJSON comprimido com zstd"""
+        zstandard = pytest.importorskip('zstandard')
+        pipeline = StreamExportPipeline(compressao='zstd', results_folder=str(tmp_path))
+        itens = _exportar(pipeline, 2)
+
+        assert pipeline.destino.endswith('.ndjson.zst')
+        with open(pipeline.destino, 'rb') as f:
+            conteudo = zstandard.ZstdDecompressor().stream_reader(f).read().decode('utf-8')
+        assert [json.loads(linha) for linha in conteudo.splitlines()] == [dict(item) for item in itens]
+
+    def test_flushed_data_is_readable_before_close(self, tmp_path):
+        """Verifica que, após o intervalo de flush, o conteúdo já pode ser lido durante a coleta"""
+        pipeline = StreamExportPipeline(compressao='gzip', flush_interval=0, results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in _gerar_itens(2):
+            pipeline.process_item(item, mock_spider)
+
+        # Stream gzip ainda aberto: descomprime o que já foi descarregado
+        with open(pipeline.destino, 'rb') as f:
+            parcial = gzip.GzipFile(fileobj=io.BytesIO(f.read()))
+            linhas = []
+            try:
+                for linha in parcial:
+                    linhas.append(linha)
+            except EOFError:
+                pass
+        assert len(linhas) == 2
+
+        pipeline.close_spider(mock_spider)
+
+    def test_buffered_until_flush_interval(self, tmp_path):
+        """Verifica que, dentro do intervalo de flush, as linhas ficam em buffer"""
+        pipeline = StreamExportPipeline(flush_interval=3600, results_folder=str(tmp_path))
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in _gerar_itens(2):
+            pipeline.process_item(item, mock_spider)
+        assert os.path.getsize(pipeline.destino) == 0
+
+        pipeline.close_spider(mock_spider)
+        assert os.path.getsize(pipeline.destino) > 0
+
+    def test_checkpoint_signal_flushes_buffer(self, tmp_path):
+        """Verifica que o sinal checkpoint_gravando descarrega o buffer, inclusive depois do fechamento"""
+        crawler = get_crawler(settings_dict={'STREAM_EXPORT_DIR': str(tmp_path), 'STREAM_EXPORT_FLUSH_INTERVAL': 3600})
+        pipeline = StreamExportPipeline.from_crawler(crawler)
+        mock_spider = Mock()
+
+        pipeline.open_spider(mock_spider)
+        for item in _gerar_itens(2):
+            pipeline.process_item(item, mock_spider)
+        assert os.path.getsize(pipeline.destino) == 0
+
+        crawler.signals.send_catch_log(signal=checkpoint_gravando)
+        with open(pipeline.destino, encoding='utf-8') as f:
+            assert len(f.read().splitlines()) == 2
+
+        pipeline.close_spider(mock_spider)
+        pipeline.sincronizar()
+
+    def test_stdout(self, monkeypatch):
+        """Verifica a escrita na saída padrão sem fechá-la"""
+        buffer = io.BytesIO()
+        monkeypatch.setattr('sys.stdout', io.TextIOWrapper(buffer, encoding='utf-8'))
+
+        pipeline = StreamExportPipeline(uri='-')
+        _exportar(pipeline, 2)
+
+        assert not buffer.closed
+        assert len(buffer.getvalue().decode('utf-8').splitlines()) == 2
+
+    @pytest.mark.skipif(not hasattr(os, 'mkfifo'), reason='named pipes indisponíveis')
+    def test_named_pipe(self, tmp_path):
+        """Verifica que um consumidor lê os itens por um named pipe durante a exportação"""
+        fifo = str(tmp_path / 'leads.fifo')
+        os.mkfifo(fifo)
+        recebido = []
+
+        def consumidor():
+            with open(fifo, encoding='utf-8') as f:
+                recebido.extend(json.loads(linha) for linha in f)
+
+        leitor = threading.Thread(target=consumidor)
+        leitor.start()
+        pipeline = StreamExportPipeline(uri=fifo, flush_interval=0)
+        _exportar(pipeline, 3)
+        leitor.join(timeout=5)
+
+        assert [item['bairro'] for item in recebido] == ['Bairro 0', 'Bairro 1', 'Bairro 2']
+
+    def test_invalid_options(self):
+        """Verifica que formato ou compressão inválidos desativam o pipeline"""
+        with pytest.raises(NotConfigured):
+            StreamExportPipeline(formato='xml')
+        with pytest.raises(NotConfigured):
+            StreamExportPipeline(compressao='bz2')
+
+    def test_from_crawler_reads_settings(self, tmp_path):
+        """Verifica que formato, compressão, destino e intervalo vêm das settings"""
+        destino = str(tmp_path / 'saida.csv')
+        crawler = get_crawler(settings_dict={
+            'STREAM_EXPORT_FORMAT': 'csv',
+            'STREAM_EXPORT_URI': destino,
+            'STREAM_EXPORT_FLUSH_INTERVAL': 1.5,
+        })
+
+        pipeline = StreamExportPipeline.from_crawler(crawler)
+        _exportar(pipeline, 1)
+
+        assert pipeline.formato == 'csv'
+        assert pipeline.compressao is None
+        assert pipeline.flush_interval == 1.5
+        assert pipeline.destino == destino
+        assert os.path.exists(destino)